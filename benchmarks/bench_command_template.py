@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: command_template placeholder rewriting
+
+Compares the original four-pass str.replace transform_command_template with
+the compiled single-pass rewriter, with and without the rewrite memo, per
+entity and as one transform_commands_batch call.
+
+"cold" clears the rewrite memo before every run (every template is new);
+"fleet" draws addresses from a device-model sized pool (--addresses), as
+installations of the same heat pump model share their templates.
+
+Usage:
+    python benchmarks/bench_command_template.py [--entities N] [--addresses A] [--repeat R]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import migrate_ha_entities_to_ha_publish as migration  # noqa: E402
+
+
+def legacy_transform_command_template(template: str, dpaddr, length: int) -> str:
+    """Original implementation (four sequential str.replace passes)."""
+    if not template or '%DpAddr%' in template:
+        return template
+
+    if isinstance(dpaddr, int):
+        dpaddr_str = f"0x{dpaddr:04X}"
+    else:
+        dpaddr_str = str(dpaddr)
+
+    template = template.replace(dpaddr_str.lower(), '%DpAddr%')
+    template = template.replace(dpaddr_str.upper(), '%DpAddr%')
+    template = template.replace(dpaddr_str, '%DpAddr%')
+    template = template.replace(f';{length};', ';%Length%;')
+
+    return template
+
+
+def make_entities(count: int, addresses: int, seed: int = 1) -> list:
+    """(attrs, dpaddr, length) tuples shaped like number/switch entities."""
+    rng = random.Random(seed)
+    pool = [(rng.randrange(0x0100, 0xFFFF), rng.choice([1, 2, 4])) for _ in range(addresses)]
+    entities = []
+    for _ in range(count):
+        dpaddr, length = rng.choice(pool)
+        attrs = {
+            'command_topic': 'cmnd',
+            'command_template': f'{{{{ "w;0x{dpaddr:04X};{length};"~value*10 }}}}',
+            'payload_on': f'w;0x{dpaddr:04X};{length};1',
+            'payload_off': f'w;0x{dpaddr:04X};{length};0',
+            'unit_of_measurement': '°C',
+        }
+        entities.append((attrs, dpaddr, length))
+    return entities
+
+
+def unmemoized_entity_commands(attrs, dpaddr, length):
+    """transform_entity_commands without the rewrite memo (one regex pass per attribute)."""
+    result = dict(attrs)
+    rewrite = migration._rewrite_commands.__wrapped__
+    for key, value in attrs.items():
+        if value == 'cmnd' and key.endswith('command_topic'):
+            result[key] = '%mqtt_listen%'
+        elif ((key.startswith('payload_') or key.endswith('command_template'))
+              and migration._has_command(value)):
+            result[key] = rewrite(value, dpaddr, length)
+    return result
+
+
+def bench(label: str, func, repeat: int) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {label:<52} {best * 1000:9.2f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entities', type=int, default=20000, help='Number of entities')
+    parser.add_argument('--addresses', type=int, default=500,
+                        help='Distinct (DpAddr, Length) pairs in the fleet pool')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best of)')
+    args = parser.parse_args()
+
+    for label, addresses in (('cold', args.entities), ('fleet', args.addresses)):
+        run_scenario(label, make_entities(args.entities, addresses), args.repeat)
+
+
+def run_scenario(label: str, entities: list, repeat: int):
+    templates = [(attrs['command_template'], dpaddr, length) for attrs, dpaddr, length in entities]
+    cold = label == 'cold'
+
+    assert ([legacy_transform_command_template(*t) for t in templates]
+            == [migration.transform_command_template(*t) for t in templates])
+
+    def timed(func):
+        if not cold:
+            return func
+
+        def run():
+            migration._rewrite_commands.cache_clear()
+            return func()
+        return run
+
+    print(f"\n[{label}] command_template only ({len(templates)} templates)")
+    base = bench('legacy str.replace x4',
+                 lambda: [legacy_transform_command_template(*t) for t in templates], repeat)
+    single = bench('compiled single-pass transform_command_template',
+                   timed(lambda: [migration.transform_command_template(*t) for t in templates]),
+                   repeat)
+    print(f"  speedup: {base / single:.1f}x")
+
+    def legacy_entity(attrs, dpaddr, length):
+        result = dict(attrs)
+        if result.get('command_topic') == 'cmnd':
+            result['command_topic'] = '%mqtt_listen%'
+        for key in ('command_template', 'payload_on', 'payload_off'):
+            result[key] = legacy_transform_command_template(result[key], dpaddr, length)
+        return result
+
+    print(f"\n[{label}] all command attributes ({len(entities)} entities, 4 attributes each)")
+    assert ([unmemoized_entity_commands(*e) for e in entities]
+            == [migration.transform_entity_commands(*e) for e in entities])
+    base = bench('legacy str.replace x4 per attribute',
+                 lambda: [legacy_entity(*e) for e in entities], repeat)
+    plain = bench('single-pass regex per attribute, no memo',
+                  lambda: [unmemoized_entity_commands(*e) for e in entities], repeat)
+    memoized = bench('transform_entity_commands (memoized)',
+                     timed(lambda: [migration.transform_entity_commands(*e) for e in entities]),
+                     repeat)
+    batch = bench('transform_commands_batch (memoized)',
+                  timed(lambda: migration.transform_commands_batch(entities)), repeat)
+    print(f"  speedup: no memo {base / plain:.1f}x, memoized {base / memoized:.1f}x, "
+          f"batch {base / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: decoding the raw bytes of a poll cycle
+
+Migrates a synthetic fixture (see generate_fixtures.py), compiles its
+decoder table and decodes random raw bytes for every read of a cycle:
+
+    - per item: decode_value interprets the Scale/Type and Signed entries
+      of each poll tuple for every value, one read per item
+    - decoder table: precompiled struct formats, slices and masks, items
+      sharing a read decode from one buffer
+    - decoder table with NumPy: integer lanes decoded vectorized
+      (skipped when NumPy is not installed)
+
+All decoders must return the same values.
+
+Usage:
+    python benchmarks/bench_decoder.py [--datapoints N] [--repeat R] [--block-reads]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import migrate_ha_entities_to_ha_publish as migration  # noqa: E402
+from generate_fixtures import write_fixture  # noqa: E402
+
+
+def per_item_decoder(poll_tuples: list, table: dict, buffers: list):
+    """Return a function decoding each poll tuple from its own read, as downstream does."""
+    entries = {entry['name']: entry for entry in table['entries']}
+    reads = []
+    for entry in poll_tuples:
+        item = migration.parse_poll_item(entry)
+        if item.name not in entries:
+            continue
+        decoder = entries[item.name]
+        offset = decoder['offset']
+        poll_format = migration._poll_format(entry)
+        if poll_format and isinstance(poll_format[0], str) and poll_format[0].startswith('b:'):
+            offset -= migration._parse_bitfield(poll_format[0])[0]
+        raw = buffers[decoder['read']][offset:offset + item.length]
+        reads.append((item.name, raw, entry))
+
+    def decode():
+        return {name: migration.decode_value(raw, migration._poll_format(entry))
+                for name, raw, entry in reads}
+    return decode
+
+
+def bench(label: str, func, repeat: int, base: float = None) -> float:
+    best = min(timeit.repeat(func, number=10, repeat=repeat)) / 10
+    speedup = f"{base / best:6.1f}x" if base else ''
+    print(f"  {label:<28} {best * 1000:9.3f} ms {speedup}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datapoints', type=int, default=5000, help='Number of datapoints')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best of)')
+    parser.add_argument('--block-reads', action='store_true',
+                        help='Group datapoints by the block reads of plan_block_reads')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        entities_path, poll_list_path = write_fixture(tmp_dir, args.datapoints)
+        result = migration.run_migration(entities_path, poll_list_path,
+                                         os.path.join(tmp_dir, 'homeassistant_poll_list.py'),
+                                         verbose=False, verify=False)
+    poll_tuples = migration.active_poll_tuples(result['poll_list'])
+    plan = None
+    if args.block_reads:
+        plan = migration.plan_block_reads(migration.active_poll_items(result['poll_list']))
+    table = migration.compile_decoder_table(poll_tuples, plan)
+
+    rng = random.Random(1)
+    buffers = [bytes(rng.randrange(256) for _ in range(read['length'])) for read in table['reads']]
+
+    decoders = [('per item (decode_value)', per_item_decoder(poll_tuples, table, buffers))]
+    compiled = migration.DecoderTable(table, use_numpy=False)
+    decoders.append(('decoder table', lambda: compiled.decode(buffers)))
+    if migration.numpy is not None:
+        vectorized = migration.DecoderTable(table)
+        decoders.append(('decoder table (NumPy)', lambda: vectorized.decode(buffers)))
+
+    expected = decoders[0][1]()
+    for label, decode in decoders[1:]:
+        assert decode() == expected, label
+
+    print(f"\nDecoding one cycle ({len(table['entries'])} datapoints, {len(table['reads'])} reads)")
+    base = None
+    for label, decode in decoders:
+        elapsed = bench(label, decode, args.repeat, base)
+        base = base or elapsed
+    if migration.numpy is None:
+        print("  (NumPy not installed, vectorized decoding skipped)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: announcing Home Assistant entities from the discovery plan
+
+Replays the MQTT discovery announce of a migrated fixture against an
+in-process fake broker with a virtual clock:
+
+    - startup expansion: every payload is expanded and serialized when the
+      publisher starts, then published one by one at the rate, as
+      homeassistant_publish.py does (one per mqtt_delay)
+    - discovery plan: the pre-expanded plan is loaded and replayed in
+      batches at the same rate (replay_discovery_plan)
+
+Both replays run at the same rate (default: the publisher's, 1/mqtt_delay)
+and must leave the same retained messages on the broker. Announce time is
+virtual (sleeps plus a simulated per-message broker cost) and only differs
+by the batching; the publisher's own work is measured in real time.
+
+Usage:
+    python benchmarks/bench_discovery_plan.py [--datapoints N] [--rate MSGS] [--broker-cost MS]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import migrate_ha_entities_to_ha_publish as migration  # noqa: E402
+from generate_fixtures import write_fixture  # noqa: E402
+
+MQTT_TOPIC = 'Vito'
+MQTT_LISTEN = 'Vito/cmnd'
+
+
+class FakeBroker:
+    """In-process broker keeping retained messages, with a virtual clock."""
+
+    def __init__(self, cost: float = 0.0):
+        self.cost = cost
+        self.clock = 0.0
+        self.published = 0
+        self.retained = {}
+
+    def publish(self, topic: str, payload: bytes, retain: bool = False):
+        self.clock += self.cost
+        self.published += 1
+        if retain:
+            self.retained[topic] = json.loads(payload)
+
+    def sleep(self, seconds: float):
+        self.clock += seconds
+
+
+def announce_at_startup(poll_list: dict, rate: float, broker: FakeBroker):
+    """Expand all payloads when starting, then publish one message per 1/rate seconds."""
+    plan = migration.build_discovery_plan(poll_list, MQTT_TOPIC, MQTT_LISTEN, rate,
+                                          batch_interval=1 / rate)
+    for index, message in enumerate(message for batch in plan['batches'] for message in batch):
+        if index:
+            broker.sleep(1 / rate)
+        payload = migration.expand_discovery_payload(plan, message)
+        broker.publish(message['topic'], json.dumps(payload).encode('utf-8'), True)
+
+
+def announce_from_plan(plan_path: str, broker: FakeBroker):
+    with open(plan_path, 'rb') as f:
+        plan = json.loads(f.read())
+    migration.replay_discovery_plan(plan, broker.publish, broker.sleep)
+
+
+def run(label: str, func, broker: FakeBroker) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {broker.published:6} messages  announce {broker.clock:8.1f} s  "
+          f"publisher work {elapsed * 1000:8.1f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datapoints', type=int, default=600, help='Number of datapoints')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Announce rate of both replays in messages per second '
+                             '(default: 1/mqtt_delay)')
+    parser.add_argument('--broker-cost', type=float, default=1.0,
+                        help='Simulated broker time per message in ms (default: 1)')
+    args = parser.parse_args()
+    cost = args.broker_cost / 1000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        entities_path, poll_list_path = write_fixture(tmp_dir, args.datapoints)
+        plan_path = os.path.join(tmp_dir, 'discovery_plan.json')
+        result = migration.run_migration(entities_path, poll_list_path,
+                                         os.path.join(tmp_dir, 'homeassistant_poll_list.py'),
+                                         verbose=False, verify=False,
+                                         discovery_plan_path=plan_path,
+                                         mqtt_topic=MQTT_TOPIC, mqtt_listen=MQTT_LISTEN,
+                                         discovery_rate=args.rate)
+        plan = result['discovery_plan']
+        rate = plan['rate']
+        size = os.path.getsize(plan_path)
+        expanded = sum(len(json.dumps(migration.expand_discovery_payload(plan, message)))
+                       for batch in plan['batches'] for message in batch)
+        print(f"\nDiscovery announce ({args.datapoints} datapoints, {plan['messages']} messages, "
+              f"{rate:g} messages/s)")
+        print(f"  plan: {size / 1e3:.1f} kB, {len(plan['fragments'])} shared fragments "
+              f"(expanded payloads {expanded / 1e3:.1f} kB), batches of {plan['batch_size']} "
+              f"every {plan['batch_interval']}s")
+
+        startup = FakeBroker(cost)
+        startup_work = run('startup expansion',
+                           lambda: announce_at_startup(result['poll_list'], rate, startup),
+                           startup)
+        planned = FakeBroker(cost)
+        planned_work = run('discovery plan', lambda: announce_from_plan(plan_path, planned),
+                           planned)
+
+    assert startup.retained == planned.retained
+    print(f"  publisher work: {startup_work / planned_work:.1f}x less with the plan; announce "
+          f"{startup.clock:.1f} s vs {planned.clock:.1f} s at the same rate "
+          f"(same retained messages)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: loading the generated poll_list
+
+Migrates a synthetic fixture (see generate_fixtures.py) with all fast-load
+formats and compares how long a reader takes to get the poll_list:
+
+    - .py compiled from source (first import, or no writable __pycache__)
+    - .py imported with its __pycache__ .pyc
+    - .pyc executed directly
+    - canonical .json (tuples restored)
+    - .marshal
+
+Every format is checked to load the same structure as the .py file.
+
+Usage:
+    python benchmarks/bench_load.py [--datapoints N] [--repeat R]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import migrate_ha_entities_to_ha_publish as migration  # noqa: E402
+from generate_fixtures import write_fixture  # noqa: E402
+
+
+def load_from_source(path: str) -> dict:
+    """Compile and run the .py file without using a cached .pyc."""
+    with open(path, 'rb') as f:
+        source = f.read()
+    namespace = {}
+    exec(compile(source, path, 'exec'), namespace)
+    return namespace['poll_list']
+
+
+def bench(label: str, func, repeat: int, size: int, base: float = None) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    speedup = f"{base / best:6.1f}x" if base else ''
+    print(f"  {label:<36} {best * 1000:9.2f} ms {size / 1e6:8.2f} MB {speedup}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datapoints', type=int, default=10000, help='Number of datapoints')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best of)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        entities_path, poll_list_path = write_fixture(tmp_dir, args.datapoints)
+        output_path = os.path.join(tmp_dir, 'homeassistant_poll_list.py')
+        result = migration.run_migration(entities_path, poll_list_path, output_path,
+                                         verbose=False, verify=False,
+                                         fast_load=migration.FAST_LOAD_FORMATS)
+        paths = result['fast_load']
+
+        expected = load_from_source(output_path)
+        for path in [output_path] + list(paths.values()):
+            assert migration.load_poll_list(path) == expected, path
+
+        print(f"\nLoading poll_list ({args.datapoints} datapoints)")
+        formats = [
+            ('.py from source', lambda: load_from_source(output_path), output_path),
+            ('.py import (with __pycache__ .pyc)', lambda: migration.load_poll_list(output_path),
+             paths['pyc']),
+            ('.pyc', lambda: migration.load_poll_list(paths['pyc']), paths['pyc']),
+            ('.json', lambda: migration.load_poll_list(paths['json']), paths['json']),
+            ('.marshal', lambda: migration.load_poll_list(paths['marshal']), paths['marshal']),
+        ]
+        base = None
+        for label, func, path in formats:
+            elapsed = bench(label, func, args.repeat, os.path.getsize(path), base)
+            base = base or elapsed
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: name normalization
+
+Compares the precompiled/memoized normalize_name and normalize_for_matching
+(and the normalize_names batch API) with the original re.sub based versions.
+
+Usage:
+    python benchmarks/bench_normalization.py [--names N] [--repeat R]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import migrate_ha_entities_to_ha_publish as migration  # noqa: E402
+
+
+def legacy_normalize_name(name: str) -> str:
+    """Original implementation (uncompiled re.sub on every call)."""
+    return re.sub(r'[^0-9a-zA-Z]+', '_', name).lower().strip('_')
+
+
+def legacy_normalize_for_matching(name: str) -> str:
+    """Original implementation (uncompiled re.sub on every call)."""
+    return re.sub(r'[^0-9a-z]+', '', name.lower())
+
+
+def make_names(count: int, seed: int = 1) -> list:
+    """Entity-like names ("HK2 Raumtemp Soll 12") with some umlauts."""
+    rng = random.Random(seed)
+    words = ['HK2', 'Raumtemp', 'Soll', 'VD', 'Status', 'WW', 'Speichertemp',
+             'Aussentemp', 'Pumpe', 'Rücklauf', 'Leistung', 'COP', 'kk', 'Heißgas']
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))) + f' {i}'
+            for i in range(count)]
+
+
+def bench(label: str, func, repeat: int) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {label:<48} {best * 1000:9.2f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=20000, help='Number of distinct names')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best of)')
+    args = parser.parse_args()
+
+    names = make_names(args.names)
+    # Pipeline pattern: every name is normalized several times per run
+    repeated = names * 4
+
+    for legacy, current, for_matching in (
+            (legacy_normalize_name, migration.normalize_name, False),
+            (legacy_normalize_for_matching, migration.normalize_for_matching, True)):
+        assert [legacy(n) for n in names] == [current(n) for n in names]
+        assert migration.normalize_names(names, for_matching) == [legacy(n) for n in names]
+
+        print(f"\n{current.__name__} ({len(names)} distinct names, {len(repeated)} calls)")
+
+        def run_current_cold():
+            current.cache_clear()
+            for n in repeated:
+                current(n)
+
+        base = bench('legacy re.sub', lambda: [legacy(n) for n in repeated], args.repeat)
+        cold = bench('precompiled + memo (cache cleared)', run_current_cold, args.repeat)
+        hot = bench('precompiled + memo (warm cache)',
+                    lambda: [current(n) for n in repeated], args.repeat)
+
+        def run_batch_cold():
+            current.cache_clear()
+            migration.normalize_names(repeated, for_matching)
+
+        batch = bench('normalize_names batch (cache cleared)', run_batch_cold, args.repeat)
+        ascii_names = [n for n in repeated if n.isascii()]
+        ascii_base = bench(f'legacy re.sub, ASCII names only ({len(ascii_names)})',
+                           lambda: [legacy(n) for n in ascii_names], args.repeat)
+        ascii_batch = bench('normalize_names batch, ASCII names only',
+                            lambda: migration.normalize_names(ascii_names, for_matching),
+                            args.repeat)
+        print(f"  speedup vs legacy: cold {base / cold:.1f}x, warm {base / hot:.1f}x, "
+              f"batch {base / batch:.1f}x, ASCII batch {ascii_base / ascii_batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory of the per-item records
+
+Compares the retained memory (tracemalloc) of the original dict-based
+records with the PollItem NamedTuple and the slotted EntityRecord:
+
+    - poll_items_map: one dict per poll item vs PollItem
+    - grouped entities: one wrapper dict per entity vs EntityRecord
+      (both wrap the same attrs dicts and poll tuples)
+    - attrs keys: entities decoded one by one (as with --stream) repeat
+      every key string; interned keys are shared by all entities
+
+Fixtures come from generate_fixtures.py.
+
+Usage:
+    python benchmarks/bench_records.py [--datapoints N]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import migrate_ha_entities_to_ha_publish as migration  # noqa: E402
+from generate_fixtures import generate  # noqa: E402
+
+
+def legacy_parse_poll_item(item: tuple) -> dict:
+    """Original implementation (one dict per poll item)."""
+    result = {}
+    if isinstance(item[0], int) and len(item) > 3 and isinstance(item[1], str):
+        result['pollcycle'] = item[0]
+        idx = 1
+    else:
+        result['pollcycle'] = 1
+        idx = 0
+    result['name'] = item[idx]
+    result['dpaddr'] = item[idx + 1]
+    result['length'] = item[idx + 2]
+    if idx + 3 < len(item):
+        result['scale'] = item[idx + 3]
+    if idx + 4 < len(item):
+        result['signed'] = item[idx + 4]
+    return result
+
+
+def legacy_entity(record: migration.EntityRecord) -> dict:
+    """Original per-entity wrapper dict of group_entities_by_domain."""
+    if record.poll_tuple is not None:
+        return {'poll_tuple': record.poll_tuple, 'attrs': record.attrs,
+                'original_name': record.original_name, 'matched_by': record.matched_by,
+                'match_score': record.match_score}
+    return {'nopoll_tuple': record.nopoll_tuple, 'attrs': record.attrs,
+            'original_name': record.original_name, 'suggestions': record.suggestions}
+
+
+def retained(build):
+    """Return (result, bytes still allocated by build once it returned)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def report(label: str, count: int, legacy: int, current: int):
+    print(f"\n{label} ({count} items)")
+    print(f"  {'legacy':<28} {legacy / 1e6:9.2f} MB {legacy / count:7.0f} B/item")
+    print(f"  {'current':<28} {current / 1e6:9.2f} MB {current / count:7.0f} B/item")
+    print(f"  reduction: {100.0 * (legacy - current) / legacy:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datapoints', type=int, default=20000, help='Number of datapoints')
+    args = parser.parse_args()
+
+    datapoints, lines = generate(args.datapoints)
+    # Decoded one by one like EntitiesStream does, so keys are not shared
+    encoded = [json.dumps(datapoint, ensure_ascii=False) for datapoint in datapoints]
+    poll_items = migration.parse_poll_list_source('\n'.join(lines))
+
+    legacy_items, legacy_size = retained(lambda: [legacy_parse_poll_item(t) for t in poll_items])
+    items, size = retained(lambda: [migration.parse_poll_item(t) for t in poll_items])
+    assert [migration.create_poll_tuple(item) for item in items] == [
+        tuple(legacy.values()) for legacy in legacy_items]
+    report('poll items', len(poll_items), legacy_size, size)
+    del legacy_items, items
+
+    entities = [json.loads(line) for line in encoded]
+    poll_items_map = migration.build_poll_items_map(poll_items)
+    domains = migration.group_entities_by_domain(entities, poll_items_map)
+    records = [record for domain_data in domains.values()
+               for units in domain_data['units'].values() for record in units]
+
+    _, legacy_size = retained(lambda: [legacy_entity(record) for record in records])
+    _, size = retained(lambda: [migration.EntityRecord(record.attrs, record.original_name,
+                                                       record.poll_tuple, record.nopoll_tuple,
+                                                       record.matched_by, record.match_score,
+                                                       record.suggestions)
+                                for record in records])
+    report('entity wrappers', len(records), legacy_size, size)
+
+    def stream_attrs(key):
+        """Attrs of entities decoded one at a time; the decoded dicts are dropped."""
+        return [{key(k): v for k, v in json.loads(line).items() if k not in ('name', 'domain')}
+                for line in encoded]
+
+    _, legacy_size = retained(lambda: stream_attrs(lambda k: k))
+    _, size = retained(lambda: stream_attrs(sys.intern))
+    report('streamed attrs (interned keys)', len(encoded), legacy_size, size)
+
+
+if __name__ == '__main__':
+    main()
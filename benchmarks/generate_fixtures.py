@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Synthetic fixture generator
+
+Writes an entities JSON + poll_list.py pair shaped like the fixtures in
+testfiles_earl/testfiles_frans, at any size:
+
+    - domain mix of a heat pump installation (mostly sensors, some
+      binary_sensor/number/switch/button/select/text, a few climate)
+    - --match-rate of the entities get a poll item with the same name;
+      the rest stay unmatched, and a few unused poll items are added
+    - bit-field items ('b:0:1' / 'b:2:2'), PollCycle variables
+      (cycle_a/b/c) and items without PollCycle
+    - command templates and payloads with the datapoint address for
+      number/switch/button entities
+
+Both files are written incrementally, so 1M datapoints need little memory.
+
+Usage:
+    python benchmarks/generate_fixtures.py --datapoints N [--match-rate R] [--seed S] [--out DIR]
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import Dict, Iterator, List, Tuple
+
+ENTITIES_FILE = 'homeassistant_entities.json'
+POLL_LIST_FILE = 'poll_list.py'
+
+DOMAIN_MIX = [
+    ('sensor', 70), ('binary_sensor', 13), ('number', 9), ('switch', 3),
+    ('button', 2), ('select', 1), ('text', 1), ('climate', 1),
+]
+
+PREFIXES = ['HK1', 'HK2', 'WW', 'KK', 'PK', 'SK', 'VD', 'Puffer', 'eHeizung']
+WORDS = ['Temp', 'Soll', 'Ist', 'VL', 'RL', 'Pumpe', 'Druck', 'Leistung', 'Status',
+         'Betriebsstunden', 'Aussentemp', 'Heissgas', 'Sauggas', 'Rücklauf', 'Frostschutz']
+
+SENSOR_KINDS = [
+    {'device_class': 'temperature', 'icon': 'mdi:thermometer',
+     'state_class': 'measurement', 'unit_of_measurement': '°C'},
+    {'device_class': 'pressure', 'icon': 'mdi:gauge',
+     'state_class': 'measurement', 'unit_of_measurement': 'bar'},
+    {'device_class': 'power', 'icon': 'mdi:flash',
+     'state_class': 'measurement', 'unit_of_measurement': 'W'},
+    {'device_class': 'duration', 'entity_category': 'diagnostic', 'icon': 'mdi:timer-outline',
+     'state_class': 'total_increasing', 'unit_of_measurement': 'h'},
+    {'device_class': None, 'entity_category': 'diagnostic', 'icon': 'mdi:multiplication',
+     'state_class': 'measurement', 'unit_of_measurement': 'x'},
+]
+BINARY_ICONS = ['mdi:pump', 'mdi:snowflake-alert', 'mdi:fire', 'mdi:valve']
+
+
+def entity_name(index: int, rng: random.Random) -> str:
+    """Readable, unique entity name like 'HK2 Temp VL 123'."""
+    words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+    return f"{rng.choice(PREFIXES)} {words} {index}"
+
+
+def poll_name(name: str) -> str:
+    """Poll item name as technicians write them ('hk2_temp_vl_123')."""
+    return ''.join(c if c.isascii() and c.isalnum() else '_' for c in name.lower())
+
+
+def make_datapoint(domain: str, name: str, dpaddr: int, length: int,
+                   rng: random.Random) -> Dict:
+    """Entity definition for one datapoint of the given domain."""
+    addr = f"0x{dpaddr:04X}"
+    topic = poll_name(name)
+    if domain == 'sensor':
+        entity = {'name': name, 'domain': domain}
+        entity.update(rng.choice(SENSOR_KINDS))
+        return entity
+    if domain == 'binary_sensor':
+        return {'name': name, 'device_class': 'running', 'domain': domain,
+                'icon': rng.choice(BINARY_ICONS), 'payload_off': '0', 'payload_on': '1'}
+    if domain == 'number':
+        return {'name': name, 'command_template': f'{{{{ "w;{addr};{length};"~value*10 }}}}',
+                'command_topic': 'cmnd', 'domain': domain, 'entity_category': 'config',
+                'icon': 'mdi:thermometer', 'max': '70', 'min': '10', 'mode': 'box',
+                'state_class': 'measurement', 'state_topic': topic, 'step': '0.5',
+                'unit_of_measurement': '°C'}
+    if domain == 'switch':
+        return {'name': name, 'command_topic': 'cmnd', 'domain': domain, 'optimistic': False,
+                'payload_off': f'w;{addr};{length};0', 'payload_on': f'w;{addr};{length};1',
+                'state_off': '0', 'state_on': '1', 'state_topic': topic}
+    if domain == 'button':
+        return {'name': name, 'command_topic': 'cmnd', 'domain': domain,
+                'icon': 'mdi:gesture-tap-button', 'payload_press': f'w;{addr};{length};2'}
+    if domain == 'select':
+        return {'name': name, 'command_template': f'{{{{ "w;{addr};{length};"~value }}}}',
+                'command_topic': 'cmnd', 'domain': domain, 'entity_category': 'config',
+                'options': ['0', '1', '2', '3'], 'state_topic': topic}
+    if domain == 'text':
+        return {'name': name, 'command_topic': 'cmnd', 'domain': domain,
+                'entity_category': 'config', 'icon': 'mdi:form-textbox'}
+    return {'name': name, 'current_temperature_topic': topic, 'domain': domain,
+            'mode_command_template': f'{{% if value=="off" %}} w;{addr};1;0 '
+                                     f'{{% elif value=="heat" %}} w;{addr};1;5 {{% endif %}}',
+            'mode_command_topic': 'cmnd', 'mode_state_topic': topic,
+            'modes': ['off', 'heat'], 'precision': 0.1}
+
+
+def make_poll_item(name: str, dpaddr: int, length: int, rng: random.Random) -> str:
+    """Source line of one poll item with PollCycle variable, literal or none."""
+    cycle = rng.choice(['cycle_a, ', 'cycle_b, ', 'cycle_c, ', '30, ', '3600, ', ''])
+    kind = rng.random()
+    if kind < 0.1:
+        item = f'{cycle}"{name}", 0x{dpaddr:04X}, {length}, \'b:0:1\', 0.1, True'
+    elif kind < 0.15:
+        item = f'{cycle}"{name}", 0x{dpaddr:04X}, 19, \'b:2:2\', 1, False'
+    elif kind < 0.18:
+        item = f'{cycle}"{name}", 0x{dpaddr:04X}, 32'
+    else:
+        scale = rng.choice(['0.1', '1', '0.01', '2.7778e-4'])
+        item = f'{cycle}"{name}", 0x{dpaddr:04X}, {length}, {scale}, {rng.choice(["True", "False"])}'
+    return f"    ({item}),"
+
+
+def generate(count: int, match_rate: float = 0.9,
+             seed: int = 1) -> Tuple[Iterator[Dict], List[str]]:
+    """
+    Return (datapoints iterator, poll_list source lines).
+
+    Poll items are collected while the datapoints are consumed, so the
+    source lines are complete once the iterator is exhausted.
+    """
+    rng = random.Random(seed)
+    domains = [domain for domain, weight in DOMAIN_MIX for _ in range(weight)]
+    lines = ['cycle_a = 10', 'cycle_b = 30', 'cycle_c = 60', '',
+             'poll_items = [',
+             '    # ([PollCycle,] Name, DpAddr, Length [, Scale/Type [, Signed]),']
+
+    def datapoints():
+        for index in range(count):
+            domain = rng.choice(domains)
+            name = entity_name(index, rng)
+            dpaddr = 0x0100 + index % 0xFE00
+            length = rng.choice([1, 2, 2, 4])
+            if rng.random() < match_rate:
+                lines.append(make_poll_item(poll_name(name), dpaddr, length, rng))
+            # A few poll items no entity refers to
+            if rng.random() < 0.05:
+                lines.append(make_poll_item(f"unused_{index}", dpaddr, length, rng))
+            yield make_datapoint(domain, name, dpaddr, length, rng)
+        lines.append(']')
+    return datapoints(), lines
+
+
+def write_fixture(out_dir: str, count: int, match_rate: float = 0.9,
+                  seed: int = 1) -> Tuple[str, str]:
+    """Write the fixture pair to out_dir and return (entities_path, poll_list_path)."""
+    os.makedirs(out_dir, exist_ok=True)
+    entities_path = os.path.join(out_dir, ENTITIES_FILE)
+    poll_list_path = os.path.join(out_dir, POLL_LIST_FILE)
+    header = {
+        'mqtt_ha_discovery_prefix': 'homeassistant',
+        'mqtt_ha_node_id': f'bench_{count}/',
+        'dp_prefix': f'bench_{count}_',
+        'device': {'identifiers': [f'Bench_{count}'], 'name': f'Bench {count}',
+                   'model': 'Vitocal 200-S', 'manufacturer': 'Viessmann'},
+    }
+    datapoints, lines = generate(count, match_rate, seed)
+    with open(entities_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(json.dumps(header, ensure_ascii=False, indent=4)[:-2])
+        f.write(',\n    "datapoints": [')
+        for index, datapoint in enumerate(datapoints):
+            f.write(',\n        ' if index else '\n        ')
+            f.write(json.dumps(datapoint, ensure_ascii=False))
+        f.write('\n    ]\n}\n')
+    with open(poll_list_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    return entities_path, poll_list_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datapoints', type=int, default=1000, help='Number of datapoints')
+    parser.add_argument('--match-rate', type=float, default=0.9,
+                        help='Share of entities with a poll item of the same name')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--out', default='.', help='Output directory')
+    args = parser.parse_args()
+
+    entities_path, poll_list_path = write_fixture(args.out, args.datapoints,
+                                                  args.match_rate, args.seed)
+    print(f"[OK] Wrote {entities_path} and {poll_list_path}")
+
+
+if __name__ == '__main__':
+    main()
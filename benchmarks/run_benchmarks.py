@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Benchmark runner: pipeline stages at increasing fixture sizes
+
+Generates synthetic fixtures (see generate_fixtures.py) and times each
+pipeline stage, then runs the stages once more under tracemalloc for the
+peak allocation of each stage:
+
+    load_entities_json, parse_poll_list_file, build_poll_items_map,
+    group_entities_by_domain, build_poll_list_structure, write_poll_list_file
+
+Caches (poll_list parse cache, name normalization, command rewrites) are
+cleared before every run, so each run is a cold start.
+
+Results can be stored as JSON (--save) and compared against a previous
+result file (--compare); stages slower than --threshold are flagged.
+
+The 1M datapoint scale is opt-in (--sizes 1000,10000,100000,1000000): it
+writes ~270 MB of fixtures and the poll_list AST alone needs several GB.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 1000,10000,100000] [--repeat R]
+                                        [--fixtures DIR] [--save PATH] [--compare PATH]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import migrate_ha_entities_to_ha_publish as migration  # noqa: E402
+from generate_fixtures import write_fixture  # noqa: E402
+
+DEFAULT_SIZES = '1000,10000,100000'
+
+
+def clear_caches():
+    migration._poll_list_cache.clear()
+    migration._rewrite_commands.cache_clear()
+    migration.normalize_name.cache_clear()
+    migration.normalize_for_matching.cache_clear()
+
+
+def run_stages(entities_path: str, poll_list_path: str, output_path: str, measure):
+    """Run the pipeline stage by stage; measure(stage, func) runs and records one stage."""
+    clear_caches()
+    entities_json = measure('load_entities_json',
+                            lambda: migration.load_entities_json(entities_path, verbose=False))
+    poll_items = measure('parse_poll_list_file',
+                         lambda: migration.parse_poll_list_file(poll_list_path, verbose=False))
+    poll_items_map = measure('build_poll_items_map',
+                             lambda: migration.build_poll_items_map(poll_items))
+    fuzzy_index = migration.PollNameIndex(poll_items_map)
+    measure('group_entities_by_domain',
+            lambda: migration.group_entities_by_domain(entities_json['datapoints'], poll_items_map,
+                                                       fuzzy_index=fuzzy_index))
+    # Grouping again from a cold start, as part of the full structure build
+    clear_caches()
+    poll_list, coverage = measure('build_poll_list_structure',
+                                  lambda: migration.build_poll_list_structure(entities_json,
+                                                                              poll_items_map))
+    if os.path.exists(output_path):
+        os.unlink(output_path)
+    measure('write_poll_list_file',
+            lambda: migration.write_poll_list_file(poll_list, output_path, coverage))
+
+
+def benchmark_size(size: int, fixtures_dir: str, repeat: int, match_rate: float = 0.9) -> dict:
+    """Time and memory-profile all stages for one fixture size."""
+    fixture_dir = os.path.join(fixtures_dir, f'fixture_{size}_{match_rate}')
+    entities_path = os.path.join(fixture_dir, 'homeassistant_entities.json')
+    poll_list_path = os.path.join(fixture_dir, 'poll_list.py')
+    if not (os.path.exists(entities_path) and os.path.exists(poll_list_path)):
+        print(f"  generating {size} datapoints...")
+        write_fixture(fixture_dir, size, match_rate)
+    output_path = os.path.join(fixture_dir, 'homeassistant_poll_list.py')
+
+    times = {}
+
+    def timed(stage, func):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        times[stage] = min(times.get(stage, elapsed), elapsed)
+        return result
+
+    for _ in range(repeat):
+        run_stages(entities_path, poll_list_path, output_path, timed)
+
+    peaks = {}
+
+    def traced(stage, func):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = func()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - base
+        return result
+
+    tracemalloc.start()
+    try:
+        run_stages(entities_path, poll_list_path, output_path, traced)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'datapoints': size,
+        'match_rate': match_rate,
+        'input_bytes': os.path.getsize(entities_path) + os.path.getsize(poll_list_path),
+        'stages': {stage: {'seconds': round(times[stage], 6), 'peak_bytes': peaks[stage]}
+                   for stage in times},
+    }
+
+
+def print_results(results: list, baseline: dict = None, threshold: float = 1.2) -> int:
+    """Print a table per size; returns the number of flagged regressions."""
+    regressions = 0
+    for result in results:
+        size = result['datapoints']
+        base_stages = (baseline or {}).get(str(size), {}).get('stages', {})
+        print(f"\n{size} datapoints ({result['input_bytes'] / 1e6:.1f} MB input)")
+        for stage, stats in result['stages'].items():
+            line = (f"  {stage:<28} {stats['seconds'] * 1000:10.1f} ms "
+                    f"{stats['peak_bytes'] / 1e6:9.1f} MB peak")
+            base = base_stages.get(stage)
+            if base and base['seconds']:
+                ratio = stats['seconds'] / base['seconds']
+                flag = '  <-- slower' if ratio > threshold else ''
+                regressions += bool(flag)
+                line += f"   {ratio:5.2f}x vs baseline{flag}"
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'Comma separated datapoint counts (default: {DEFAULT_SIZES})')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best of)')
+    parser.add_argument('--match-rate', type=float, default=0.9,
+                        help='Share of generated entities with a poll item (default: 0.9)')
+    parser.add_argument('--fixtures', help='Directory for generated fixtures (kept for reuse); '
+                                           'default is a temporary directory')
+    parser.add_argument('--save', metavar='PATH', help='Store the results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='Compare with a stored result file')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Flag stages slower than this ratio vs --compare (default: 1.2)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = {str(r['datapoints']): r for r in json.load(f)['results']}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fixtures_dir = args.fixtures or tmp_dir
+        results = []
+        for size in sizes:
+            print(f"[{size} datapoints]")
+            results.append(benchmark_size(size, fixtures_dir, args.repeat, args.match_rate))
+
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save:
+        record = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8', newline='\n') as f:
+            json.dump(record, f, indent=2)
+            f.write('\n')
+        print(f"\n[OK] Results saved to {args.save}")
+
+    if regressions:
+        print(f"\n[WARNING] {regressions} stages slower than {args.threshold}x baseline")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
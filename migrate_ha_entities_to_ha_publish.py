@@ -13,206 +13,1577 @@ Usage:
     python migrate_ha_entities_to_ha_publish.py                           # Interactive mode with defaults
     python migrate_ha_entities_to_ha_publish.py homeassistant_entities.json poll_list.py
     python migrate_ha_entities_to_ha_publish.py homeassistant_entities.json poll_list.py -o output.py
+    python migrate_ha_entities_to_ha_publish.py --batch manifest.csv      # Fleet batch mode
+    python migrate_ha_entities_to_ha_publish.py --watch                   # Regenerate on changes
+    python migrate_ha_entities_to_ha_publish.py --serve /tmp/migrate.sock # Daemon mode
 """
 
+import ast
+import codecs
+import csv
+import hashlib
+import heapq
+import importlib.util
 import json
+import marshal
+import math
+import mmap
+import multiprocessing
+import os
+import py_compile
 import re
+import signal
+import socket
+import socketserver
+import string
+import struct
 import sys
-from collections import defaultdict
-from typing import Dict, List, Tuple, Any, Set
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import Dict, List, Tuple, Any, Set, Optional, Iterable, Iterator, NamedTuple
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
-def parse_poll_list_file(filepath: str) -> List[Tuple]:
-    """Parse poll_list.py and extract poll_items list."""
-    # Try multiple encodings (Windows and Unix)
-    encodings = ['utf-8', 'utf-8-sig', 'cp1252', 'latin-1', 'iso-8859-1']
-    content = None
-    used_encoding = None
-    
-    for encoding in encodings:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Encodings tried in order when no BOM is present (Windows and Unix).
+# latin-1 maps every byte, so decoding always succeeds with the last entry.
+INPUT_ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+
+# Byte order marks detected before trying INPUT_ENCODINGS
+INPUT_BOMS = [
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+]
+
+# Files at least this large are memory-mapped instead of read into a bytes copy
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def decode_input(data) -> Tuple[str, str]:
+    """Decode raw input bytes once, returning (text, encoding)."""
+    head = bytes(data[:4])
+    for bom, encoding in INPUT_BOMS:
+        if head.startswith(bom):
+            return str(data, encoding), encoding
+
+    for encoding in INPUT_ENCODINGS:
         try:
-            with open(filepath, 'r', encoding=encoding, errors='strict') as f:
-                content = f.read()
-            used_encoding = encoding
-            break
-        except (UnicodeDecodeError, LookupError):
+            return str(data, encoding, 'strict'), encoding
+        except UnicodeDecodeError:
             continue
+
+    raise ValueError(f"Could not decode input with any encoding: {INPUT_ENCODINGS}")
+
+
+def read_text_file(filepath: str, metrics: Optional['PipelineMetrics'] = None) -> Tuple[str, str]:
+    """
+    Read an input file once and decode it, returning (text, encoding).
+
+    Large files are memory-mapped and decoded straight from the mapping
+    (pages are then read while decoding, so the 'decode' stage includes them).
+    """
+    with open(filepath, 'rb') as f:
+        with pipeline_stage(metrics, 'read'):
+            size = os.fstat(f.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = f.read()
+    try:
+        with pipeline_stage(metrics, 'decode'):
+            return decode_input(data)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def parse_poll_list_file(filepath: str, verbose: bool = True,
+                         metrics: Optional['PipelineMetrics'] = None) -> List[Tuple]:
+    """Parse poll_list.py and extract poll_items list."""
+    content, used_encoding = read_text_file(filepath, metrics)
     
-    if content is None:
-        raise ValueError(f"Could not read file with any encoding: {encodings}")
-    
-    print(f"[OK] Successfully read poll_list file with {used_encoding} encoding")
+    if verbose:
+        print(f"[OK] Successfully read poll_list file with {used_encoding} encoding")
     
-    namespace = {}
     try:
-        exec(content, namespace)
-    except Exception as e:
-        print(f"[ERROR] Error executing poll_list file: {e}")
+        with pipeline_stage(metrics, 'poll_parse'):
+            return parse_poll_list_source(content, filepath)
+    except (SyntaxError, ValueError) as e:
+        if verbose:
+            print(f"[ERROR] Error parsing poll_list file: {e}")
         raise
-    
-    if 'poll_items' not in namespace:
-        raise ValueError("poll_items not found in file")
-    
-    return namespace['poll_items']
 
 
-def load_entities_json(filepath: str) -> Dict:
-    """Load entities JSON with multiple encoding support."""
-    encodings = ['utf-8', 'utf-8-sig', 'cp1252', 'latin-1', 'iso-8859-1']
-    used_encoding = None
-    
-    for encoding in encodings:
+# Parsed poll_items keyed by SHA-256 of the poll_list source
+POLL_LIST_CACHE_SIZE = 256
+_poll_list_cache: 'OrderedDict[str, Tuple[Tuple, ...]]' = OrderedDict()
+
+_BINARY_OPERATORS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.LShift: lambda a, b: a << b,
+    ast.RShift: lambda a, b: a >> b,
+    ast.BitOr: lambda a, b: a | b,
+    ast.BitAnd: lambda a, b: a & b,
+}
+
+
+class _Unresolved:
+    """Marker for a module-level name whose value could not be evaluated statically."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def _eval_poll_list_node(node: ast.AST, constants: Dict[str, Any]) -> Any:
+    """
+    Statically evaluate a poll_list expression.
+
+    Supports literals, tuples, lists, dicts, names of previously assigned
+    module-level constants (e.g. cycle_a = 10), unary +/- and simple arithmetic.
+    """
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Tuple):
+        return tuple(_eval_poll_list_node(elt, constants) for elt in node.elts)
+    if isinstance(node, ast.List):
+        return [_eval_poll_list_node(elt, constants) for elt in node.elts]
+    if isinstance(node, ast.Dict):
+        if any(key is None for key in node.keys):
+            raise ValueError(f"Unsupported dict unpacking at line {node.lineno}")
+        return {_eval_poll_list_node(key, constants): _eval_poll_list_node(value, constants)
+                for key, value in zip(node.keys, node.values)}
+    if isinstance(node, ast.Name):
+        if node.id not in constants:
+            raise ValueError(f"Undefined name '{node.id}' at line {node.lineno}")
+        value = constants[node.id]
+        if isinstance(value, _Unresolved):
+            raise ValueError(value.message)
+        return value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _eval_poll_list_node(node.operand, constants)
+        if isinstance(operand, (int, float)) and not isinstance(operand, bool):
+            return -operand if isinstance(node.op, ast.USub) else +operand
+    if isinstance(node, ast.BinOp):
+        left = _eval_poll_list_node(node.left, constants)
+        right = _eval_poll_list_node(node.right, constants)
+        return _apply_binary_operator(node.op, left, right, node.lineno)
+    raise ValueError(f"Unsupported expression at line {getattr(node, 'lineno', '?')}: "
+                     f"{type(node).__name__}")
+
+
+def _apply_binary_operator(op: ast.operator, left: Any, right: Any, lineno: int) -> Any:
+    """Apply a numeric operator, or + on two lists/tuples (e.g. poll_items += [...])."""
+    if isinstance(op, ast.Add) and type(left) is type(right) and isinstance(left, (list, tuple)):
+        return left + right
+    if (type(op) in _BINARY_OPERATORS
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (left, right))):
         try:
-            with open(filepath, 'r', encoding=encoding, errors='strict') as f:
-                data = json.load(f)
-            used_encoding = encoding
-            break
-        except (UnicodeDecodeError, json.JSONDecodeError, LookupError):
+            return _BINARY_OPERATORS[type(op)](left, right)
+        except ArithmeticError as e:
+            raise ValueError(f"Invalid arithmetic at line {lineno}: {e}")
+    raise ValueError(f"Unsupported operation at line {lineno}: {type(op).__name__}")
+
+
+# List methods that change the list they are called on
+_LIST_MUTATORS = frozenset({'append', 'extend', 'insert', 'remove', 'pop', 'clear',
+                            'sort', 'reverse'})
+
+
+def _changed_names(node: ast.AST) -> Set[str]:
+    """Return the names a statement may rebind or mutate (calls of list methods included)."""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif (isinstance(child, (ast.Attribute, ast.Subscript))
+              and not isinstance(child.ctx, ast.Load) and isinstance(child.value, ast.Name)):
+            names.add(child.value.id)
+        elif (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+              and child.func.attr in _LIST_MUTATORS and isinstance(child.func.value, ast.Name)):
+            names.add(child.func.value.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(child.name)
+        elif isinstance(child, ast.alias):
+            names.add((child.asname or child.name).split('.')[0])
+        elif isinstance(child, (ast.Global, ast.Nonlocal)):
+            names.update(child.names)
+    return names
+
+
+def _list_method_call(stmt: ast.stmt) -> Optional[Tuple[str, str, ast.expr]]:
+    """Return (name, method, argument) for a statement like poll_items.append(...)."""
+    if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)):
+        return None
+    call = stmt.value
+    if (isinstance(call.func, ast.Attribute) and call.func.attr in ('append', 'extend')
+            and isinstance(call.func.value, ast.Name)
+            and len(call.args) == 1 and not call.keywords
+            and not isinstance(call.args[0], ast.Starred)):
+        return call.func.value.id, call.func.attr, call.args[0]
+    return None
+
+
+def evaluate_module_constants(tree: ast.Module) -> Dict[str, Any]:
+    """
+    Statically evaluate the module-level assignments of a parsed module.
+
+    Besides assignments, module-level list.append()/extend() calls are
+    applied. Names whose value cannot be evaluated, or which another
+    statement (a loop, an if block, a call of another list method, ...) may
+    change, map to an _Unresolved marker that carries the error message.
+    """
+    constants: Dict[str, Any] = {}
+
+    for stmt in tree.body:
+        method_call = _list_method_call(stmt)
+        if method_call is not None:
+            name, method, arg_node = method_call
+            try:
+                current = constants.get(name)
+                if isinstance(current, _Unresolved):
+                    raise ValueError(current.message)
+                if not isinstance(current, list):
+                    raise ValueError(f"Unsupported {method}() on '{name}' at line {stmt.lineno}")
+                arg = _eval_poll_list_node(arg_node, constants)
+                if method == 'append':
+                    current.append(arg)
+                elif isinstance(arg, (list, tuple)):
+                    current.extend(arg)
+                else:
+                    raise ValueError(f"Unsupported extend() argument at line {stmt.lineno}")
+            except ValueError as e:
+                constants[name] = _Unresolved(str(e))
+            continue
+
+        if isinstance(stmt, ast.AugAssign):
+            if not isinstance(stmt.target, ast.Name):
+                _mark_changed(constants, stmt)
+                continue
+            name = stmt.target.id
+            try:
+                current = constants.get(name)
+                if current is None:
+                    raise ValueError(f"Undefined name '{name}' at line {stmt.lineno}")
+                if isinstance(current, _Unresolved):
+                    raise ValueError(current.message)
+                value = _apply_binary_operator(stmt.op, current,
+                                               _eval_poll_list_node(stmt.value, constants),
+                                               stmt.lineno)
+            except ValueError as e:
+                value = _Unresolved(str(e))
+            constants[name] = value
+            _mark_changed(constants, stmt.value)
+            continue
+
+        if isinstance(stmt, ast.Assign):
+            targets, value_node = stmt.targets, stmt.value
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            targets, value_node = [stmt.target], stmt.value
+        else:
+            _mark_changed(constants, stmt)
             continue
+
+        try:
+            value = _eval_poll_list_node(value_node, constants)
+        except ValueError as e:
+            value = _Unresolved(str(e))
+
+        for target in targets:
+            if isinstance(target, ast.Name):
+                constants[target.id] = value
+            else:
+                _mark_changed(constants, target, stmt.lineno)
+        _mark_changed(constants, value_node)
+
+    return constants
+
+
+def _mark_changed(constants: Dict[str, Any], node: ast.AST, lineno: Optional[int] = None):
+    """Mark the names an unsupported statement may change as unresolved."""
+    lineno = lineno or getattr(node, 'lineno', '?')
+    for name in _changed_names(node):
+        constants[name] = _Unresolved(f"'{name}' is changed by an unsupported "
+                                      f"statement at line {lineno}")
+
+
+def parse_poll_list_source(content: str, filename: str = '<poll_list>') -> List[Tuple]:
+    """
+    Extract poll_items from poll_list source without executing it.
+
+    The module is parsed with ast; module-level assignments are evaluated
+    statically so constants like PollCycle variables resolve. Results are
+    memoized by content hash, so repeated runs over the same file skip parsing.
+    """
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    cached = _poll_list_cache.get(digest)
+    if cached is not None:
+        return list(cached)
+
+    constants = evaluate_module_constants(ast.parse(content, filename))
+
+    if 'poll_items' not in constants:
+        raise ValueError("poll_items not found in file")
+
+    poll_items = constants['poll_items']
+    if isinstance(poll_items, _Unresolved):
+        raise ValueError(f"poll_items could not be evaluated: {poll_items.message}")
+    if not isinstance(poll_items, (list, tuple)):
+        raise ValueError("poll_items must be a list of tuples")
+
+    if len(_poll_list_cache) >= POLL_LIST_CACHE_SIZE:
+        _poll_list_cache.popitem(last=False)
+    _poll_list_cache[digest] = tuple(poll_items)
+
+    return list(poll_items)
+
+
+def load_entities_json(filepath: str, verbose: bool = True,
+                       metrics: Optional['PipelineMetrics'] = None) -> Dict:
+    """Load entities JSON with multiple encoding support."""
+    content, used_encoding = read_text_file(filepath, metrics)
     
-    if used_encoding is None:
-        raise ValueError(f"Could not read JSON file with any encoding: {encodings}")
+    try:
+        with pipeline_stage(metrics, 'decode'):
+            data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in {filepath} ({used_encoding}): {e}")
     
-    print(f"[OK] Successfully read JSON file with {used_encoding} encoding")
+    if verbose:
+        print(f"[OK] Successfully read JSON file with {used_encoding} encoding")
     return data
 
 
+# Read size used when streaming large entities JSON files
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def detect_file_encoding(filepath: str, chunk_size: int = STREAM_CHUNK_SIZE) -> str:
+    """
+    Detect a file's encoding without holding it in memory.
+
+    A BOM decides immediately; otherwise each of INPUT_ENCODINGS is validated
+    chunk by chunk with an incremental decoder.
+    """
+    with open(filepath, 'rb') as f:
+        head = f.read(4)
+        for bom, encoding in INPUT_BOMS:
+            if head.startswith(bom):
+                return encoding
+
+        for encoding in INPUT_ENCODINGS:
+            f.seek(0)
+            decoder = codecs.getincrementaldecoder(encoding)('strict')
+            try:
+                while True:
+                    chunk = f.read(chunk_size)
+                    decoder.decode(chunk, final=not chunk)
+                    if not chunk:
+                        break
+            except UnicodeDecodeError:
+                continue
+            return encoding
+
+    raise ValueError(f"Could not decode input with any encoding: {INPUT_ENCODINGS}")
+
+
+class EntitiesStream:
+    """
+    Incremental reader for homeassistant_entities.json.
+
+    datapoints() yields the entries of the top-level 'datapoints' array one at
+    a time. All other top-level keys (device, mqtt_ha_node_id, dp_prefix, ...)
+    are collected into header as they are passed, so header is complete once
+    datapoints() is exhausted.
+    """
+
+    def __init__(self, filepath: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.encoding = detect_file_encoding(filepath, chunk_size)
+        self.header: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+
+    def datapoints(self) -> Iterator[Dict]:
+        """Yield datapoint objects while collecting the header keys."""
+        with open(self.filepath, 'r', encoding=self.encoding, newline='') as f:
+            self._file = f
+            self._buf = ''
+            self._pos = 0
+            self._eof = False
+
+            self._expect('{')
+            if self._peek() == '}':
+                return
+            while True:
+                key = self._value()
+                if not isinstance(key, str):
+                    raise ValueError(f"Invalid JSON in {self.filepath}: expected object key")
+                self._expect(':')
+                if key == 'datapoints' and self._peek() == '[':
+                    self._expect('[')
+                    if self._peek() == ']':
+                        self._pos += 1
+                    else:
+                        while True:
+                            yield self._value()
+                            if self._separator(']'):
+                                break
+                else:
+                    self.header[key] = self._value()
+                if self._separator('}'):
+                    return
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer; returns False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop consumed text so the buffer stays bounded by one value
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            self._pos = _JSON_WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Invalid JSON in {self.filepath}: expected '{char}'")
+        self._pos += 1
+
+    def _separator(self, closing: str) -> bool:
+        """Consume ',' or the closing bracket; returns True for the closing bracket."""
+        char = self._peek()
+        if char == closing:
+            self._pos += 1
+            return True
+        if char != ',':
+            raise ValueError(f"Invalid JSON in {self.filepath}: expected ',' or '{closing}'")
+        self._pos += 1
+        return False
+
+    def _value(self) -> Any:
+        """Decode the next complete JSON value, reading more chunks as needed."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise ValueError(f"Invalid JSON in {self.filepath}: {e}")
+            # A number or literal at the end of the buffer may continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+# Memo size for the name normalization functions
+NORMALIZE_CACHE_SIZE = 8192
+
+_NON_ALNUM = re.compile(r'[^0-9a-zA-Z]+')
+_NON_ALNUM_LOWER = re.compile(r'[^0-9a-z]+')
+
+# Translation tables for the ASCII fast path. The batch variants keep the
+# newline used to join a whole list of names into one string.
+_ASCII_NON_ALNUM = ''.join(chr(c) for c in range(128)
+                           if chr(c) not in string.ascii_letters + string.digits)
+_BATCH_SEPARATOR = '\n'
+_NON_ALNUM_TO_SPACE = str.maketrans(_ASCII_NON_ALNUM, ' ' * len(_ASCII_NON_ALNUM))
+_DELETE_NON_ALNUM = str.maketrans('', '', _ASCII_NON_ALNUM)
+_BATCH_NON_ALNUM_TO_SPACE = str.maketrans(
+    _ASCII_NON_ALNUM.replace(_BATCH_SEPARATOR, ''),
+    ' ' * (len(_ASCII_NON_ALNUM) - 1))
+_BATCH_DELETE_NON_ALNUM = str.maketrans('', '', _ASCII_NON_ALNUM.replace(_BATCH_SEPARATOR, ''))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_name(name: str) -> str:
     """Convert name to lowercase and replace non-alphanumeric with underscore."""
-    return re.sub(r'[^0-9a-zA-Z]+', '_', name).lower().strip('_')
+    if name.isascii():
+        return '_'.join(name.translate(_NON_ALNUM_TO_SPACE).split()).lower()
+    return _NON_ALNUM.sub('_', name).lower().strip('_')
 
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_for_matching(name: str) -> str:
     """Normalize name for matching - removes all non-alphanumeric."""
-    return re.sub(r'[^0-9a-z]+', '', name.lower())
+    if name.isascii():
+        return name.lower().translate(_DELETE_NON_ALNUM)
+    return _NON_ALNUM_LOWER.sub('', name.lower())
 
 
-def parse_poll_item(item: Tuple) -> Dict[str, Any]:
+def normalize_names(names: Iterable[str], for_matching: bool = False) -> List[str]:
+    """
+    Normalize a whole list of names at once.
+
+    Equivalent to mapping normalize_name (or normalize_for_matching) over
+    names. ASCII lists are joined and translated in a single pass.
+    """
+    names = list(names)
+    if not names:
+        return []
+    joined = _BATCH_SEPARATOR.join(names)
+    if not joined.isascii() or joined.count(_BATCH_SEPARATOR) != len(names) - 1:
+        normalize = normalize_for_matching if for_matching else normalize_name
+        return [normalize(name) for name in names]
+
+    if for_matching:
+        return joined.lower().translate(_BATCH_DELETE_NON_ALNUM).split(_BATCH_SEPARATOR)
+    return ['_'.join(part.split())
+            for part in joined.translate(_BATCH_NON_ALNUM_TO_SPACE).lower().split(_BATCH_SEPARATOR)]
+
+
+class PollItem(NamedTuple):
+    """
+    A parsed poll item.
+
+    extra holds the optional (Scale/Type[, Signed]) elements as written, so
+    items without them are reproduced without them.
+    """
+    pollcycle: Any
+    name: str
+    dpaddr: Any
+    length: Any
+    extra: Tuple = ()
+
+    @property
+    def scale(self) -> Any:
+        return self.extra[0] if self.extra else None
+
+    @property
+    def signed(self) -> Any:
+        return self.extra[1] if len(self.extra) > 1 else None
+
+
+def parse_poll_item(item: Tuple) -> PollItem:
     """
     Parse a poll item tuple.
     Format: ([PollCycle,] Name, DpAddr, Length [, Scale/Type [, Signed]])
     """
-    result = {}
-    idx = 0
-    
     # Check if first element is PollCycle
     if isinstance(item[0], int) and len(item) > 3 and isinstance(item[1], str):
-        result['pollcycle'] = item[0]
+        pollcycle = item[0]
         idx = 1
     else:
-        result['pollcycle'] = 1
+        pollcycle = 1
         idx = 0
     
-    result['name'] = item[idx]
-    result['dpaddr'] = item[idx + 1]
-    result['length'] = item[idx + 2]
-    
-    if idx + 3 < len(item):
-        result['scale'] = item[idx + 3]
-    if idx + 4 < len(item):
-        result['signed'] = item[idx + 4]
-    
-    return result
+    name = item[idx]
+    if isinstance(name, str):
+        name = sys.intern(name)
+    return PollItem(pollcycle, name, item[idx + 1], item[idx + 2], tuple(item[idx + 3:idx + 5]))
 
 
-def create_poll_tuple(poll_data: Dict) -> Tuple:
+def create_poll_tuple(poll_data: PollItem) -> Tuple:
     """Create a poll tuple from poll data, preserving original types."""
-    parts = [
-        poll_data.get('pollcycle', 1),
-        poll_data['name'],
-        poll_data['dpaddr'],
-        poll_data['length']
-    ]
-    
-    if 'scale' in poll_data:
-        parts.append(poll_data['scale'])
-    if 'signed' in poll_data:
-        parts.append(poll_data['signed'])
-    
-    return tuple(parts)
+    return (poll_data.pollcycle, poll_data.name, poll_data.dpaddr, poll_data.length) + poll_data.extra
+
+
+# Domains that reference several datapoints per entity and need manual review
+COMPLEX_DOMAINS = ['climate', 'water_heater']
+
+# Optolink read/write commands inside templates and payloads: "w;0x7902;1;1"
+_COMMAND_ADDRESS = re.compile(r'\b[rw];\s*(0[xX][0-9a-fA-F]+|\d+)\s*;\s*(\d+)')
+
+
+def _is_address_source(key: str) -> bool:
+    """Attributes that may contain Optolink commands (templates and payloads)."""
+    return key.endswith('_template') or key.startswith('payload_')
+
+
+def parse_dpaddr(value: Any) -> Optional[int]:
+    """Convert a DpAddr (int, '0x7902' or '30978') to int, None if invalid."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text, 16) if text[:2].lower() == '0x' else int(text, 10)
+        except ValueError:
+            return None
+    return None
+
+
+def extract_addresses(entity: Dict) -> Set[Tuple[int, int]]:
+    """
+    Extract the (DpAddr, Length) pairs referenced by an entity's commands.
+
+    Scans command_template, payload_on/payload_off and the other *_template
+    and payload_* attributes for Optolink commands like "w;0x7902;1;1".
+    """
+    addresses = set()
+    for key, value in entity.items():
+        if isinstance(value, str) and ';' in value and _is_address_source(key):
+            for addr, length in _COMMAND_ADDRESS.findall(value):
+                addresses.add((parse_dpaddr(addr), int(length)))
+    return addresses
+
+
+def build_address_index(poll_items_map: Dict[str, PollItem]) -> Dict[Tuple[int, int], Optional[str]]:
+    """
+    Index poll items by (DpAddr, Length).
+
+    Maps to the poll_items_map key; addresses shared by several poll items
+    (e.g. bit fields read from the same block) map to None as ambiguous.
+    """
+    index: Dict[Tuple[int, int], Optional[str]] = {}
+    for key, poll_data in poll_items_map.items():
+        dpaddr = parse_dpaddr(poll_data.dpaddr)
+        if dpaddr is None or not isinstance(poll_data.length, int):
+            continue
+        address = (dpaddr, poll_data.length)
+        index[address] = None if address in index else key
+    return index
+
+
+def match_by_address(entity: Dict, address_index: Dict[Tuple[int, int], Optional[str]]) -> Optional[str]:
+    """Return the poll item key addressed by the entity's commands, if unambiguous."""
+    addresses = extract_addresses(entity)
+    if len(addresses) != 1:
+        return None
+    return address_index.get(addresses.pop())
+
+
+# Single-pass placeholder rewriter for Optolink commands ("w;0x3007;2;",
+# "r;0x0101;2"). Only the address and length of a command are rewritten, and
+# only when the address is the entity's DpAddr.
+_COMMAND_REWRITE = re.compile(
+    r'\b(?P<cmd>[rw]);(?P<addr>0[xX][0-9a-fA-F]+|\d+);(?P<len>\d+)\b'
+)
+
+# Memo of rewritten command strings keyed by (text, DpAddr, Length). Fleet
+# installations share device models, so the same templates recur constantly.
+REWRITE_CACHE_SIZE = 16384
+
+
+def _placeholder_replacer(dpaddr: Optional[int], length: Any):
+    """Return the re.sub callback resolving _COMMAND_REWRITE matches for one address."""
+    def replace(match: re.Match) -> str:
+        command, addr, command_length = match.groups()
+        if (int(addr, 16) if addr[1:2] in 'xX' else int(addr)) != dpaddr:
+            return match.group(0)
+        if int(command_length) == length:
+            return f'{command};%DpAddr%;%Length%'
+        return f'{command};%DpAddr%;{command_length}'
+    return replace
+
+
+def _has_command(text: str) -> bool:
+    """Cheap prefilter: only text containing 'r;' or 'w;' can hold a command."""
+    return 'w;' in text or 'r;' in text
+
+
+@lru_cache(maxsize=REWRITE_CACHE_SIZE)
+def _rewrite_commands(text: str, dpaddr: Optional[int], length: Any) -> str:
+    """Rewrite address/length placeholders in text with one memoized regex pass."""
+    match = _COMMAND_REWRITE.search(text)
+    if match is None:
+        return text
+    start, end = match.span()
+    if _has_command(text[end:]):
+        return _COMMAND_REWRITE.sub(_placeholder_replacer(dpaddr, length), text)
+    # A single command (the usual case) is spliced without the re.sub callback
+    command, addr, command_length = match.groups()
+    if (int(addr, 16) if addr[1:2] in 'xX' else int(addr)) != dpaddr:
+        return text
+    if int(command_length) != length:
+        return f'{text[:start]}{command};%DpAddr%;{command_length}{text[end:]}'
+    return f'{text[:start]}{command};%DpAddr%;%Length%{text[end:]}'
 
 
 def transform_command_template(template: str, dpaddr: Any, length: int) -> str:
     """
     Transform command_template to use placeholders.
     
+    The address is recognized in hex (any case) or decimal, and together with
+    the length only inside a read/write command for that address.
+    
     Examples:
         '{{ "w;0x3007;2;"~value*10 }}' -> '{{ "w;%DpAddr%;%Length%;"~value*10 }}'
     """
-    if not template or '%DpAddr%' in template:
+    if not template or '%DpAddr%' in template or not _has_command(template):
         return template
     
-    # Convert dpaddr to hex string
-    if isinstance(dpaddr, int):
-        dpaddr_str = f"0x{dpaddr:04X}"
-    else:
-        dpaddr_str = str(dpaddr)
-    
-    # Replace the address and length in the template
-    template = template.replace(dpaddr_str.lower(), '%DpAddr%')
-    template = template.replace(dpaddr_str.upper(), '%DpAddr%')
-    template = template.replace(dpaddr_str, '%DpAddr%')
-    template = template.replace(f';{length};', ';%Length%;')
-    
-    return template
+    return _rewrite_commands(template, parse_dpaddr(dpaddr), length)
+
+
+def transform_entity_commands(attrs: Dict[str, Any], dpaddr: Any = None,
+                              length: Any = None) -> Dict[str, Any]:
+    """
+    Rewrite every command-bearing attribute of an entity.
+
+    *command_topic 'cmnd' becomes '%mqtt_listen%'. If dpaddr is given, the
+    *command_template and payload_* strings get %DpAddr%/%Length%
+    placeholders (see transform_command_template). Returns a new dict in the
+    same key order.
+    """
+    address = parse_dpaddr(dpaddr) if dpaddr is not None else None
+    result = dict(attrs)
+    for key, value in attrs.items():
+        if not isinstance(value, str) or not value:
+            continue
+        if value == 'cmnd' and key.endswith('command_topic'):
+            result[key] = '%mqtt_listen%'
+        elif (dpaddr is not None and (key.startswith('payload_') or key.endswith('command_template'))
+              and _has_command(value) and '%DpAddr%' not in value):
+            result[key] = _rewrite_commands(value, address, length)
+    return result
+
+
+def transform_commands_batch(entities: Iterable[Tuple[Dict[str, Any], Any, Any]]
+                             ) -> List[Dict[str, Any]]:
+    """
+    Rewrite the command attributes of many entities, given as (attrs, dpaddr,
+    length) tuples (see transform_entity_commands).
+
+    The rewrite memo is shared by the whole batch, so templates repeated
+    across a fleet are rewritten once.
+    """
+    return [transform_entity_commands(attrs, dpaddr, length)
+            for attrs, dpaddr, length in entities]
+
+
+# Minimum trigram similarity for a candidate to be suggested in the report
+FUZZY_SUGGEST_SCORE = 0.5
+FUZZY_MAX_SUGGESTIONS = 3
+# Candidates scored per lookup before probing stops (bounds huge poll lists)
+FUZZY_MAX_CANDIDATES = 1000
+
+
+def name_trigrams(name: str) -> Set[str]:
+    """Trigrams of a normalized name, padded so short names still match."""
+    padded = f"^{name}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PollNameIndex:
+    """
+    Inverted trigram index over normalized poll item names.
+
+    candidates() scores poll items by the Dice coefficient of their trigram
+    sets. With a min_score only the postings of the query's rarest trigrams
+    are probed (prefix filtering): a candidate reaching min_score must share
+    at least one of them, so lookups do not scan the whole poll list.
+
+    Names built from a small vocabulary share most trigrams, so in very
+    large poll lists probing stops at max_candidates; results are exact
+    below that and limited to the candidates sharing the rarest trigrams
+    above it.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = []
+        self._grams: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for name in names:
+            grams = name_trigrams(name)
+            item_id = len(self.names)
+            self.names.append(name)
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings[gram].append(item_id)
+
+    def candidates(self, name: str, limit: int = FUZZY_MAX_SUGGESTIONS,
+                   min_score: float = 0.0,
+                   max_candidates: int = FUZZY_MAX_CANDIDATES) -> List[Tuple[str, float]]:
+        """Return up to limit (name, score) pairs ranked by similarity."""
+        grams = name_trigrams(name)
+        if not grams:
+            return []
+
+        # Dice >= min_score needs at least `required` shared trigrams
+        # (candidates have at least one trigram), so one of the rarest
+        # len(grams) - required + 1 trigrams must be shared.
+        required = max(1, math.ceil(min_score * (len(grams) + 1) / 2))
+        if required > len(grams):
+            return []
+        probe = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        candidate_ids: Set[int] = set()
+        for gram in probe[:len(grams) - required + 1]:
+            postings = self._postings.get(gram, ())
+            if candidate_ids and len(candidate_ids) + len(postings) > max_candidates:
+                break
+            candidate_ids.update(postings)
+
+        scored = []
+        for item_id in candidate_ids:
+            item_grams = self._grams[item_id]
+            score = 2.0 * len(grams & item_grams) / (len(grams) + len(item_grams))
+            if score >= min_score:
+                scored.append((round(score, 3), self.names[item_id]))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(candidate, score) for score, candidate in scored[:limit]]
+
+
+class AliasStore:
+    """
+    Persistent alias dictionary: normalized entity name -> poll item key.
+
+    File layout (little-endian):
+        b'HAALIAS1', uint32 count, count x uint32 record offsets,
+        records b'<key>\\0<value>\\0' (UTF-8) sorted by key bytes
+
+    The file is memory-mapped and lookup() binary-searches the offset table,
+    so queries never load the whole store into Python objects. add() merges
+    new aliases into the current file and rewrites it atomically while
+    holding an exclusive lock on <path>.lock (fcntl; not on Windows), so
+    concurrent writers do not lose each other's aliases. A truncated or
+    corrupt file raises ValueError naming the file.
+    """
+
+    MAGIC = b'HAALIAS1'
+    _HEADER = struct.Struct('<8sI')
+    _OFFSET = struct.Struct('<I')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._mm = None
+        self._count = 0
+        self._data_start = 0
+        self._open()
+
+    def _open(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < self._HEADER.size:
+            self._corrupt("truncated header")
+        magic, self._count = self._HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"Not an alias store: {self.path}")
+        self._data_start = self._HEADER.size + self._count * self._OFFSET.size
+        if self._data_start > len(self._mm) or self._count and self._mm[-1:] != b'\0':
+            self._corrupt(f"truncated ({len(self._mm)} bytes for {self._count} records)")
+
+    def _corrupt(self, reason: str):
+        self.close()
+        raise ValueError(f"Corrupt alias store {self.path}: {reason}; "
+                         f"delete it to start a new store")
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+        self._mm = None
+        self._file = None
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record(self, index: int) -> Tuple[bytes, int]:
+        """Return (key bytes, value start) of the record at index."""
+        offset = self._OFFSET.unpack_from(self._mm, self._HEADER.size + index * self._OFFSET.size)[0]
+        start = self._data_start + offset
+        end = self._mm.find(b'\0', start)
+        if end < 0 or self._mm.find(b'\0', end + 1) < 0:
+            self._corrupt(f"record {index} out of range")
+        return self._mm[start:end], end + 1
+
+    def _value(self, start: int) -> str:
+        return self._mm[start:self._mm.find(b'\0', start)].decode('utf-8')
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Return the poll item key stored for a normalized entity name."""
+        if not self._count:
+            return None
+        key = name.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, value_start = self._record(middle)
+            if record_key == key:
+                return self._value(value_start)
+            if record_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Iterate all (name, poll item key) pairs in key order."""
+        for index in range(self._count):
+            record_key, value_start = self._record(index)
+            yield record_key.decode('utf-8'), self._value(value_start)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the exclusive writer lock of the store."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def add(self, aliases: Dict[str, str]) -> int:
+        """Merge aliases into the store and rewrite it; returns the number of changes."""
+        with self._locked():
+            # Another writer may have replaced the file since it was opened
+            self.close()
+            self._open()
+            return self._add(aliases)
+
+    def _add(self, aliases: Dict[str, str]) -> int:
+        merged = dict(self.items())
+        changed = 0
+        for name, poll_key in aliases.items():
+            if '\0' in name or '\0' in poll_key or not name or not poll_key:
+                continue
+            if merged.get(name) != poll_key:
+                merged[name] = poll_key
+                changed += 1
+        if not changed:
+            return 0
+
+        records = sorted((name.encode('utf-8'), poll_key.encode('utf-8'))
+                         for name, poll_key in merged.items())
+        offsets = []
+        data = bytearray()
+        for key, value in records:
+            offsets.append(len(data))
+            data += key + b'\0' + value + b'\0'
+
+        header = self._HEADER.pack(self.MAGIC, len(records))
+        table = b''.join(self._OFFSET.pack(offset) for offset in offsets)
+
+        self.close()
+        try:
+            write_file_atomic(self.path, header + table + bytes(data))
+        finally:
+            self._open()
+        return changed
+
+
+def learned_aliases(coverage: Dict) -> Dict[str, str]:
+    """Aliases learned from a migration: address matches and accepted fuzzy matches."""
+    aliases = {}
+    for name, poll_name in coverage.get('address_matches', {}).items():
+        aliases[normalize_for_matching(name)] = normalize_for_matching(poll_name)
+    for name, (poll_name, _score) in coverage.get('fuzzy_matches', {}).items():
+        aliases[normalize_for_matching(name)] = normalize_for_matching(poll_name)
+    return aliases
+
+
+# Attributes the units of a domain are grouped by (icon only for sensors)
+GROUPING_KEYS = ('device_class', 'entity_category', 'payload_off', 'payload_on', 'icon')
+
+
+def default_grouping_keys(domain: str) -> Tuple[str, ...]:
+    """Return the fixed grouping keys used for a domain."""
+    if domain in ['binary_sensor', 'sensor']:
+        return GROUPING_KEYS
+    return GROUPING_KEYS[:-1]
 
 
-def group_entities_by_domain(entities: List[Dict], poll_items_map: Dict[str, Dict]) -> Dict:
-    """Group entities by domain and similar attributes."""
+class EntityRecord:
+    """
+    An entity prepared for grouping: its attributes (commands rewritten) and
+    either the poll tuple of its matched poll item or a nopoll tuple.
+
+    Slotted, as a fleet-sized run holds one per datapoint until rendering.
+    """
+    __slots__ = ('attrs', 'original_name', 'poll_tuple', 'nopoll_tuple',
+                 'matched_by', 'match_score', 'suggestions')
+
+    def __init__(self, attrs: Dict[str, Any], original_name: str,
+                 poll_tuple: Optional[Tuple] = None, nopoll_tuple: Optional[Tuple] = None,
+                 matched_by: Optional[str] = None, match_score: Optional[float] = None,
+                 suggestions: Optional[List[Tuple[str, float]]] = None):
+        self.attrs = attrs
+        self.original_name = original_name
+        self.poll_tuple = poll_tuple
+        self.nopoll_tuple = nopoll_tuple
+        self.matched_by = matched_by
+        self.match_score = match_score
+        self.suggestions = suggestions
+
+
+def select_fuzzy_match(candidates: List[Tuple[str, float]], claimed: Set[str],
+                       fuzzy_threshold: float) -> Optional[Tuple[str, float]]:
+    """
+    The candidate to auto-accept: the best one not claimed by another entity,
+    if it reaches fuzzy_threshold and no other candidate has the same score.
+    """
+    free = [candidate for candidate in candidates if candidate[0] not in claimed]
+    if not free or free[0][1] < fuzzy_threshold:
+        return None
+    if len(free) > 1 and free[1][1] == free[0][1]:
+        return None
+    return free[0]
+
+
+def match_candidates(entity: Dict, name_for_matching: str, poll_items_map: Dict[str, PollItem],
+                     address_index: Dict[Tuple[int, int], Optional[str]],
+                     aliases: Optional[AliasStore] = None
+                     ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Return the (name, address, alias) poll item keys an entity may be matched to.
+
+    An exact name match excludes the others. Complex domains address several
+    datapoints and are reviewed manually, so they get no address match.
+    """
+    if name_for_matching in poll_items_map:
+        return name_for_matching, None, None
+    address_key = None
+    if entity.get('domain', 'sensor') not in COMPLEX_DOMAINS:
+        address_key = match_by_address(entity, address_index)
+    alias_key = None
+    if aliases is not None and name_for_matching:
+        alias = aliases.lookup(name_for_matching)
+        if alias in poll_items_map:
+            alias_key = alias
+    return None, address_key, alias_key
+
+
+def group_entities_by_domain(entities: Iterable[Dict], poll_items_map: Dict[str, PollItem],
+                             address_index: Optional[Dict[Tuple[int, int], Optional[str]]] = None,
+                             fuzzy_index: Optional[PollNameIndex] = None,
+                             fuzzy_threshold: Optional[float] = None,
+                             aliases: Optional[AliasStore] = None,
+                             claimed: Iterable[str] = ()) -> Dict:
+    """
+    Group entities by domain and similar attributes (entities may be any iterable).
+
+    Entities are matched to poll items by normalized name first. Address
+    matches (see build_address_index) and alias store matches are decided
+    once all entities are seen, and only for poll items no other entity has
+    claimed, so one poll item never ends up in two entries. Unmatched
+    entities get ranked candidates from fuzzy_index, kept as suggestions
+    for the report.
+
+    With fuzzy_threshold (at least FUZZY_SUGGEST_SCORE) fuzzy matches are
+    auto-accepted in a last pass, once all other matches are known: the
+    best candidate not claimed by another entity is accepted if it reaches
+    the threshold and does not tie with the next candidate. Entities matched
+    this way are added to their units after the others. claimed names poll
+    item keys already used elsewhere (e.g. by domains reused from a cache).
+
+    Units are lists of EntityRecord; attribute keys are interned, so the
+    records of all entities share one key string per attribute name.
+    """
+    if fuzzy_threshold is not None and not FUZZY_SUGGEST_SCORE <= fuzzy_threshold <= 1:
+        raise ValueError(f"Fuzzy threshold must be between {FUZZY_SUGGEST_SCORE} and 1, "
+                         f"got {fuzzy_threshold}")
+    intern = sys.intern
+    if address_index is None:
+        address_index = build_address_index(poll_items_map)
     domains = defaultdict(lambda: {'base_attrs': {}, 'units': defaultdict(list)})
+    claimed = set(claimed)
+    # (domain, group_key, record) in input order; None until an address or
+    # alias match is decided
+    placed = []
+    pending = []
+    deferred = []
     
-    for entity in entities:
-        domain = entity.get('domain', 'sensor')
-        name_normalized = normalize_name(entity.get('name', ''))
-        name_for_matching = normalize_for_matching(entity.get('name', ''))
-        
-        poll_data = poll_items_map.get(name_for_matching)
-        
-        entity_attrs = {}
-        for key, value in entity.items():
-            if key in ['name', 'domain']:
-                continue
-            
-            # Transform command_topic
-            if key == 'command_topic' and value == 'cmnd':
-                entity_attrs[key] = '%mqtt_listen%'
-            # Transform command_template to use placeholders
-            elif key == 'command_template' and poll_data:
-                entity_attrs[key] = transform_command_template(
-                    value, poll_data['dpaddr'], poll_data['length']
-                )
-            else:
-                entity_attrs[key] = value
+    def make_record(entity, domain, poll_key, matched_by, match_score, suggestions):
+        poll_data = poll_items_map.get(poll_key)
+        entity_attrs = {intern(key): value for key, value in entity.items()
+                        if key not in ('name', 'domain')}
+        # Use placeholders for the listen topic, address and length
+        if poll_data:
+            entity_attrs = transform_entity_commands(entity_attrs, poll_data.dpaddr,
+                                                     poll_data.length)
+        else:
+            entity_attrs = transform_entity_commands(entity_attrs)
         
         # Create grouping key
-        group_key = (
-            entity_attrs.get('device_class'),
-            entity_attrs.get('entity_category'),
-            entity_attrs.get('payload_off'),
-            entity_attrs.get('payload_on'),
-            entity_attrs.get('icon') if domain in ['binary_sensor', 'sensor'] else None
-        )
+        group_key = tuple(entity_attrs.get(key) for key in default_grouping_keys(domain))
         
         if poll_data:
-            poll_tuple = create_poll_tuple(poll_data)
-            domains[domain]['units'][group_key].append({
-                'poll_tuple': poll_tuple,
-                'attrs': entity_attrs,
-                'original_name': entity.get('name', '')
-            })
+            record = EntityRecord(entity_attrs, entity.get('name', ''),
+                                  poll_tuple=create_poll_tuple(poll_data),
+                                  matched_by=matched_by, match_score=match_score)
         else:
-            nopoll_tuple = (0, name_normalized, 0x0000, 1, 1, False)
-            domains[domain]['units'][group_key].append({
-                'nopoll_tuple': nopoll_tuple,
-                'attrs': entity_attrs,
-                'original_name': entity.get('name', '')
-            })
+            record = EntityRecord(entity_attrs, entity.get('name', ''),
+                                  nopoll_tuple=(0, normalize_name(entity.get('name', '')),
+                                                0x0000, 1, 1, False),
+                                  suggestions=suggestions)
+        return domain, group_key, record
+    
+    def unmatched(entity, domain, name_for_matching):
+        """Record for an entity without exact, address or alias match (None if deferred)."""
+        suggestions = None
+        if fuzzy_index is not None and name_for_matching:
+            if fuzzy_threshold is not None and domain not in COMPLEX_DOMAINS:
+                # Accepted after all exact, address and alias matches are known
+                deferred.append((entity, domain, name_for_matching))
+                return None
+            candidates = fuzzy_index.candidates(name_for_matching, min_score=FUZZY_SUGGEST_SCORE)
+            if candidates:
+                suggestions = [(poll_items_map[key].name, score) for key, score in candidates]
+        return make_record(entity, domain, None, None, None, suggestions)
+    
+    for entity in entities:
+        domain = entity.get('domain', 'sensor')
+        name_for_matching = normalize_for_matching(entity.get('name', ''))
+        # The domain keeps its place in the input order
+        domains[domain]
+        
+        name_key, address_key, alias_key = match_candidates(entity, name_for_matching,
+                                                            poll_items_map, address_index,
+                                                            aliases)
+        if name_key is not None:
+            claimed.add(name_key)
+            placed.append(make_record(entity, domain, name_key, 'name', None, None))
+            continue
+        
+        if address_key is None and alias_key is None:
+            placed.append(unmatched(entity, domain, name_for_matching))
+            continue
+        pending.append((len(placed), entity, domain, name_for_matching, address_key, alias_key))
+        placed.append(None)
+    
+    # Address matches before alias matches, each only for unclaimed poll items
+    for index, entity, domain, _name, address_key, _alias in pending:
+        if address_key is not None and address_key not in claimed:
+            claimed.add(address_key)
+            placed[index] = make_record(entity, domain, address_key, 'address', None, None)
+    for index, entity, domain, name_for_matching, _address, alias_key in pending:
+        if placed[index] is not None:
+            continue
+        if alias_key is not None and alias_key not in claimed:
+            claimed.add(alias_key)
+            placed[index] = make_record(entity, domain, alias_key, 'alias', None, None)
+        else:
+            placed[index] = unmatched(entity, domain, name_for_matching)
+    
+    for entity, domain, name_for_matching in deferred:
+        candidates = fuzzy_index.candidates(name_for_matching, limit=FUZZY_MAX_CANDIDATES,
+                                            min_score=FUZZY_SUGGEST_SCORE)
+        match = select_fuzzy_match(candidates, claimed, fuzzy_threshold)
+        if match is not None:
+            claimed.add(match[0])
+            placed.append(make_record(entity, domain, match[0], 'fuzzy', match[1], None))
+            continue
+        free = [(key, score) for key, score in candidates if key not in claimed]
+        suggestions = [(poll_items_map[key].name, score)
+                       for key, score in free[:FUZZY_MAX_SUGGESTIONS]] or None
+        placed.append(make_record(entity, domain, None, None, None, suggestions))
+    
+    for placement in placed:
+        if placement is not None:
+            domain, group_key, record = placement
+            domains[domain]['units'][group_key].append(record)
     
     return domains
 
 
-def build_poll_list_structure(entities_json: Dict, poll_items_map: Dict[str, Dict]) -> Tuple[Dict, Dict]:
-    """Build the complete poll_list structure and return coverage info."""
+def new_coverage(poll_items_map: Optional[Dict[str, PollItem]] = None) -> Dict:
+    """Return an empty coverage dict (all_poll_items from poll_items_map)."""
+    return {
+        'used_poll_items': set(),
+        'all_poll_items': set(poll_items_map.keys()) if poll_items_map else set(),
+        'entity_names': set(),
+        'address_matches': {},
+        'alias_matches': {},
+        'fuzzy_matches': {},
+        'suggestions': {},
+        'total_entities': 0,
+    }
+
+
+def merge_coverage(coverage: Dict, part: Dict):
+    """Add the coverage of one domain (see _build_domain_entry) to coverage."""
+    for key, value in part.items():
+        if isinstance(value, set):
+            coverage[key] |= value
+        elif isinstance(value, dict):
+            coverage.setdefault(key, {}).update(value)
+        elif key == 'total_entities':
+            coverage[key] += value
+
+
+def _track_coverage(coverage: Dict, entities: List[EntityRecord]):
+    """Record entity names, used poll items and match details of a group."""
+    for ent in entities:
+        coverage['entity_names'].add(ent.original_name)
+        coverage['total_entities'] += 1
+        if ent.poll_tuple is not None:
+            poll_name = ent.poll_tuple[1]
+            coverage['used_poll_items'].add(normalize_for_matching(poll_name))
+            if ent.matched_by == 'address':
+                coverage['address_matches'][ent.original_name] = poll_name
+            elif ent.matched_by == 'alias':
+                coverage['alias_matches'][ent.original_name] = poll_name
+            elif ent.matched_by == 'fuzzy':
+                coverage['fuzzy_matches'][ent.original_name] = (poll_name, ent.match_score)
+        elif ent.suggestions:
+            coverage['suggestions'][ent.original_name] = ent.suggestions
+
+
+# Attributes that should NOT be promoted to domain/unit level
+ENTITY_SPECIFIC_ATTRS = frozenset({
+    'state_topic', 'current_temperature_topic',
+    'temperature_state_topic', 'mode_state_topic',
+    'preset_mode_state_topic', 'value_template',
+    'max', 'min', 'step', 'mode'
+})
+
+
+def factor_common_attrs(entities: List[EntityRecord],
+                        exclude: Iterable[str] = ENTITY_SPECIFIC_ATTRS) -> Dict:
+    """
+    Return the attributes shared by all entities of a group.
+
+    One pass over the entities, starting from the first entity's attributes
+    and dropping a candidate at its first differing value, so each entity
+    only checks the keys still shared. A value of None also matches
+    entities without that key.
+    """
+    if not entities:
+        return {}
+    common = {key: value for key, value in entities[0].attrs.items() if key not in exclude}
+    for entity in entities[1:]:
+        get = entity.attrs.get
+        for key in [key for key, value in common.items() if get(key) != value]:
+            del common[key]
+        if not common:
+            break
+    return common
+
+
+def _build_unit(entities: List[EntityRecord]) -> Dict:
+    """Build the config of one group: shared attributes plus poll/nopoll lists."""
+    # Single entity without poll data keeps all its attributes
+    if len(entities) == 1 and entities[0].nopoll_tuple is not None:
+        entity = entities[0]
+        unit_config = {'entity_name': entity.nopoll_tuple[1]}
+        unit_config.update(entity.attrs)
+        return unit_config
+    
+    unit_config = factor_common_attrs(entities)
+    poll_list = [ent.poll_tuple for ent in entities if ent.poll_tuple is not None]
+    nopoll_list = [ent.nopoll_tuple for ent in entities if ent.nopoll_tuple is not None]
+    
+    if poll_list:
+        unit_config['poll'] = poll_list
+    if nopoll_list:
+        unit_config['nopoll'] = nopoll_list
+    return unit_config
+
+
+def _build_domain(domain: str, units_data: List[List[EntityRecord]], hoist: bool = False) -> Dict:
+    """
+    Build the config of one domain from its groups of entities.
+
+    A single group is written directly into the domain, several groups as
+    'units'. With hoist, attributes shared by all units move to the domain;
+    the publisher must then read domain attributes as defaults of every unit.
+    """
+    domain_config = {'domain': domain}
+    if len(units_data) == 1:
+        domain_config.update(_build_unit(units_data[0]))
+        
+        # Add warning for complex domains (climate, water_heater)
+        if domain in COMPLEX_DOMAINS and 'entity_name' in domain_config:
+            domain_config['_WARNING'] = (
+                'This is a complex domain. Manual review recommended. '
+                'Templates may need adjustment.'
+            )
+    else:
+        # Multiple groups - use units structure
+        units = [_build_unit(entities) for entities in units_data]
+        if hoist:
+            domain_config.update(_hoist_shared_attrs(units))
+        domain_config['units'] = units
+    
+    return domain_config
+
+
+def _hoist_shared_attrs(units: List[Dict]) -> Dict:
+    """Remove the attributes set to the same value in all units and return them."""
+    shared = {key: value for key, value in units[0].items()
+              if key not in ('entity_name', 'poll', 'nopoll')}
+    for unit in units[1:]:
+        for key in [key for key, value in shared.items()
+                    if key not in unit or unit[key] != value]:
+            del shared[key]
+    for unit in units:
+        for key in shared:
+            del unit[key]
+    return shared
+
+
+def _effective_attrs(units_data: List[List[EntityRecord]]) -> Dict[int, Dict]:
+    """Map id(entity) to the attributes its unit emits for it."""
+    effective = {}
+    for entities in units_data:
+        if len(entities) == 1 and entities[0].nopoll_tuple is not None:
+            attrs = entities[0].attrs
+        else:
+            attrs = factor_common_attrs(entities)
+        for entity in entities:
+            effective[id(entity)] = attrs
+    return effective
+
+
+def _hashable(value: Any) -> Any:
+    """Hashable form of an attribute value (JSON lists and objects become tuples)."""
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    return value
+
+
+def _regroup(entities: List[EntityRecord], keys: Iterable[str]) -> List[List[EntityRecord]]:
+    """Group entities by the values of keys, in order of first appearance."""
+    keys = tuple(keys)
+    groups = defaultdict(list)
+    for entity in entities:
+        attrs = entity.attrs
+        groups[tuple(_hashable(attrs.get(key)) for key in keys)].append(entity)
+    return list(groups.values())
+
+
+def _domain_size(domain_config: Dict) -> int:
+    """Return the size in bytes of a domain config as written to the output."""
+    out = []
+    render_dict(out, domain_config, 2)
+    return len(''.join(out).encode('utf-8'))
+
+
+def optimize_domain_grouping(domain: str, entities: List[EntityRecord],
+                             hoist: bool = False) -> Tuple[Dict, Dict[str, Any]]:
+    """
+    Choose the grouping keys of a domain that minimize the emitted size.
+
+    Greedy search starting from the fixed grouping keys: each round adds or
+    removes the one attribute key that shrinks the rendered domain most.
+    A grouping is only accepted if every entity still gets all attributes
+    the fixed grouping emits for it. If no key change makes the domain
+    smaller, the fixed grouping is kept ('improved' is False in the stats).
+
+    With hoist, attributes shared by all units of the chosen grouping are
+    then moved to the domain (see _hoist_shared_attrs).
+
+    Returns the domain config and stats (baseline/optimized bytes of the
+    grouping, hoisted bytes, keys).
+    """
+    baseline_keys = list(default_grouping_keys(domain))
+    baseline_units = _regroup(entities, baseline_keys)
+    baseline_size = _domain_size(_build_domain(domain, baseline_units))
+    required = _effective_attrs(baseline_units)
+    
+    candidate_keys = list(baseline_keys)
+    for entity in entities:
+        for key in entity.attrs:
+            if key not in ENTITY_SPECIFIC_ATTRS and key not in candidate_keys:
+                candidate_keys.append(key)
+    
+    def preserves_attrs(units_data):
+        effective = _effective_attrs(units_data)
+        for entity in entities:
+            attrs = effective[id(entity)]
+            for key, value in required[id(entity)].items():
+                if key not in attrs or attrs[key] != value:
+                    return False
+        return True
+    
+    best_keys = baseline_keys
+    best_units = baseline_units
+    best_size = baseline_size
+    while True:
+        round_best = None
+        for key in candidate_keys:
+            if key in best_keys:
+                keys = [k for k in best_keys if k != key]
+            else:
+                keys = best_keys + [key]
+            units_data = _regroup(entities, keys)
+            if not preserves_attrs(units_data):
+                continue
+            size = _domain_size(_build_domain(domain, units_data))
+            if size < best_size and (round_best is None or size < round_best[0]):
+                round_best = (size, keys, units_data)
+        if round_best is None:
+            break
+        best_size, best_keys, best_units = round_best
+    
+    domain_config = _build_domain(domain, best_units, hoist=hoist)
+    stats = {
+        'baseline_bytes': baseline_size,
+        'optimized_bytes': best_size,
+        'hoisted_bytes': _domain_size(domain_config) if hoist else None,
+        'baseline_units': len(baseline_units),
+        'optimized_units': len(best_units),
+        'grouping_keys': best_keys,
+        'improved': best_size < baseline_size,
+    }
+    return domain_config, stats
+
+
+def _build_domain_entry(domain: str, units_data: List[List[EntityRecord]],
+                        optimize_grouping: bool = False,
+                        hoist_attrs: bool = False) -> Tuple[Dict, Dict]:
+    """
+    Build the config of one domain and its own coverage part.
+
+    hoist_attrs moves attributes shared by all units to the domain (not for
+    complex domains).
+    """
+    part = new_coverage()
+    for entities in units_data:
+        _track_coverage(part, entities)
+    
+    # Complex domains are reviewed manually and keep the fixed grouping
+    if optimize_grouping and domain not in COMPLEX_DOMAINS:
+        entities = [entity for entities in units_data for entity in entities]
+        domain_config, stats = optimize_domain_grouping(domain, entities, hoist_attrs)
+        part['grouping'] = {domain: stats}
+    else:
+        domain_config = _build_domain(domain, units_data,
+                                      hoist=hoist_attrs and domain not in COMPLEX_DOMAINS)
+    
+    return domain_config, part
+
+
+def domains_sharing_candidates(entities_by_domain: Dict[str, List[Dict]],
+                               poll_items_map: Dict[str, PollItem],
+                               aliases: Optional[AliasStore] = None) -> Set[str]:
+    """
+    Return the domains with a match candidate (match_candidates) that an
+    entity of another domain may also claim.
+
+    Only these domains can lose a poll item to another domain, so the
+    matches of all other domains do not depend on the rest of the input.
+    """
+    address_index = build_address_index(poll_items_map)
+    owners = defaultdict(set)
+    for domain, entities in entities_by_domain.items():
+        for entity in entities:
+            name_for_matching = normalize_for_matching(entity.get('name', ''))
+            for key in match_candidates(entity, name_for_matching, poll_items_map,
+                                        address_index, aliases):
+                if key is not None:
+                    owners[key].add(domain)
+    return {domain for domains in owners.values() if len(domains) > 1 for domain in domains}
+
+
+def build_poll_list_structure(entities_json: Dict, poll_items_map: Dict[str, PollItem],
+                              datapoints: Optional[Iterable[Dict]] = None,
+                              fuzzy_threshold: Optional[float] = None,
+                              aliases: Optional[AliasStore] = None,
+                              optimize_grouping: bool = False,
+                              cache: Optional['MigrationCache'] = None,
+                              metrics: Optional['PipelineMetrics'] = None,
+                              hoist_attrs: bool = False,
+                              suggest: bool = False) -> Tuple[Dict, Dict]:
+    """
+    Build the complete poll_list structure and return coverage info.
+
+    If datapoints is given (e.g. EntitiesStream.datapoints()), it is grouped
+    instead of entities_json['datapoints']; the header keys of entities_json
+    are only read after grouping, so a streamed header may still be filling.
+    fuzzy_threshold enables auto-accepting fuzzy name matches and
+    aliases is consulted for entities whose name matches no poll item.
+    Ranked suggestions for unmatched entities (PollNameIndex) are only
+    computed with suggest or fuzzy_threshold.
+    With optimize_grouping the grouping keys are chosen per domain to
+    minimize the output size (see optimize_domain_grouping); the stats are
+    returned in coverage['grouping']. hoist_attrs moves attributes shared by
+    all units of a domain to the domain. With a cache, the result of every
+    domain whose datapoints are unchanged is reused and only the other
+    domains are grouped (datapoints are then held in memory). Domains whose
+    matches depend on other domains (domains_sharing_candidates, or any
+    domain with fuzzy_threshold) are always grouped. metrics
+    records the 'grouping' (including streamed parsing) and
+    'structure_build' stages.
+    """
+    if datapoints is None:
+        datapoints = entities_json['datapoints']
+    fuzzy_index = None
+    if suggest or fuzzy_threshold is not None:
+        fuzzy_index = PollNameIndex(poll_items_map)
+    
+    def group(entities, claimed=()):
+        return group_entities_by_domain(entities, poll_items_map,
+                                        fuzzy_index=fuzzy_index,
+                                        fuzzy_threshold=fuzzy_threshold,
+                                        aliases=aliases, claimed=claimed)
+    
+    entries = {}
+    if cache is None:
+        with pipeline_stage(metrics, 'grouping'):
+            grouped = group(datapoints)
+        with pipeline_stage(metrics, 'structure_build'):
+            for domain, domain_data in grouped.items():
+                entries[domain] = _build_domain_entry(domain, list(domain_data['units'].values()),
+                                                      optimize_grouping, hoist_attrs)
+    else:
+        with pipeline_stage(metrics, 'grouping'):
+            by_domain = defaultdict(list)
+            for entity in datapoints:
+                by_domain[entity.get('domain', 'sensor')].append(entity)
+            dependent = domains_sharing_candidates(by_domain, poll_items_map, aliases)
+            domain_keys = {}
+            missing = []
+            claimed = set()
+            for domain, entities in by_domain.items():
+                domain_keys[domain] = cache.domain_key(domain, entities)
+                entries[domain] = None
+                if fuzzy_threshold is None and domain not in dependent:
+                    entries[domain] = cache.load('domains', domain_keys[domain])
+                if entries[domain] is None:
+                    missing.extend(entities)
+                else:
+                    claimed |= entries[domain][1]['used_poll_items']
+            grouped = group(missing, claimed)
+        with pipeline_stage(metrics, 'structure_build'):
+            for domain, domain_data in grouped.items():
+                entries[domain] = _build_domain_entry(domain, list(domain_data['units'].values()),
+                                                      optimize_grouping, hoist_attrs)
+                if fuzzy_threshold is None and domain not in dependent:
+                    cache.store('domains', domain_keys[domain], entries[domain])
+    
     result = {
         'device': entities_json.get('device', {}),
         'node_id': entities_json.get('mqtt_ha_node_id', '').rstrip('/'),
@@ -227,122 +1598,18 @@ def build_poll_list_structure(entities_json: Dict, poll_items_map: Dict[str, Dic
         'mqtt_delay': 0.1,
     }
     
-    grouped = group_entities_by_domain(entities_json['datapoints'], poll_items_map)
-    
     # Track which poll items were used
-    used_poll_items = set()
-    entity_names = set()
-    
-    # Attributes that should NOT be promoted to domain level
-    entity_specific_attrs = {
-        'state_topic', 'current_temperature_topic',
-        'temperature_state_topic', 'mode_state_topic', 
-        'preset_mode_state_topic', 'value_template',
-        'max', 'min', 'step', 'mode'
-    }
+    coverage = new_coverage(poll_items_map)
+    if optimize_grouping:
+        coverage['grouping'] = {}
     
     domains = []
-    for domain, domain_data in grouped.items():
-        domain_config = {'domain': domain}
-        units_data = domain_data['units']
-        
-        # Check if this is a complex domain (climate, water_heater)
-        is_complex_domain = domain in ['climate', 'water_heater']
-        
-        if len(units_data) == 1:
-            # Single group
-            group_key, entities = list(units_data.items())[0]
-            
-            # Track entity names
-            for ent in entities:
-                entity_names.add(ent['original_name'])
-                if 'poll_tuple' in ent:
-                    used_poll_items.add(normalize_for_matching(ent['poll_tuple'][1]))
-            
-            # Check if single entity without poll data
-            if len(entities) == 1 and 'nopoll_tuple' in entities[0]:
-                entity = entities[0]
-                domain_config['entity_name'] = entity['nopoll_tuple'][1]
-                for key, value in entity['attrs'].items():
-                    domain_config[key] = value
-                
-                # Add warning for complex domains
-                if is_complex_domain:
-                    domain_config['_WARNING'] = (
-                        'This is a complex domain. Manual review recommended. '
-                        'Templates may need adjustment.'
-                    )
-            else:
-                # Multiple entities or has poll data
-                if entities:
-                    first_entity = entities[0]['attrs']
-                    for key, value in first_entity.items():
-                        if key in entity_specific_attrs:
-                            continue
-                        if all(e['attrs'].get(key) == value for e in entities):
-                            domain_config[key] = value
-                
-                poll_list = [ent['poll_tuple'] for ent in entities if 'poll_tuple' in ent]
-                nopoll_list = [ent['nopoll_tuple'] for ent in entities if 'nopoll_tuple' in ent]
-                
-                if poll_list:
-                    domain_config['poll'] = poll_list
-                if nopoll_list:
-                    domain_config['nopoll'] = nopoll_list
-            
-            domains.append(domain_config)
-        
-        else:
-            # Multiple groups - use units structure
-            units = []
-            for group_key, entities in units_data.items():
-                unit_config = {}
-                
-                # Track entity names
-                for ent in entities:
-                    entity_names.add(ent['original_name'])
-                    if 'poll_tuple' in ent:
-                        used_poll_items.add(normalize_for_matching(ent['poll_tuple'][1]))
-                
-                # Check if single entity without poll data
-                if len(entities) == 1 and 'nopoll_tuple' in entities[0]:
-                    entity = entities[0]
-                    unit_config['entity_name'] = entity['nopoll_tuple'][1]
-                    for key, value in entity['attrs'].items():
-                        unit_config[key] = value
-                else:
-                    # Multiple entities or has poll data
-                    if entities:
-                        first_entity = entities[0]['attrs']
-                        for key, value in first_entity.items():
-                            if key in entity_specific_attrs:
-                                continue
-                            if all(e['attrs'].get(key) == value for e in entities):
-                                unit_config[key] = value
-                    
-                    poll_list = [ent['poll_tuple'] for ent in entities if 'poll_tuple' in ent]
-                    nopoll_list = [ent['nopoll_tuple'] for ent in entities if 'nopoll_tuple' in ent]
-                    
-                    if poll_list:
-                        unit_config['poll'] = poll_list
-                    if nopoll_list:
-                        unit_config['nopoll'] = nopoll_list
-                
-                units.append(unit_config)
-            
-            domain_config['units'] = units
-            domains.append(domain_config)
+    for domain_config, part in entries.values():
+        merge_coverage(coverage, part)
+        domains.append(domain_config)
     
     result['domains'] = domains
     
-    # Build coverage report
-    coverage = {
-        'used_poll_items': used_poll_items,
-        'all_poll_items': set(poll_items_map.keys()),
-        'entity_names': entity_names,
-        'total_entities': len(entities_json.get('datapoints', []))
-    }
-    
     return result, coverage
 
 
@@ -385,48 +1652,54 @@ def format_string(s: str) -> str:
     return f'"{s}"'
 
 
-def write_dict(f, d: Dict, indent: int = 0, comment_out: bool = False):
-    """Write a dict with proper formatting."""
+def render_dict(out: List[str], d: Dict, indent: int = 0, comment_out: bool = False,
+                constants: Optional[Dict[str, str]] = None):
+    """
+    Append a formatted dict to out (the dict is not modified).
+
+    String values found in constants are written as the constant's name.
+    """
     ind = '    ' * indent
     prefix = '# ' if comment_out else ''
     
-    # Check for warning
-    warning = d.pop('_WARNING', None)
-    
-    f.write('{\n')
+    out.append('{\n')
     
+    # Check for warning
+    warning = d.get('_WARNING')
     if warning:
-        f.write(f'{prefix}{ind}    # WARNING: {warning}\n')
+        out.append(f'{prefix}{ind}    # WARNING: {warning}\n')
     
-    items = list(d.items())
+    items = [(key, value) for key, value in d.items() if key != '_WARNING']
+    last = len(items) - 1
     for i, (key, value) in enumerate(items):
-        comma = ',' if i < len(items) - 1 else ''
-        f.write(f'{prefix}{ind}    "{key}": ')
+        out.append(f'{prefix}{ind}    "{key}": ')
         
         if isinstance(value, dict):
-            write_dict(f, value, indent + 1, comment_out)
+            render_dict(out, value, indent + 1, comment_out, constants)
         elif isinstance(value, list):
-            write_list(f, value, indent + 1, comment_out)
+            render_list(out, value, indent + 1, comment_out, constants)
         elif isinstance(value, str):
-            f.write(format_string(value))
+            out.append((constants.get(value) or format_string(value)) if constants
+                       else format_string(value))
         elif isinstance(value, bool):
-            f.write('True' if value else 'False')
+            out.append('True' if value else 'False')
         elif isinstance(value, (int, float)):
-            f.write(str(value))
+            out.append(str(value))
         elif value is None:
-            f.write('None')
+            out.append('None')
         else:
-            f.write(repr(value))
+            out.append(repr(value))
         
-        f.write(comma + '\n')
+        out.append(',\n' if i < last else '\n')
     
-    f.write(f'{prefix}{ind}}}')
+    out.append(f'{prefix}{ind}}}')
 
 
-def write_list(f, lst: List, indent: int = 0, comment_out: bool = False):
-    """Write a list with proper formatting."""
+def render_list(out: List[str], lst: List, indent: int = 0, comment_out: bool = False,
+                constants: Optional[Dict[str, str]] = None):
+    """Append a formatted list to out (strings in constants by name, as render_dict)."""
     if not lst:
-        f.write('[]')
+        out.append('[]')
         return
     
     ind = '    ' * indent
@@ -434,126 +1707,1375 @@ def write_list(f, lst: List, indent: int = 0, comment_out: bool = False):
     
     # Check if list of tuples (poll items)
     if isinstance(lst[0], tuple):
-        f.write('[\n')
+        out.append('[\n')
+        line_prefix = f'{prefix}{ind}    '
         for item in lst:
-            formatted = format_tuple(item)
-            f.write(f'{prefix}{ind}    {formatted},\n')
-        f.write(f'{prefix}{ind}]')
+            out.append(f'{line_prefix}{format_tuple(item)},\n')
+        out.append(f'{prefix}{ind}]')
     
     # Check if list of dicts (units)
     elif isinstance(lst[0], dict):
-        f.write('[\n')
+        out.append('[\n')
         for item in lst:
-            f.write(f'{prefix}{ind}    ')
-            write_dict(f, item, indent + 1, comment_out)
-            f.write(',\n')
-        f.write(f'{prefix}{ind}]')
+            out.append(f'{prefix}{ind}    ')
+            render_dict(out, item, indent + 1, comment_out, constants)
+            out.append(',\n')
+        out.append(f'{prefix}{ind}]')
     
     # Simple list
     else:
-        f.write('[')
-        for i, item in enumerate(lst):
-            if isinstance(item, str):
-                f.write(format_string(item))
-            else:
-                f.write(repr(item))
-            if i < len(lst) - 1:
-                f.write(', ')
-        f.write(']')
+        constants = constants or {}
+        out.append('[')
+        out.append(', '.join((constants.get(item) or format_string(item)) if isinstance(item, str)
+                             else repr(item) for item in lst))
+        out.append(']')
 
 
-def write_poll_list_file(poll_list: Dict, output_path: str, coverage: Dict):
-    """Write the poll_list structure to a Python file with UTF-8 encoding."""
-    with open(output_path, 'w', encoding='utf-8', newline='\n') as f:
-        # Header
-        f.write("""'''
+def write_dict(f, d: Dict, indent: int = 0, comment_out: bool = False):
+    """Write a dict with proper formatting."""
+    out = []
+    render_dict(out, d, indent, comment_out)
+    f.write(''.join(out))
+
+
+def write_list(f, lst: List, indent: int = 0, comment_out: bool = False):
+    """Write a list with proper formatting."""
+    out = []
+    render_list(out, lst, indent, comment_out)
+    f.write(''.join(out))
+
+
+OUTPUT_HEADER = """'''
    Copyright 2026 matthias-oe
 
    Licensed under the GNU GENERAL PUBLIC LICENSE, Version 3 (the "License");
    you may not use this file except in compliance with the License.
    You may obtain a copy of the License at
 
-       https://www.gnu.org/licenses/gpl-3.0.html
+       https://www.gnu.org/licenses/gpl-3.0.html
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   This file was automatically generated by migrate_ha_entities_to_ha_publish.py
+   
+   IMPORTANT - Manual Review Required:
+   The migration has created a foundation and migrated as much as possible,
+   but manual adjustments are needed for a working result - especially for
+   templates and complex domains.
+   
+   This script provides an alternative definition for Optolink-Splitter datapoints,
+   enhanced with MQTT publishing attributes for Home Assistant entities.
+   
+   The 'poll_list' is processed in the homeassistant_adapter with the appropriate
+   conversion for its use in the Optolink Splitter. Additionally, the 'poll_list'
+   will be utilized in homeassistant_publish.py to publish Home Assistant entities
+   via MQTT.
+'''
+
+"""
+
+
+# Line written before every commented out domain (parsed back by verification)
+COMMENTED_DOMAIN_NOTE = 'NOTE: Complex domain - please review and uncomment after verification'
+
+
+def is_commented_out(domain_config: Dict) -> bool:
+    """Complex domains without poll data are written commented out for review."""
+    return domain_config.get('domain') in COMPLEX_DOMAINS and 'entity_name' in domain_config
+
+
+def render_poll_list(poll_list: Dict, coverage: Dict,
+                     constants: Optional[Dict[str, str]] = None) -> str:
+    """
+    Render the poll_list structure and migration report as Python source.
+
+    With constants (find_string_constants) the shared strings are defined
+    once as module-level constants and referenced from the poll_list.
+    """
+    out = [OUTPUT_HEADER]
+    
+    # Write coverage report as comments
+    if coverage:
+        unused = coverage['all_poll_items'] - coverage['used_poll_items']
+        fuzzy_matches = coverage.get('fuzzy_matches', {})
+        suggestions = coverage.get('suggestions', {})
+        if unused or fuzzy_matches or suggestions:
+            out.append("# ======================================================================\n")
+            out.append("# This report was automatically generated by migrate_ha_entities_to_ha_publish.py\n")
+            out.append("# ======================================================================\n")
+            out.append("#\n")
+            out.append("# MIGRATION REPORT:\n")
+            out.append(f"# - Total entities processed: {coverage['total_entities']}\n")
+            out.append(f"# - Poll items used: {len(coverage['used_poll_items'])}\n")
+            out.append(f"# - Poll items NOT used: {len(unused)}\n")
+            if unused:
+                out.append("#\n# Unused poll items (may need manual review):\n")
+                for item in sorted(unused):
+                    out.append(f"#   - {item}\n")
+            if fuzzy_matches:
+                out.append("#\n# Fuzzy matched entities (please verify):\n")
+                for name, (poll_name, score) in sorted(fuzzy_matches.items()):
+                    out.append(f"#   - {name} -> {poll_name} ({score:.2f})\n")
+            if suggestions:
+                out.append("#\n# Suggested poll items for entities without match:\n")
+                for name, candidates in sorted(suggestions.items()):
+                    ranked = ', '.join(f"{poll_name} ({score:.2f})" for poll_name, score in candidates)
+                    out.append(f"#   - {name}: {ranked}\n")
+            out.append("\n")
+    
+    if constants:
+        out.append(render_string_constants(constants))
+    
+    out.append("poll_list = {\n")
+    
+    # Write top-level keys
+    for key in ['device', 'node_id', 'dp_prefix', 'discovery_prefix', 'beautifier',
+                'poll_interval', 'mqtt_delay']:
+        if key in poll_list:
+            out.append(f'    "{key}": ')
+            value = poll_list[key]
+            
+            if isinstance(value, dict):
+                render_dict(out, value, 1, constants=constants)
+            elif isinstance(value, list):
+                render_list(out, value, 1, constants=constants)
+            elif isinstance(value, str):
+                out.append(repr(value))
+            elif isinstance(value, (int, float)):
+                out.append(str(value))
+            else:
+                out.append(repr(value))
+            
+            out.append(',\n')
+    
+    # Write domains
+    out.append('    "domains": [\n')
+    
+    for domain in poll_list.get('domains', []):
+        # Check if this should be commented out
+        comment_out = is_commented_out(domain)
+        
+        if comment_out:
+            out.append('\n# ' + ' '*8 + COMMENTED_DOMAIN_NOTE + '\n')
+            out.append('# ' + ' '*8)
+        else:
+            out.append('        ')
+        
+        render_dict(out, domain, 2, comment_out, constants)
+        out.append(',\n')
+    
+    out.append('    ]\n')
+    out.append('}\n')
+    return ''.join(out)
+
+
+def _rendered_strings(value: Any, key: str = '') -> Iterator[Tuple[str, str]]:
+    """(key, string) for every string render_dict/render_list write as a literal."""
+    if isinstance(value, dict):
+        for item_key, item in value.items():
+            if item_key != '_WARNING':
+                yield from _rendered_strings(item, item_key)
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, (dict, str)):
+                yield from _rendered_strings(item, key)
+    elif isinstance(value, str):
+        yield key, value
+
+
+def _constant_name(key: str, taken: Set[str]) -> str:
+    """Short unused constant name from the initials of attribute key (command_template: CT1)."""
+    base = ''.join(part[0] for part in re.split(r'[^0-9A-Za-z]+', key) if part).upper() or 'S'
+    if base[0].isdigit():
+        base = f"S{base}"
+    index = 1
+    while f"{base}{index}" in taken:
+        index += 1
+    return f"{base}{index}"
+
+
+def find_string_constants(poll_list: Dict) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Choose the strings of the poll_list to write once as module-level constants.
+
+    A string becomes a constant (named by the initials of the attribute it
+    first appears under) when referencing it by name saves more bytes than its definition
+    costs; none are chosen unless the file shrinks overall. Returns (constant names by string, stats) with the string
+    references, distinct strings, constants, the references they replace
+    and the bytes saved.
+    """
+    counts = Counter()
+    keys = {}
+    for key, value in _rendered_strings({key: value for key, value in poll_list.items()
+                                         if isinstance(value, (dict, list))}):
+        counts[value] += 1
+        keys.setdefault(value, key)
+    
+    constants = {}
+    taken = set()
+    saved = 0
+    for value, key in keys.items():
+        literal = len(format_string(value).encode('utf-8'))
+        name = _constant_name(key, taken)
+        gain = counts[value] * (literal - len(name)) - len(f"{name} = \n") - literal
+        if gain > 0:
+            constants[value] = name
+            taken.add(name)
+            saved += gain
+    if constants:
+        saved -= len(STRING_CONSTANTS_HEADER) + 1
+        if saved <= 0:
+            constants, saved = {}, 0
+    
+    stats = {
+        'strings': sum(counts.values()),
+        'distinct': len(counts),
+        'constants': len(constants),
+        'references': sum(counts[value] for value in constants),
+        'bytes_saved': saved,
+    }
+    return constants, stats
+
+
+def print_interning_report(stats: Dict[str, Any], output_path: str):
+    """Print the dedup ratio of the string constants."""
+    ratio = stats['strings'] / stats['distinct'] if stats['distinct'] else 1.0
+    size = os.path.getsize(output_path)
+    before = size + stats['bytes_saved']
+    percent = 100.0 * stats['bytes_saved'] / before if before else 0.0
+    print(f"\n[INFO] String interning: {stats['strings']} strings, {stats['distinct']} distinct "
+          f"(dedup ratio {ratio:.2f})")
+    print(f"     - {stats['constants']} constants replace {stats['references']} literals, "
+          f"{before} -> {size} bytes ({percent:.1f}% smaller)")
+
+
+STRING_CONSTANTS_HEADER = "# Strings shared by several entities, referenced from poll_list below\n"
+
+
+def render_string_constants(constants: Dict[str, str]) -> str:
+    """Module-level definitions of the string constants (followed by a blank line)."""
+    lines = [STRING_CONSTANTS_HEADER]
+    lines.extend(f"{name} = {format_string(value)}\n" for value, name in constants.items())
+    lines.append("\n")
+    return ''.join(lines)
+
+
+def write_file_atomic(path: str, data: bytes):
+    """
+    Write data to path via a temp file in the same directory and os.replace,
+    so readers see either the old or the new file, never a partial one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if os.path.exists(path):
+        mode = os.stat(path).st_mode & 0o777
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}-', suffix='.tmp',
+                                    dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_poll_list_file(poll_list: Dict, output_path: str, coverage: Dict,
+                         metrics: Optional['PipelineMetrics'] = None,
+                         constants: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Write the poll_list structure to a Python file with UTF-8 encoding.
+
+    The file is rendered in memory and replaced atomically. If it already
+    has the same content it is left untouched; returns whether it was written.
+    constants are passed on to render_poll_list.
+    """
+    with pipeline_stage(metrics, 'render'):
+        data = render_poll_list(poll_list, coverage, constants).encode('utf-8')
+    with pipeline_stage(metrics, 'write'):
+        return write_file_if_changed(output_path, data)
+
+
+def write_file_if_changed(path: str, data: bytes) -> bool:
+    """Write data atomically unless path already has this content; returns whether written."""
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    write_file_atomic(path, data)
+    return True
+
+
+# ======================================================================
+# Fast-load output formats
+# ======================================================================
+
+# Files written next to the Python output: name.json, name.marshal and the
+# byte-compiled __pycache__/name.cpython-XY.pyc that imports pick up
+FAST_LOAD_FORMATS = ('json', 'marshal', 'pyc')
+
+# Keys of poll_list dicts whose lists hold tuples (lost in JSON)
+_TUPLE_LIST_KEYS = ('poll', 'nopoll')
+
+
+def active_poll_list(poll_list: Dict) -> Dict:
+    """The poll_list as the generated file defines it (commented out domains removed)."""
+    active = dict(poll_list)
+    active['domains'] = [domain for domain in poll_list.get('domains', [])
+                         if not is_commented_out(domain)]
+    return active
+
+
+def fast_load_path(output_path: str, fmt: str) -> str:
+    """Path of the fast-load file of output_path in format fmt."""
+    if fmt == 'pyc':
+        return importlib.util.cache_from_source(output_path)
+    return f"{os.path.splitext(output_path)[0]}.{fmt}"
+
+
+def write_fast_load_files(poll_list: Dict, output_path: str,
+                          formats: Iterable[str]) -> Dict[str, str]:
+    """
+    Write the poll_list of output_path in the given FAST_LOAD_FORMATS.
+
+    json is canonical (sorted keys, compact, UTF-8); marshal keeps tuples
+    but is only read by the same Python version; pyc compiles the written
+    Python file. Returns the written paths by format.
+    """
+    paths = {}
+    active = None
+    for fmt in formats:
+        path = fast_load_path(output_path, fmt)
+        if fmt == 'pyc':
+            py_compile.compile(output_path, cfile=path, doraise=True)
+        else:
+            if active is None:
+                active = active_poll_list(poll_list)
+            if fmt == 'json':
+                data = json.dumps(active, ensure_ascii=False, sort_keys=True,
+                                  separators=(',', ':')).encode('utf-8')
+            elif fmt == 'marshal':
+                data = marshal.dumps(active)
+            else:
+                raise ValueError(f"Unknown fast-load format: {fmt}")
+            write_file_if_changed(path, data)
+        paths[fmt] = path
+    return paths
+
+
+def parse_fast_load_formats(value: str) -> Tuple[str, ...]:
+    """Parse a comma separated list of FAST_LOAD_FORMATS."""
+    formats = tuple(fmt.strip() for fmt in value.split(',') if fmt.strip())
+    unknown = [fmt for fmt in formats if fmt not in FAST_LOAD_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown fast-load format: {', '.join(unknown)}")
+    return formats
+
+
+def _restore_poll_tuples(value: Any) -> Any:
+    """Turn the poll/nopoll entries of a JSON-loaded poll_list back into tuples."""
+    if isinstance(value, dict):
+        return {key: ([tuple(entry) for entry in item] if key in _TUPLE_LIST_KEYS
+                      else _restore_poll_tuples(item))
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore_poll_tuples(item) for item in value]
+    return value
+
+
+def fast_load_source(path: str) -> Optional[str]:
+    """Path of the generated Python file a fast-load file was written from (None if not one)."""
+    base, ext = os.path.splitext(path)
+    if ext == '.pyc':
+        try:
+            return importlib.util.source_from_cache(path)
+        except ValueError:
+            return None
+    if ext in ('.json', '.marshal'):
+        return f"{base}.py"
+    return None
+
+
+def _pyc_matches_source(data: bytes, source: str) -> bool:
+    """Check a .pyc header against its source file, as the import system does."""
+    flags = int.from_bytes(data[4:8], 'little')
+    if flags & 0b1:
+        with open(source, 'rb') as f:
+            return data[8:16] == importlib.util.source_hash(f.read())
+    st = os.stat(source)
+    return (int.from_bytes(data[8:12], 'little') == int(st.st_mtime) & 0xFFFFFFFF
+            and int.from_bytes(data[12:16], 'little') == st.st_size & 0xFFFFFFFF)
+
+
+def _read_fast_load_file(path: str, ext: str, source: Optional[str]) -> Optional[Dict]:
+    """Decode a .json, .marshal or .pyc poll_list; None if it is stale against source."""
+    if ext != '.pyc' and source and os.stat(path).st_mtime_ns < os.stat(source).st_mtime_ns:
+        return None
+    # marshal.load on a file object reads object by object; one read is faster
+    with open(path, 'rb') as f:
+        data = f.read()
+    if ext == '.json':
+        return _restore_poll_tuples(json.loads(data))
+    if ext == '.marshal':
+        return marshal.loads(data)
+    if data[:4] != importlib.util.MAGIC_NUMBER:
+        raise ValueError(f"{path} was compiled by a different Python version")
+    if source and not _pyc_matches_source(data, source):
+        return None
+    namespace = {}
+    exec(marshal.loads(data[16:]), namespace)
+    return namespace['poll_list']
+
+
+def load_poll_list(path: str) -> Dict:
+    """
+    Load poll_list from a generated file by its extension.
+
+    .json and .marshal are decoded; .pyc and .py are executed (a .py is
+    imported, so its __pycache__ .pyc is used when valid). A .json, .marshal
+    or .pyc file that is older than the generated .py it was written from,
+    compiled from another version of it or unreadable by this Python falls
+    back to loading that .py. Only load files you generated: marshal, pyc
+    and py are not safe for untrusted input.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext in ('.json', '.marshal', '.pyc'):
+        source = fast_load_source(path)
+        if source is not None and not os.path.exists(source):
+            source = None
+        try:
+            poll_list = _read_fast_load_file(path, ext, source)
+        except (ValueError, EOFError, TypeError):
+            if source is None:
+                raise
+            poll_list = None
+        if poll_list is not None:
+            return poll_list
+        path = source
+    spec = importlib.util.spec_from_file_location('_generated_poll_list', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.poll_list
+
+
+# ======================================================================
+# MQTT discovery plan
+# ======================================================================
+
+# Tick of the plan's batches; the announce rate defaults to the publisher's,
+# as homeassistant_publish.py sends one message per mqtt_delay (0.1s = 10/s)
+DISCOVERY_BATCH_INTERVAL = 0.1
+
+# Keys of domain/unit configs that are structure, not discovery attributes
+_STRUCTURE_KEYS = frozenset({'domain', 'units', 'poll', 'nopoll', 'entity_name', '_WARNING'})
+
+# Domains without a state topic
+_STATELESS_DOMAINS = frozenset({'button'})
+
+
+def beautify_name(name: str, beautifier: Dict[str, List[str]]) -> str:
+    """
+    Display name of a datapoint: words split at '_' and capitalized, words in
+    beautifier['fixed'] written as given, 'search' replaced by 'replace'
+    (e.g. 'ue' -> 'ü') in the other words.
+    """
+    fixed = {word.upper(): word for word in beautifier.get('fixed', [])}
+    replacements = list(zip(beautifier.get('search', []), beautifier.get('replace', [])))
+    words = []
+    for word in name.split('_'):
+        if not word:
+            continue
+        if word.upper() in fixed:
+            words.append(fixed[word.upper()])
+            continue
+        word = word.capitalize()
+        for search, replace in replacements:
+            word = word.replace(search, replace)
+        words.append(word)
+    return ' '.join(words)
+
+
+def _resolve_placeholders(value: Any, mqtt_listen: str, dpaddr: Any = None,
+                          length: Any = None) -> Any:
+    """Fill in %mqtt_listen%, %DpAddr% and %Length% (if given) in a string value."""
+    if not isinstance(value, str) or '%' not in value:
+        return value
+    value = value.replace('%mqtt_listen%', mqtt_listen)
+    if dpaddr is not None:
+        value = value.replace('%DpAddr%', f"0x{dpaddr:04X}" if isinstance(dpaddr, int) else str(dpaddr))
+    if length is not None:
+        value = value.replace('%Length%', str(length))
+    return value
+
+
+def _discovery_attrs(attrs: Dict[str, Any], mqtt_topic: str, mqtt_listen: str) -> Dict[str, Any]:
+    """Attributes with listen and relative state topics resolved."""
+    resolved = {}
+    for key, value in attrs.items():
+        value = _resolve_placeholders(value, mqtt_listen)
+        # State topics name the datapoint the splitter publishes under mqtt_topic
+        if (key.endswith('_topic') and isinstance(value, str) and value
+                and '/' not in value and '%' not in value):
+            value = f"{mqtt_topic}/{value}"
+        resolved[key] = value
+    return resolved
+
+
+def publisher_rate(poll_list: Dict) -> float:
+    """Messages per second the publisher sends: one per mqtt_delay of poll_list."""
+    delay = poll_list.get('mqtt_delay')
+    if isinstance(delay, bool) or not isinstance(delay, (int, float)) or delay <= 0:
+        raise ValueError(f"poll_list has no positive mqtt_delay ({delay!r}); "
+                         f"give the discovery rate explicitly")
+    return 1.0 / delay
+
+
+def build_discovery_plan(poll_list: Dict, mqtt_topic: str, mqtt_listen: str,
+                         rate: Optional[float] = None,
+                         batch_interval: float = DISCOVERY_BATCH_INTERVAL) -> Dict[str, Any]:
+    """
+    Expand poll_list into one Home Assistant discovery message per entity.
+
+    Every poll/nopoll entry of the active domains becomes a message on
+    <discovery_prefix>/<domain>/<node_id>/<dp_prefix><name>/config whose
+    payload is the domain and unit attributes plus name (beautified),
+    unique_id, state_topic (<mqtt_topic>/<name>) and device; placeholders
+    are filled in. Payload parts shared by several entities (device, unit
+    attributes) are stored once in 'fragments' and referenced by index;
+    expand_discovery_payload() rebuilds a payload.
+
+    mqtt_topic and mqtt_listen are the splitter's MQTT settings
+    (settings_ini.py). Messages are split into batches of
+    round(rate * batch_interval), to be published every batch_interval
+    seconds (see replay_discovery_plan); rate defaults to publisher_rate().
+    Entities resolving to the same topic are reported in 'duplicate_topics'
+    (the later one wins).
+    """
+    beautifier = poll_list.get('beautifier', {})
+    node_id = poll_list.get('node_id', '')
+    dp_prefix = poll_list.get('dp_prefix', '')
+    discovery_prefix = poll_list.get('discovery_prefix', 'homeassistant')
+    
+    fragments = []
+    fragment_index = {}
+    
+    def fragment(attrs: Dict[str, Any]) -> int:
+        key = json.dumps(attrs, ensure_ascii=False, sort_keys=True)
+        if key not in fragment_index:
+            fragment_index[key] = len(fragments)
+            fragments.append(attrs)
+        return fragment_index[key]
+    
+    device_fragment = fragment({'device': poll_list.get('device', {})})
+    messages = []
+    topics = {}
+    duplicates = []
+    for domain_config in active_poll_list(poll_list)['domains']:
+        domain = domain_config['domain']
+        shared = {key: value for key, value in domain_config.items() if key not in _STRUCTURE_KEYS}
+        for unit in domain_config.get('units', [domain_config]):
+            attrs = dict(shared)
+            attrs.update((key, value) for key, value in unit.items() if key not in _STRUCTURE_KEYS)
+            attrs = _discovery_attrs(attrs, mqtt_topic, mqtt_listen)
+            # Attributes with per-entity placeholders stay in the entity payload
+            per_entity = {key: value for key, value in attrs.items()
+                          if isinstance(value, str) and ('%DpAddr%' in value or '%Length%' in value)}
+            common = {key: value for key, value in attrs.items() if key not in per_entity}
+            refs = [device_fragment, fragment(common)] if common else [device_fragment]
+            
+            entries = list(unit.get('poll', [])) + list(unit.get('nopoll', []))
+            if 'entity_name' in unit:
+                entries.append((0, unit['entity_name'], 0x0000, 1, 1, False))
+            for entry in entries:
+                name = normalize_name(str(entry[1]))
+                unique_id = f"{dp_prefix}{name}"
+                payload = {'name': beautify_name(name, beautifier), 'unique_id': unique_id}
+                if domain not in _STATELESS_DOMAINS and 'state_topic' not in common:
+                    payload['state_topic'] = f"{mqtt_topic}/{name}"
+                for key, value in per_entity.items():
+                    payload[key] = _resolve_placeholders(value, mqtt_listen, entry[2], entry[3])
+                topic = f"{discovery_prefix}/{domain}/{node_id}/{unique_id}/config"
+                if topic in topics:
+                    duplicates.append(topic)
+                topics[topic] = len(messages)
+                messages.append({'topic': topic, 'fragments': refs, 'payload': payload})
+    
+    if rate is None:
+        rate = publisher_rate(poll_list)
+    batch_size = max(1, int(round(rate * batch_interval)))
+    return {
+        'version': 1,
+        'rate': rate,
+        'batch_interval': batch_interval,
+        'batch_size': batch_size,
+        'retain': True,
+        'messages': len(messages),
+        'duplicate_topics': duplicates,
+        'fragments': fragments,
+        'batches': [messages[start:start + batch_size]
+                    for start in range(0, len(messages), batch_size)],
+    }
+
+
+def expand_discovery_payload(plan: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+    """Full discovery payload of a plan message (fragments, then its own payload)."""
+    payload = {}
+    for index in message['fragments']:
+        payload.update(plan['fragments'][index])
+    payload.update(message['payload'])
+    return payload
+
+
+def replay_discovery_plan(plan: Dict[str, Any], publish, sleep=time.sleep) -> int:
+    """
+    Publish a discovery plan: publish(topic, payload_bytes, retain) for
+    every message, sleep(batch_interval) between batches. Returns the
+    number of published messages.
+    """
+    encoded = [json.dumps(fragment, ensure_ascii=False, separators=(',', ':'))[1:-1]
+               for fragment in plan['fragments']]
+    count = 0
+    for index, batch in enumerate(plan['batches']):
+        if index:
+            sleep(plan['batch_interval'])
+        for message in batch:
+            # Fragments are pre-encoded once; keys of the entity payload are not in them
+            parts = [encoded[i] for i in message['fragments'] if encoded[i]]
+            own = json.dumps(message['payload'], ensure_ascii=False, separators=(',', ':'))[1:-1]
+            if own:
+                parts.append(own)
+            publish(message['topic'], ('{' + ','.join(parts) + '}').encode('utf-8'), plan['retain'])
+            count += 1
+    return count
+
+
+def write_discovery_plan(plan: Dict[str, Any], path: str) -> bool:
+    """Write a discovery plan as JSON (unless unchanged); returns whether written."""
+    data = json.dumps(plan, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return write_file_if_changed(path, (data + '\n').encode('utf-8'))
+
+
+# ======================================================================
+# Block-read planner
+# ======================================================================
+
+# Largest block read (bytes) and unused bytes tolerated between two merged ranges
+BLOCK_READ_MAX = 32
+BLOCK_READ_GAP = 0
+
+# Bus time estimate: Optolink runs at 4800 baud 8E2 (12 bits per byte); a
+# VS2 read is an 8 byte request, the 0x06 ack and an 8 byte response frame
+OPTOLINK_BYTES_PER_SECOND = 4800 / 12
+VS2_READ_OVERHEAD = 17
+
+
+def active_poll_tuples(poll_list: Dict) -> List[Tuple]:
+    """The poll tuples the generated poll_list reads (those of the active domains)."""
+    entries = []
+    for domain in active_poll_list(poll_list)['domains']:
+        for config in [domain] + domain.get('units', []):
+            entries.extend(config.get('poll', []))
+    return entries
+
+
+def active_poll_items(poll_list: Dict) -> List[PollItem]:
+    """The poll items the generated poll_list reads."""
+    return [parse_poll_item(entry) for entry in active_poll_tuples(poll_list)]
+
+
+def _plannable(item: PollItem) -> bool:
+    """Whether item has the numeric DpAddr and positive Length a read needs."""
+    length = item.length
+    return (parse_dpaddr(item.dpaddr) is not None and isinstance(length, int)
+            and not isinstance(length, bool) and length > 0)
+
+
+def _bus_seconds(reads: float, data_bytes: float) -> float:
+    """Estimated Optolink bus time of reads transferring data_bytes."""
+    return (reads * VS2_READ_OVERHEAD + data_bytes) / OPTOLINK_BYTES_PER_SECOND
+
+
+def _merge_ranges(ranges: List[Tuple[int, int, PollItem]], max_block: int,
+                  gap: int) -> List[Dict[str, Any]]:
+    """
+    Merge (start, end, item) ranges sorted by address into blocks.
+
+    A range within the current block (e.g. a duplicate) always joins it, as
+    it does not grow the block, even if the block exceeds max_block.
+    """
+    blocks = []
+    for start, end, item in ranges:
+        block = blocks[-1] if blocks else None
+        if (block is None or start > block['end'] + gap
+                or end > block['end'] and end - block['start'] > max_block):
+            block = {'start': start, 'end': end, 'items': []}
+            blocks.append(block)
+        block['end'] = max(block['end'], end)
+        block['items'].append((item, start))
+    return blocks
+
+
+def plan_block_reads(poll_items: Iterable[PollItem], max_block: int = BLOCK_READ_MAX,
+                     gap: int = BLOCK_READ_GAP) -> Dict[str, Any]:
+    """
+    Plan the Optolink reads of each PollCycle as coalesced block reads.
+
+    Within a PollCycle, identical, overlapping and adjacent address ranges
+    (or ranges at most gap bytes apart) are merged into one block read as
+    long as the block stays within max_block bytes; longer items are read
+    on their own, together with identical or contained ranges. Each item gets the offset of its bytes in its block.
+    Items without a numeric DpAddr and Length are listed as 'unplanned'.
+
+    The 'totals' compare reads and bytes per base cycle (an item with
+    PollCycle n is read every n-th cycle) and the estimated bus time.
+    """
+    ranges = defaultdict(list)
+    unplanned = []
+    for item in poll_items:
+        if not _plannable(item):
+            unplanned.append(item.name)
+            continue
+        dpaddr = parse_dpaddr(item.dpaddr)
+        ranges[item.pollcycle].append((dpaddr, dpaddr + item.length, item))
+    
+    cycles = []
+    totals = dict.fromkeys(('items', 'blocks', 'item_bytes', 'block_bytes'), 0)
+    per_cycle = dict.fromkeys(totals, 0.0)
+    for pollcycle in sorted(ranges):
+        cycle_ranges = sorted(ranges[pollcycle], key=lambda r: (r[0], r[1]))
+        blocks = _merge_ranges(cycle_ranges, max_block, gap)
+        stats = {
+            'items': len(cycle_ranges),
+            'blocks': len(blocks),
+            'item_bytes': sum(end - start for start, end, _ in cycle_ranges),
+            'block_bytes': sum(block['end'] - block['start'] for block in blocks),
+        }
+        weight = 1.0 / pollcycle if pollcycle > 0 else 1.0
+        for key, value in stats.items():
+            totals[key] += value
+            per_cycle[key] += value * weight
+        cycles.append({
+            'pollcycle': pollcycle,
+            'stats': stats,
+            'reads': [{
+                'dpaddr': f"0x{block['start']:04X}",
+                'length': block['end'] - block['start'],
+                'items': [{'name': item.name, 'offset': start - block['start'],
+                           'length': item.length} for item, start in block['items']],
+            } for block in blocks],
+        })
+    
+    totals['reads_saved'] = totals['items'] - totals['blocks']
+    totals['per_cycle'] = {key: round(value, 6) for key, value in per_cycle.items()}
+    totals['bus_seconds'] = round(_bus_seconds(per_cycle['items'], per_cycle['item_bytes']), 6)
+    totals['planned_bus_seconds'] = round(
+        _bus_seconds(per_cycle['blocks'], per_cycle['block_bytes']), 6)
+    return {'max_block': max_block, 'gap': gap, 'cycles': cycles,
+            'totals': totals, 'unplanned': unplanned}
+
+
+def write_read_plan(plan: Dict[str, Any], path: str) -> bool:
+    """Write a block-read plan as JSON (unless unchanged); returns whether written."""
+    data = json.dumps(plan, ensure_ascii=False, indent=1)
+    return write_file_if_changed(path, (data + '\n').encode('utf-8'))
+
+
+def print_read_plan_report(plan: Dict[str, Any]):
+    """Print the bus transactions saved by a block-read plan."""
+    totals = plan['totals']
+    per_cycle = totals['per_cycle']
+    print(f"\n[INFO] Block-read plan (max {plan['max_block']} bytes, gap {plan['gap']}): "
+          f"{totals['items']} reads -> {totals['blocks']} block reads "
+          f"({totals['reads_saved']} bus transactions saved)")
+    for cycle in plan['cycles']:
+        stats = cycle['stats']
+        print(f"     - PollCycle {cycle['pollcycle']}: {stats['items']} -> {stats['blocks']} reads, "
+              f"{stats['item_bytes']} -> {stats['block_bytes']} bytes")
+    print(f"     - per base cycle: {per_cycle['items']:.1f} -> {per_cycle['blocks']:.1f} reads, "
+          f"estimated bus time {totals['bus_seconds'] * 1000:.0f} -> "
+          f"{totals['planned_bus_seconds'] * 1000:.0f} ms")
+    if plan['unplanned']:
+        print(f"[WARNING] Not planned (no numeric DpAddr/Length): {', '.join(plan['unplanned'])}")
+
+
+# ======================================================================
+# Poll phase scheduler
+# ======================================================================
+
+# Longest schedule (in poll_interval ticks) the scheduler balances exactly;
+# beyond it the longest PollCycle is used and longer periods are approximated
+STAGGER_HORIZON_MAX = 86400
+STAGGER_HISTOGRAM_BINS = 8
+
+
+def _read_bytes(item: PollItem) -> int:
+    """Bus bytes of one read of item (VS2 framing plus the data)."""
+    length = item.length if isinstance(item.length, int) and not isinstance(item.length, bool) else 0
+    return VS2_READ_OVERHEAD + max(length, 0)
+
+
+def _pollcycle(item: PollItem) -> int:
+    cycle = item.pollcycle
+    return cycle if isinstance(cycle, int) and not isinstance(cycle, bool) and cycle > 0 else 1
+
+
+def schedule_horizon(cycles: Iterable[int]) -> int:
+    """
+    Ticks after which the poll pattern repeats.
+
+    If that exceeds STAGGER_HORIZON_MAX, the longest PollCycle is used, so
+    every phase of every PollCycle still lies within the horizon.
+    """
+    cycles = list(cycles)
+    horizon = 1
+    for cycle in cycles:
+        horizon = horizon * cycle // math.gcd(horizon, cycle)
+        if horizon > STAGGER_HORIZON_MAX:
+            return max(cycles)
+    return horizon
+
+
+def tick_loads(poll_items: List[PollItem], phases: Dict[str, int], horizon: int,
+               weight=_read_bytes) -> List[int]:
+    """Load per tick over horizon ticks; an item polls at ticks t with t % PollCycle == phase."""
+    loads = [0] * horizon
+    for item in poll_items:
+        cycle = _pollcycle(item)
+        cost = weight(item)
+        for tick in range(phases.get(item.name, 0) % cycle, horizon, cycle):
+            loads[tick] += cost
+    return loads
+
+
+def stagger_poll_phases(poll_items: Iterable[PollItem]) -> Dict[str, Any]:
+    """
+    Spread the poll items over the ticks of poll_interval.
+
+    Every item with PollCycle n gets a phase 0..n-1 (it is polled when
+    cycle % n == phase instead of all items of a PollCycle firing on the
+    same tick). PollCycles are placed shortest first and within a PollCycle
+    the largest reads first, each on the phase whose ticks carry the
+    smallest peak (then total) bus bytes so far, so the per-tick load is
+    levelled over the schedule horizon.
+
+    Returns the 'phases' table by poll item name and the per-tick data
+    bytes 'before' (all phases 0) and 'after' (stats_for_loads).
+    """
+    poll_items = list(poll_items)
+    by_cycle = defaultdict(list)
+    for item in poll_items:
+        by_cycle[_pollcycle(item)].append(item)
+    horizon = schedule_horizon(by_cycle)
+    loads = [0] * horizon
+    phases = {}
+    for cycle in sorted(by_cycle):
+        # An item adds its bytes to every tick of its phase, so the peak and
+        # total of a phase grow by exactly its cost: fold the loads once per cycle
+        heap = []
+        for phase in range(cycle):
+            ticks = loads[phase::cycle]
+            heap.append((max(ticks), sum(ticks), phase, len(ticks)))
+        heapq.heapify(heap)
+        for item in sorted(by_cycle[cycle], key=lambda item: -_read_bytes(item)):
+            peak, total, phase, count = heapq.heappop(heap)
+            cost = _read_bytes(item)
+            heapq.heappush(heap, (peak + cost, total + cost * count, phase, count))
+            phases[item.name] = phase
+            for tick in range(phase, horizon, cycle):
+                loads[tick] += cost
+    
+    data_bytes = lambda item: _read_bytes(item) - VS2_READ_OVERHEAD  # noqa: E731
+    return {
+        'horizon': horizon,
+        'phases': phases,
+        'before': stats_for_loads(tick_loads(poll_items, {}, horizon, data_bytes)),
+        'after': stats_for_loads(tick_loads(poll_items, phases, horizon, data_bytes)),
+    }
+
+
+def stats_for_loads(loads: List[int]) -> Dict[str, Any]:
+    """Peak, mean and idle ticks of a per-tick byte load plus the loads themselves."""
+    return {
+        'peak_bytes': max(loads, default=0),
+        'mean_bytes': round(sum(loads) / len(loads), 3) if loads else 0.0,
+        'idle_ticks': loads.count(0),
+        'loads': loads,
+    }
+
+
+def write_poll_phases(schedule: Dict[str, Any], path: str) -> bool:
+    """Write the poll_phase table (and its tick statistics) as JSON; returns whether written."""
+    table = {
+        'horizon': schedule['horizon'],
+        'poll_phase': schedule['phases'],
+        'stats': {key: {k: v for k, v in schedule[key].items() if k != 'loads'}
+                  for key in ('before', 'after')},
+    }
+    data = json.dumps(table, ensure_ascii=False, indent=1)
+    return write_file_if_changed(path, (data + '\n').encode('utf-8'))
+
+
+def print_stagger_report(schedule: Dict[str, Any], bins: int = STAGGER_HISTOGRAM_BINS,
+                         width: int = 30):
+    """Print before/after histograms of the data bytes per tick."""
+    before, after = schedule['before'], schedule['after']
+    horizon = schedule['horizon']
+    print(f"\n[INFO] Poll phase staggering over {horizon} ticks: peak "
+          f"{before['peak_bytes']} -> {after['peak_bytes']} bytes/tick "
+          f"(mean {after['mean_bytes']:.1f}), idle ticks "
+          f"{before['idle_ticks']} -> {after['idle_ticks']}")
+    peak = max(before['peak_bytes'], 1)
+    size = -(-(peak + 1) // bins)
+    print(f"     {'bytes/tick':>14}  {'before':<{width + 6}} after")
+    for index in range(bins):
+        low, high = index * size, (index + 1) * size - 1
+        counts = [sum(1 for load in stats['loads'] if low <= load <= high)
+                  for stats in (before, after)]
+        bars = [f"{'#' * math.ceil(width * count / horizon):<{width}} {count:5}" for count in counts]
+        print(f"     {low:6}-{high:<7}  {bars[0]} {bars[1]}")
+
+
+# ======================================================================
+# Decoder table
+# ======================================================================
+
+# struct formats of the integer sizes struct can unpack directly (little endian)
+_INT_FORMATS = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+
+# Integers up to this size are decoded as one NumPy lane (int64 cannot overflow)
+_NUMPY_MAX_SIZE = 7
+
+
+class DecoderEntry(NamedTuple):
+    """How one datapoint is decoded from the raw bytes of its read."""
+    name: str
+    read: int                  # index of the read in DecoderTable.reads
+    offset: int                # first byte of the value in the read
+    size: int                  # bytes of the value
+    kind: str                  # 'int', 'hex', 'vdatetime' or 'utf8'
+    fmt: Optional[str] = None  # struct format ('<h', ...) for 1/2/4/8 byte integers
+    mask: Optional[int] = None
+    shift: int = 0
+    scale: Any = 1
+    signed: bool = False
+    big_endian: bool = False
+
+
+def _poll_format(entry: Tuple) -> Tuple:
+    """The Scale/Type [, Signed] part of a poll tuple (after Length)."""
+    idx = 1 if isinstance(entry[0], int) and len(entry) > 3 and isinstance(entry[1], str) else 0
+    return tuple(entry[idx + 3:])
+
+
+def _parse_bitfield(fmt: str) -> Tuple[int, int, Optional[int], bool]:
+    """Parse 'b:start:end[:mask[:endian]]' into (start, end, mask, big_endian)."""
+    parts = fmt.split(':')
+    start, end = int(parts[1]), int(parts[2])
+    mask = int(parts[3], 0) if len(parts) > 3 and parts[3] else None
+    big_endian = len(parts) > 4 and parts[4].lower().startswith('b')
+    return start, end, mask, big_endian
+
+
+def _decode_vdatetime(raw: bytes) -> str:
+    """Viessmann BCD date and time (YYYY MM DD weekday hh mm ss)."""
+    digits = raw.hex()
+    return (f"{digits[0:4]}-{digits[4:6]}-{digits[6:8]}T"
+            f"{digits[10:12]}:{digits[12:14]}:{digits[14:16]}")
+
+
+def decode_value(raw: bytes, poll_format: Tuple) -> Any:
+    """
+    Decode the raw bytes of one read by its Scale/Type [, Signed] entries.
+
+    Reference (per item) interpretation of the poll tuple:
+    no Scale/Type returns the bytes as hex; a number scales the little
+    endian integer (signed if Signed); 'b:start:end[:mask[:endian]]'
+    takes bytes start..end (masked and shifted down to the mask's lowest
+    bit) followed by Scale and Signed; 'vdatetime' and 'utf8' are
+    decoded as text, other types as hex.
+    """
+    if not poll_format:
+        return raw.hex()
+    fmt = poll_format[0]
+    if isinstance(fmt, str):
+        if not fmt.startswith('b:'):
+            if fmt == 'vdatetime':
+                return _decode_vdatetime(raw)
+            if fmt == 'utf8':
+                return raw.rstrip(b'\x00').decode('utf-8', 'replace')
+            return raw.hex()
+        start, end, mask, big_endian = _parse_bitfield(fmt)
+        raw = raw[start:end + 1]
+        poll_format = poll_format[1:]
+    else:
+        mask, big_endian = None, False
+    scale = poll_format[0] if poll_format else 1
+    signed = bool(poll_format[1]) if len(poll_format) > 1 else False
+    byteorder = 'big' if big_endian else 'little'
+    if mask is not None:
+        value = (int.from_bytes(raw, byteorder) & mask) >> ((mask & -mask).bit_length() - 1)
+    else:
+        value = int.from_bytes(raw, byteorder, signed=signed)
+    return value if scale == 1 else value * scale
+
+
+def compile_decoder(entry: Tuple, read: int, base: int = 0) -> DecoderEntry:
+    """
+    Compile the decoding of a poll tuple read at byte base of read.
+
+    Everything decode_value works out per value (type, byte slice, mask,
+    shift, struct format) is fixed once here.
+    """
+    item = parse_poll_item(entry)
+    poll_format = _poll_format(entry)
+    length = item.length
+    if not poll_format:
+        return DecoderEntry(item.name, read, base, length, 'hex')
+    fmt = poll_format[0]
+    if isinstance(fmt, str) and not fmt.startswith('b:'):
+        kind = fmt if fmt in ('vdatetime', 'utf8') else 'hex'
+        return DecoderEntry(item.name, read, base, length, kind)
+    mask, big_endian, offset, size = None, False, base, length
+    if isinstance(fmt, str):
+        start, end, mask, big_endian = _parse_bitfield(fmt)
+        offset = base + start
+        size = max(0, min(end + 1, length) - start)
+        poll_format = poll_format[1:]
+    scale = poll_format[0] if poll_format else 1
+    signed = bool(poll_format[1]) if len(poll_format) > 1 else False
+    if mask is not None:
+        shift, signed = (mask & -mask).bit_length() - 1, False
+    else:
+        shift = 0
+    struct_fmt = None
+    if mask is None and size in _INT_FORMATS:
+        code = _INT_FORMATS[size]
+        struct_fmt = ('>' if big_endian else '<') + (code if signed else code.upper())
+    return DecoderEntry(item.name, read, offset, size, 'int', struct_fmt, mask, shift,
+                        scale, signed, big_endian)
+
+
+def compile_decoder_table(poll_tuples: Iterable[Tuple],
+                          read_plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Compile the decoder table of poll tuples.
+
+    Items sharing a read decode from one buffer: without read_plan every
+    distinct (DpAddr, Length) is one read; with a plan_block_reads plan its
+    block reads are used and each item decodes from its offset in the block.
+    Items without numeric DpAddr and Length are left out (as in the plan).
+    Returns {'reads': [{'dpaddr', 'length'}], 'entries': [DecoderEntry dicts]}
+    for DecoderTable.
+    """
+    poll_tuples = list(poll_tuples)
+    reads = []
+    entries = []
+    if read_plan is not None:
+        by_name = {parse_poll_item(entry).name: entry for entry in poll_tuples}
+        for cycle in read_plan['cycles']:
+            for block in cycle['reads']:
+                index = len(reads)
+                reads.append({'dpaddr': block['dpaddr'], 'length': block['length']})
+                entries.extend(compile_decoder(by_name[item['name']], index, item['offset'])
+                               for item in block['items'])
+    else:
+        read_index = {}
+        for entry in poll_tuples:
+            item = parse_poll_item(entry)
+            if not _plannable(item):
+                continue
+            key = (parse_dpaddr(item.dpaddr), item.length)
+            if key not in read_index:
+                read_index[key] = len(reads)
+                reads.append({'dpaddr': f"0x{key[0]:04X}", 'length': item.length})
+            entries.append(compile_decoder(entry, read_index[key]))
+    return {'reads': reads, 'entries': [entry._asdict() for entry in entries]}
+
+
+class DecoderTable:
+    """
+    Batch decoder for the raw bytes of all reads of a decoder table.
+
+    decode() takes the buffers of one cycle in the order of the table's
+    reads and returns all values by datapoint name. Integers are decoded
+    per lane (same size, sign, mask and byte order) in one vectorized
+    NumPy operation when NumPy is installed; otherwise, and for text and
+    hex values, each entry uses its precompiled struct or slice.
+    """
+
+    def __init__(self, table: Dict[str, Any], use_numpy: bool = True):
+        self.reads = table['reads']
+        self.entries = [DecoderEntry(**entry) for entry in table['entries']]
+        self.use_numpy = use_numpy and numpy is not None
+        # Reads are concatenated into one cycle buffer
+        self.starts = []
+        position = 0
+        for read in self.reads:
+            self.starts.append(position)
+            position += read['length']
+        self.buffer_size = position
+        self._compiled = [(entry.name, self.starts[entry.read] + entry.offset, entry)
+                          for entry in self.entries]
+        self._structs = {entry.fmt: struct.Struct(entry.fmt)
+                         for entry in self.entries if entry.fmt}
+        self._lanes = self._build_lanes() if self.use_numpy else []
+        laned = {name for lane in self._lanes for name in lane['names']}
+        self._scalar = [compiled for compiled in self._compiled if compiled[0] not in laned]
+
+    def _build_lanes(self) -> List[Dict[str, Any]]:
+        """Group the integer entries NumPy can decode into lanes with index arrays."""
+        groups = defaultdict(list)
+        for name, start, entry in self._compiled:
+            if entry.kind == 'int' and 0 < entry.size <= _NUMPY_MAX_SIZE:
+                key = (entry.size, entry.signed, entry.big_endian, entry.mask is not None,
+                       isinstance(entry.scale, float) and entry.scale != 1)
+                groups[key].append((name, start, entry))
+        lanes = []
+        for (size, signed, big_endian, masked, float_scale), members in groups.items():
+            weights = [256 ** i for i in range(size)]
+            if big_endian:
+                weights.reverse()
+            lanes.append({
+                'names': [name for name, _, _ in members],
+                'index': numpy.array([[start + i for i in range(size)] for _, start, _ in members],
+                                     dtype=numpy.intp),
+                'weights': numpy.array(weights, dtype=numpy.int64),
+                'sign_bit': 1 << (8 * size - 1) if signed else 0,
+                'masks': (numpy.array([entry.mask for _, _, entry in members], dtype=numpy.int64)
+                          if masked else None),
+                'shifts': (numpy.array([entry.shift for _, _, entry in members], dtype=numpy.int64)
+                           if masked else None),
+                'scales': numpy.array([entry.scale for _, _, entry in members],
+                                      dtype=numpy.float64 if float_scale else numpy.int64),
+            })
+        return lanes
+
+    def _decode_entry(self, buffer: bytes, start: int, entry: DecoderEntry) -> Any:
+        if entry.kind != 'int':
+            raw = buffer[start:start + entry.size]
+            if entry.kind == 'vdatetime':
+                return _decode_vdatetime(raw)
+            if entry.kind == 'utf8':
+                return raw.rstrip(b'\x00').decode('utf-8', 'replace')
+            return raw.hex()
+        if entry.fmt:
+            value = self._structs[entry.fmt].unpack_from(buffer, start)[0]
+        else:
+            value = int.from_bytes(buffer[start:start + entry.size],
+                                   'big' if entry.big_endian else 'little',
+                                   signed=entry.signed)
+            if entry.mask is not None:
+                value = (value & entry.mask) >> entry.shift
+        return value if entry.scale == 1 else value * entry.scale
+
+    def decode(self, buffers: Iterable[bytes]) -> Dict[str, Any]:
+        """Decode the raw bytes of all reads (in table order) of one cycle."""
+        buffer = b''.join(buffers)
+        if len(buffer) != self.buffer_size:
+            raise ValueError(f"Expected {self.buffer_size} bytes for {len(self.reads)} reads, "
+                             f"got {len(buffer)}")
+        values = {}
+        if self._lanes:
+            data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+            for lane in self._lanes:
+                raw = data[lane['index']].astype(numpy.int64) @ lane['weights']
+                if lane['sign_bit']:
+                    raw = numpy.where(raw >= lane['sign_bit'], raw - 2 * lane['sign_bit'], raw)
+                if lane['masks'] is not None:
+                    raw = (raw & lane['masks']) >> lane['shifts']
+                values.update(zip(lane['names'], (raw * lane['scales']).tolist()))
+        for name, start, entry in self._scalar:
+            values[name] = self._decode_entry(buffer, start, entry)
+        return values
+
+
+def write_decoder_table(table: Dict[str, Any], path: str) -> bool:
+    """Write a decoder table as JSON (unless unchanged); returns whether written."""
+    data = json.dumps(table, ensure_ascii=False, separators=(',', ':'))
+    return write_file_if_changed(path, (data + '\n').encode('utf-8'))
+
+
+# ======================================================================
+# Output verification
+# ======================================================================
+
+def domain_entries(domain: Dict) -> List[Tuple]:
+    """The poll and nopoll tuples of a domain and its units (entity_name as a nopoll tuple)."""
+    entries = []
+    for config in [domain] + domain.get('units', []):
+        entries.extend(config.get('poll', []))
+        entries.extend(config.get('nopoll', []))
+        if 'entity_name' in config:
+            entries.append((0, config['entity_name'], 0x0000, 1, 1, False))
+    return entries
+
+
+def collect_poll_entries(poll_list: Dict) -> Tuple[List[Tuple], int]:
+    """
+    Flatten the poll and nopoll tuples of all active domains and units.
+
+    Returns the tuples and the number of commented out domains, which are
+    not part of the active poll_list.
+    """
+    entries = []
+    commented_out = 0
+    for domain in poll_list.get('domains', []):
+        if is_commented_out(domain):
+            commented_out += 1
+            continue
+        entries.extend(domain_entries(domain))
+    return entries, commented_out
+
+
+def find_commented_domains(content: str, constants: Dict[str, Any]) -> List[Dict]:
+    """
+    Evaluate the commented out domains of generated source: the '# ' lines
+    after each COMMENTED_DOMAIN_NOTE, with constants for interned strings.
+    """
+    domains = []
+    lines = content.splitlines()
+    for index, line in enumerate(lines):
+        if not line.startswith('#') or COMMENTED_DOMAIN_NOTE not in line:
+            continue
+        block = []
+        for following in lines[index + 1:]:
+            if not following.startswith('# '):
+                break
+            block.append(following[2:])
+        source = '\n'.join(block).strip().rstrip(',')
+        domain = _eval_poll_list_node(ast.parse(source, mode='eval').body, constants)
+        if not isinstance(domain, dict):
+            raise ValueError(f"Commented out domain after line {index + 1} is not a dict")
+        domains.append(domain)
+    return domains
+
+
+def verify_poll_list_file(output_path: str, poll_list: Dict, poll_items_map: Dict[str, PollItem],
+                          coverage: Dict) -> Dict[str, Any]:
+    """
+    Parse a generated file with ast (without executing it) and compare it
+    with the migration result.
+
+    Checks, using hashed multisets of the flattened tuples:
+        - missing/unexpected: entries of the built structure absent from
+          the file, or present in the file only
+        - unknown_poll_items: poll tuples whose name is not in poll_items_map
+        - mismatched: poll tuples that differ from their poll item
+        - entity_count: the active entries plus those of the commented out
+          domains found in the file must add up to the loaded entities
+          (coverage['total_entities'])
+
+    Returns a JSON-serializable report with 'ok' set if nothing mismatched.
+    """
+    try:
+        content, _ = read_text_file(output_path)
+    except (OSError, ValueError) as e:
+        report = new_verify_report(output_path)
+        report['error'] = f"{type(e).__name__}: {e}"
+        return report
+    return verify_poll_list_source(content, output_path, poll_list, poll_items_map, coverage)
+
+
+def new_verify_report(output_path: str) -> Dict[str, Any]:
+    """Return an empty (not ok) verification report."""
+    return {
+        'output': output_path,
+        'ok': False,
+        'error': None,
+        'poll_items': 0,
+        'entities': 0,
+        'commented_out': 0,
+        'missing': [],
+        'unexpected': [],
+        'unknown_poll_items': [],
+        'mismatched': [],
+        'entity_count': None,
+    }
+
 
-   Unless required by applicable law or agreed to in writing, software
-   distributed under the License is distributed on an "AS IS" BASIS,
-   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
-   See the License for the specific language governing permissions and
-   limitations under the License.
+def verify_poll_list_source(content: str, output_path: str, poll_list: Dict,
+                            poll_items_map: Dict[str, PollItem], coverage: Dict) -> Dict[str, Any]:
+    """verify_poll_list_file for generated source in memory (output_path is only reported)."""
+    report = new_verify_report(output_path)
+    try:
+        constants = evaluate_module_constants(ast.parse(content, output_path))
+        found_poll_list = constants.get('poll_list')
+        if found_poll_list is None:
+            raise ValueError("poll_list not found in file")
+        if isinstance(found_poll_list, _Unresolved):
+            raise ValueError(f"poll_list could not be evaluated: {found_poll_list.message}")
+        if not isinstance(found_poll_list, dict):
+            raise ValueError("poll_list must be a dict")
+        found, _ = collect_poll_entries(found_poll_list)
+        found_commented = [entry for domain in find_commented_domains(content, constants)
+                           for entry in domain_entries(domain)]
+    except (SyntaxError, ValueError, TypeError, AttributeError) as e:
+        report['error'] = f"{type(e).__name__}: {e}"
+        return report
+    
+    expected, _ = collect_poll_entries(poll_list)
+    expected_commented = [entry for domain in poll_list.get('domains', [])
+                          if is_commented_out(domain) for entry in domain_entries(domain)]
+    found_counts = Counter(found)
+    all_found = found_counts + Counter(found_commented)
+    all_expected = Counter(expected) + Counter(expected_commented)
+    report['missing'] = [list(entry) for entry in (all_expected - all_found).elements()]
+    report['unexpected'] = [list(entry) for entry in (all_found - all_expected).elements()]
+    report['commented_out'] = len(found_commented)
+    
+    for entry in found_counts:
+        if entry[0] == 0 and entry[2] == 0x0000:
+            report['entities'] += found_counts[entry]
+            continue
+        report['poll_items'] += found_counts[entry]
+        poll_data = poll_items_map.get(normalize_for_matching(str(entry[1])))
+        if poll_data is None:
+            report['unknown_poll_items'].append(entry[1])
+        elif create_poll_tuple(poll_data) != entry:
+            report['mismatched'].append({'name': entry[1],
+                                         'expected': list(create_poll_tuple(poll_data)),
+                                         'found': list(entry)})
+    report['entities'] += report['poll_items']
+    
+    total = len(found) + len(found_commented)
+    if total != coverage['total_entities']:
+        report['entity_count'] = {'expected': coverage['total_entities'], 'found': total}
+    
+    report['ok'] = not (report['missing'] or report['unexpected'] or report['unknown_poll_items']
+                        or report['mismatched'] or report['entity_count'])
+    return report
 
-   This file was automatically generated by migrate_ha_entities_to_ha_publish.py
-   
-   IMPORTANT - Manual Review Required:
-   The migration has created a foundation and migrated as much as possible,
-   but manual adjustments are needed for a working result - especially for
-   templates and complex domains.
-   
-   This script provides an alternative definition for Optolink-Splitter datapoints,
-   enhanced with MQTT publishing attributes for Home Assistant entities.
-   
-   The 'poll_list' is processed in the homeassistant_adapter with the appropriate
-   conversion for its use in the Optolink Splitter. Additionally, the 'poll_list'
-   will be utilized in homeassistant_publish.py to publish Home Assistant entities
-   via MQTT.
-'''\n\n""")
-        
-        # Write coverage report as comments
-        if coverage:
-            unused = coverage['all_poll_items'] - coverage['used_poll_items']
-            if unused:
-                f.write("# ======================================================================\n")
-                f.write("# This report was automatically generated by migrate_ha_entities_to_ha_publish.py\n")
-                f.write("# ======================================================================\n")
-                f.write("#\n")
-                f.write("# MIGRATION REPORT:\n")
-                f.write(f"# - Total entities processed: {coverage['total_entities']}\n")
-                f.write(f"# - Poll items used: {len(coverage['used_poll_items'])}\n")
-                f.write(f"# - Poll items NOT used: {len(unused)}\n")
-                f.write("#\n# Unused poll items (may need manual review):\n")
-                for item in sorted(unused):
-                    f.write(f"#   - {item}\n")
-                f.write("\n")
-        
-        f.write("poll_list = {\n")
-        
-        # Write top-level keys
-        for key in ['device', 'node_id', 'dp_prefix', 'discovery_prefix', 'beautifier', 
-                    'poll_interval', 'mqtt_delay']:
-            if key in poll_list:
-                f.write(f'    "{key}": ')
-                value = poll_list[key]
-                
-                if isinstance(value, dict):
-                    write_dict(f, value, 1)
-                elif isinstance(value, list):
-                    write_list(f, value, 1)
-                elif isinstance(value, str):
-                    f.write(repr(value))
-                elif isinstance(value, (int, float)):
-                    f.write(str(value))
-                else:
-                    f.write(repr(value))
-                
-                f.write(',\n')
-        
-        # Write domains
-        f.write('    "domains": [\n')
-        
-        for domain in poll_list.get('domains', []):
-            # Check if this should be commented out
-            comment_out = domain.get('domain') in ['climate', 'water_heater'] and 'entity_name' in domain
-            
-            if comment_out:
-                f.write('\n# ' + ' '*8 + 'NOTE: Complex domain - please review and uncomment after verification\n')
-                f.write('# ' + ' '*8)
-            else:
-                f.write('        ')
-            
-            write_dict(f, domain, 2, comment_out)
-            f.write(',\n')
-        
-        f.write('    ]\n')
-        f.write('}\n')
+
+def print_verify_report(report: Dict[str, Any]):
+    """Print a short summary of a verify_poll_list_file report."""
+    if report['ok']:
+        commented = (f", {report['commented_out']} commented out"
+                     if report['commented_out'] else '')
+        print(f"[OK] Verified {report['output']}: {report['entities']} entities, "
+              f"{report['poll_items']} poll items{commented}")
+        return
+    if report['error']:
+        print(f"[ERROR] Verification of {report['output']} failed: {report['error']}")
+        return
+    print(f"[ERROR] {report['output']} does not match the migration result:")
+    for key in ('missing', 'unexpected', 'unknown_poll_items', 'mismatched'):
+        if report[key]:
+            print(f"     - {key}: {len(report[key])}")
+    if report['entity_count']:
+        print(f"     - entity_count: expected {report['entity_count']['expected']}, "
+              f"found {report['entity_count']['found']}")
 
 
 def print_usage():
@@ -571,6 +3093,9 @@ USAGE:
     python migrate_ha_entities_to_ha_publish.py                           # Use defaults
     python migrate_ha_entities_to_ha_publish.py <entities_json> <poll_list>
     python migrate_ha_entities_to_ha_publish.py <entities_json> <poll_list> -o <output>
+    python migrate_ha_entities_to_ha_publish.py --batch <manifest> [--workers N] [--batch-report <path>]
+    python migrate_ha_entities_to_ha_publish.py <entities_json> <poll_list> --watch
+    python migrate_ha_entities_to_ha_publish.py --serve <socket> [--workers N]
 
 REQUIRED INPUT FILES:
 
@@ -593,6 +3118,139 @@ OUTPUT:
      homeassistant_poll_list.py (or specified with -o)
      Combined structure with poll items and entity attributes
 
+OPTIONS:
+     --stream                Read the entities JSON incrementally; datapoints are
+                             grouped while parsing, so memory is bounded by the
+                             generated structure instead of the raw JSON tree
+     --suggest               Entities without match get ranked poll item
+                             suggestions (trigram similarity) in the migration
+                             report
+     --fuzzy-threshold SCORE Like --suggest; suggested matches scoring at least
+                             SCORE (0.5..1) are accepted automatically, unless
+                             another entity already matches the poll item or
+                             two candidates have the same score
+     --aliases <path>        Persistent alias store (entity name -> poll item)
+                             consulted when a name matches no poll item
+     --learn-aliases         Add the aliases learned by this run (address and
+                             fuzzy matches) to the alias store
+     --cache <dir>           Reuse results from an on-disk cache keyed by content
+                             hashes of the inputs, this script and the options.
+                             Unchanged inputs skip the whole migration; if only
+                             some datapoints changed, only their domains are
+                             rebuilt (not with --stream). The directory can be
+                             deleted at any time.
+     --watch                 Keep running and regenerate the output whenever
+                             the entities JSON or poll_list changes (polled
+                             every 0.5s, bursts of saves are debounced); only
+                             the changed input is reloaded. --fast-load,
+                             --intern-strings, --metrics and --profile apply
+                             to every regeneration; --stream, --verify-report
+                             and the plan/table outputs are not supported
+     --no-verify             Skip parsing the written file back and checking it
+                             against the migration result (run by default)
+     --verify-report <path>  Write the verification report (missing, unexpected,
+                             unknown and mismatched poll tuples) as JSON;
+                             batch records include it for failed jobs
+     --optimize-grouping     Choose the grouping keys per domain for the
+                             smallest output (no attribute of an entity is
+                             lost); reports the bytes saved versus the fixed
+                             grouping, or that it cannot be improved
+     --hoist-shared-attrs    Move attributes set to the same value in all
+                             units of a domain up to the domain, next to
+                             "units". Only for publishers that apply domain
+                             attributes as defaults to every unit (the
+                             discovery plan does); others lose them
+     --fast-load <formats>   Also write the poll_list in fast-loading formats
+                             (comma separated):
+                               json     <output>.json, canonical JSON
+                               marshal  <output>.marshal, same Python version
+                                        as the reader only
+                               pyc      byte-compiled <output> in __pycache__,
+                                        used when the file is imported
+                             load_poll_list() reads any of them, and the
+                             output itself when a file is stale
+     --discovery-plan <path> Also write the MQTT discovery plan as JSON: one
+                             Home Assistant discovery message per entity with
+                             topic and payload fully expanded (placeholders,
+                             name, unique_id, state_topic, device). Payload
+                             parts shared by several entities are stored once
+                             as fragments; messages are split into batches for
+                             publishing every 0.1s at --discovery-rate.
+                             Needs --mqtt-topic and --mqtt-listen
+     --mqtt-topic <topic>    Splitter mqtt_topic the state topics refer to
+                             (settings_ini.py, e.g. Vito)
+     --mqtt-listen <topic>   Splitter mqtt_listen used for %mqtt_listen%
+                             (settings_ini.py, e.g. Vito/cmnd)
+     --discovery-rate N      Discovery messages per second (default: one per
+                             mqtt_delay of the poll_list, as the publisher)
+     --read-plan <path>      Also write a block-read plan for the Optolink bus
+                             as JSON: per PollCycle, identical and adjacent
+                             address ranges are merged into block reads, with
+                             the offset of each datapoint in its block.
+                             Reports the bus transactions saved
+     --block-max N           Largest block read in bytes (default: 32)
+     --block-gap N           Unused bytes allowed between merged ranges
+                             (default: 0)
+     --stagger <path>        Also write a poll_phase table as JSON: a phase
+                             0..PollCycle-1 per poll item (poll the item when
+                             cycle % PollCycle == phase) so items sharing a
+                             PollCycle no longer fire on the same tick of
+                             poll_interval. Prints a before/after histogram
+                             of the bytes read per tick
+     --decoder-table <path>  Also write the compiled decoder table as JSON: per
+                             datapoint its read, byte offset and size, struct
+                             format, bit mask and shift, scale and signedness.
+                             Datapoints sharing a read (the block reads with
+                             --read-plan) decode from one buffer; DecoderTable
+                             decodes all values of a cycle at once (vectorized
+                             with NumPy when installed)
+     --intern-strings        Write strings shared by several entities (icons,
+                             templates, payloads) once as module-level
+                             constants referenced from the poll_list, where it
+                             makes the file smaller; reports the dedup ratio
+     --profile               Print wall time, CPU time and peak allocations
+                             (tracemalloc) per pipeline stage: read, decode,
+                             poll_parse, map_build, grouping, structure_build,
+                             render, write, verify. Tracing allocations slows
+                             the run down
+     --metrics <path>        Append the per-stage metrics of the run as one
+                             JSON line (in batch mode one line per job);
+                             timing only, allocations are traced only
+                             together with --profile
+
+BATCH MODE:
+     --batch <manifest>      Migrate many installations in one run. The manifest
+                             is a CSV file with the header
+                                 entities_json,poll_list,output
+                             or JSON lines with the same keys. Optional
+                             columns discovery_plan, read_plan, stagger and
+                             decoder_table write these outputs per job (the
+                             single-path options are rejected with --batch).
+                             Relative paths are resolved against the
+                             manifest's directory.
+     --workers N             Worker processes (default: number of cores)
+     --batch-report <path>   Per-job records (status, coverage, timing) as
+                             JSON lines
+                             With --profile the stages of all jobs are summed
+                             up in the summary
+
+SERVER MODE:
+     --serve <socket>        Run as a daemon on a Unix domain socket and keep the
+                             migration engine and its caches loaded. Requests
+                             and responses are JSON objects, one per line:
+                                 {"entities_json": <path>, "poll_list": <path>,
+                                  "output": <path, optional>}
+                             Inputs may also be sent inline as
+                             "entities_json_content" / "poll_list_content".
+                             Optional keys: "id", "fuzzy_threshold", "suggest",
+                             "aliases_path", "optimize_grouping", "hoist_attrs",
+                             "verify",
+                             "intern_strings".
+                             The response holds "status", the generated file
+                             ("content"), "coverage" and "verify".
+                             {"command": "ping"} checks a running server.
+     --workers N             Worker processes (default: number of cores)
+
 EXAMPLES:
      # Use default filenames (homeassistant_entities.json and poll_list.py)
      python migrate_ha_entities_to_ha_publish.py
@@ -618,33 +3276,557 @@ AFTER MIGRATION:
 """)
 
 
-def migrate(entities_json_path: str, poll_list_path: str, output_path: str):
-    """Main migration function."""
+# ======================================================================
+# Pipeline metrics
+# ======================================================================
+
+# Stages in pipeline order; the stage table and records follow this order
+PIPELINE_STAGES = ('read', 'decode', 'poll_parse', 'map_build', 'grouping',
+                   'structure_build', 'render', 'write', 'verify')
+
+
+class PipelineMetrics:
+    """
+    Wall time, CPU time and peak allocations per pipeline stage of one run.
+
+    Stages are measured with stage(name); a stage entered several times
+    (e.g. 'read' for both inputs) accumulates, with the largest peak kept.
+    Stages must not be nested, as every stage resets the tracemalloc peak.
+    Subscribers are called as callback(stage, stats) after every stage and
+    once with stage 'run' for the whole run when the metrics are closed.
+
+    Usage:
+        with PipelineMetrics() as metrics:
+            run_migration(..., metrics=metrics)
+        record = metrics.record()
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.info = {}
+        self.subscribers = []
+        self._started_tracing = False
+        self._start = None
+        self._totals = {'wall_time': 0.0, 'cpu_time': 0.0, 'peak_bytes': 0}
+
+    def subscribe(self, callback):
+        """Call callback(stage, stats) for every finished stage."""
+        self.subscribers.append(callback)
+        return callback
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._start = (time.perf_counter(), time.process_time(), self._traced_memory()[0])
+        return self
+
+    def __exit__(self, *exc_info):
+        wall_start, cpu_start, base = self._start
+        current, peak = self._traced_memory()
+        self._totals['wall_time'] = time.perf_counter() - wall_start
+        self._totals['cpu_time'] = time.process_time() - cpu_start
+        self._totals['peak_bytes'] = max(self._totals['peak_bytes'], peak - base)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._notify('run', dict(self._totals))
+
+    def _traced_memory(self) -> Tuple[int, int]:
+        if self.trace_memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()
+        return 0, 0
+
+    def _notify(self, stage: str, stats: Dict[str, Any]):
+        for callback in self.subscribers:
+            callback(stage, stats)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Measure the enclosed block as pipeline stage name."""
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        base = self._traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            stats = {
+                'wall_time': time.perf_counter() - wall_start,
+                'cpu_time': time.process_time() - cpu_start,
+                'peak_bytes': self._traced_memory()[1] - base,
+            }
+            if self._start is not None:
+                # Peak of the run relative to its start (stages reset the peak)
+                self._totals['peak_bytes'] = max(self._totals['peak_bytes'],
+                                                 base + stats['peak_bytes'] - self._start[2])
+            total = self.stages.setdefault(name, {'calls': 0, 'wall_time': 0.0,
+                                                  'cpu_time': 0.0, 'peak_bytes': 0})
+            total['calls'] += 1
+            total['wall_time'] += stats['wall_time']
+            total['cpu_time'] += stats['cpu_time']
+            total['peak_bytes'] = max(total['peak_bytes'], stats['peak_bytes'])
+            self._notify(name, stats)
+
+    def record(self, **fields) -> Dict[str, Any]:
+        """JSON-serializable metrics record of the run (extra fields are added)."""
+        order = {stage: index for index, stage in enumerate(PIPELINE_STAGES)}
+        stages = {}
+        for name in sorted(self.stages, key=lambda name: order.get(name, len(order))):
+            stats = self.stages[name]
+            stages[name] = {'calls': stats['calls'],
+                            'wall_time': round(stats['wall_time'], 6),
+                            'cpu_time': round(stats['cpu_time'], 6),
+                            'peak_bytes': stats['peak_bytes'] if self.trace_memory else None}
+        record = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        record.update(self.info)
+        record.update(fields)
+        record.update({
+            'wall_time': round(self._totals['wall_time'], 6),
+            'cpu_time': round(self._totals['cpu_time'], 6),
+            'peak_bytes': self._totals['peak_bytes'] if self.trace_memory else None,
+            'stages': stages,
+        })
+        return record
+
+
+def pipeline_stage(metrics: Optional[PipelineMetrics], name: str):
+    """metrics.stage(name), or a no-op context without metrics."""
+    return nullcontext() if metrics is None else metrics.stage(name)
+
+
+def append_metrics_record(metrics_path: str, record: Dict[str, Any]):
+    """Append a metrics record to a JSON lines file."""
+    with open(metrics_path, 'a', encoding='utf-8', newline='\n') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def aggregate_metrics(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Sum wall/CPU time and take the largest peak per stage over many records."""
+    totals = {}
+    for record in records:
+        for name, stats in record['stages'].items():
+            total = totals.setdefault(name, {'calls': 0, 'wall_time': 0.0,
+                                             'cpu_time': 0.0, 'peak_bytes': 0})
+            total['calls'] += stats['calls']
+            total['wall_time'] += stats['wall_time']
+            total['cpu_time'] += stats['cpu_time']
+            total['peak_bytes'] = max(total['peak_bytes'], stats['peak_bytes'] or 0)
+    return totals
+
+
+def print_metrics_report(stages: Dict[str, Dict[str, Any]], title: str = 'Profile',
+                         total: Optional[Dict[str, Any]] = None):
+    """
+    Print a per-stage table of wall time, CPU time and peak allocations.
+
+    total (e.g. a metrics record) adds a row with the whole run; the share
+    column is relative to it, otherwise to the sum of the stages.
+    """
+    wall_total = total['wall_time'] if total else sum(stats['wall_time']
+                                                      for stats in stages.values())
+    print(f"\n[{title}]")
+    print(f"  {'stage':<16} {'calls':>6} {'wall ms':>10} {'cpu ms':>10} {'peak MB':>9} {'share':>6}")
+    rows = list(stages.items())
+    if total:
+        rows.append(('total', dict(total, calls=1)))
+    for name, stats in rows:
+        share = 100.0 * stats['wall_time'] / wall_total if wall_total else 0.0
+        print(f"  {name:<16} {stats['calls']:>6} {stats['wall_time'] * 1000:>10.1f} "
+              f"{stats['cpu_time'] * 1000:>10.1f} {(stats['peak_bytes'] or 0) / 1e6:>9.2f} "
+              f"{share:>5.1f}%")
+
+
+# ======================================================================
+# Incremental migration cache
+# ======================================================================
+
+def file_digest(filepath: str, chunk_size: int = STREAM_CHUNK_SIZE) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def script_digest() -> str:
+    """Digest of this script, so cache entries expire when the code changes."""
+    return file_digest(os.path.abspath(__file__))
+
+
+class MigrationCache:
+    """
+    On-disk cache of migration results, keyed by content hashes.
+
+    context identifies everything a result depends on besides the entities
+    (script, poll_list, alias store and options). Whole runs are stored
+    under the digest of context and the entities JSON file; single domains
+    under the digest of context and the domain's datapoints, so a run with
+    a few changed datapoints only rebuilds the affected domains. Values are
+    plain data (dicts, lists, tuples, sets, strings, numbers) stored as
+    marshal files written atomically; unreadable entries are reported and
+    count as misses.
+    """
+
+    def __init__(self, cache_dir: str, context: str):
+        self.cache_dir = cache_dir
+        self.context = context
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    def _key(self, *parts: str) -> str:
+        digest = hashlib.sha256(self.context.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0' + part.encode('utf-8'))
+        return digest.hexdigest()
+
+    def run_key(self, entities_digest: str) -> str:
+        return self._key('run', entities_digest)
+
+    def domain_key(self, domain: str, entities: List[Dict]) -> str:
+        return self._key('domain', domain,
+                         json.dumps(entities, sort_keys=True, ensure_ascii=False, default=repr))
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.cache_dir, kind, key[:2], f'{key}.marshal')
+
+    def load(self, kind: str, key: str) -> Any:
+        """Return the cached value or None."""
+        path = self._path(kind, key)
+        try:
+            with open(path, 'rb') as f:
+                value = marshal.loads(f.read())
+        except FileNotFoundError:
+            value = None
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            print(f"[WARNING] Ignoring unreadable cache entry {path}: {e}")
+            value = None
+        if value is None:
+            self.misses[kind] += 1
+            return None
+        self.hits[kind] += 1
+        return value
+
+    def store(self, kind: str, key: str, value: Any):
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_file_atomic(path, marshal.dumps(value))
+
+
+def open_migration_cache(cache_dir: str, poll_list_path: str, aliases_path: Optional[str],
+                         fuzzy_threshold: Optional[float], optimize_grouping: bool,
+                         hoist_attrs: bool = False, suggest: bool = False) -> MigrationCache:
+    """Create the MigrationCache for the current script, inputs and options."""
+    aliases_digest = file_digest(aliases_path) if aliases_path and os.path.exists(aliases_path) else ''
+    context = json.dumps([script_digest(), marshal.version, file_digest(poll_list_path),
+                          aliases_digest, fuzzy_threshold, optimize_grouping, hoist_attrs,
+                          suggest])
+    return MigrationCache(cache_dir, context)
+
+
+def build_poll_items_map(poll_items: List[Tuple]) -> Dict[str, PollItem]:
+    """Create map of poll items keyed by their name normalized for matching."""
+    parsed_items = [parse_poll_item(item) for item in poll_items]
+    names_for_matching = normalize_names([parsed.name for parsed in parsed_items],
+                                         for_matching=True)
+    return dict(zip(names_for_matching, parsed_items))
+
+
+def run_migration(entities_json_path: str, poll_list_path: str, output_path: str,
+                  verbose: bool = True, stream: bool = False,
+                  fuzzy_threshold: Optional[float] = None,
+                  suggest: bool = False,
+                  aliases_path: Optional[str] = None,
+                  learn_aliases: bool = False,
+                  optimize_grouping: bool = False,
+                  hoist_attrs: bool = False,
+                  cache_dir: Optional[str] = None, verify: bool = True,
+                  verify_report_path: Optional[str] = None,
+                  metrics: Optional[PipelineMetrics] = None,
+                  fast_load: Iterable[str] = (),
+                  discovery_plan_path: Optional[str] = None,
+                  mqtt_topic: Optional[str] = None, mqtt_listen: Optional[str] = None,
+                  discovery_rate: Optional[float] = None,
+                  read_plan_path: Optional[str] = None,
+                  block_max: int = BLOCK_READ_MAX,
+                  block_gap: int = BLOCK_READ_GAP,
+                  stagger_path: Optional[str] = None,
+                  decoder_table_path: Optional[str] = None,
+                  intern_strings: bool = False) -> Dict[str, Any]:
+    """
+    Run the migration pipeline: load inputs, build the structure, write output.
+
+    With stream=True the entities JSON is read incrementally (EntitiesStream)
+    and datapoints are grouped as they are parsed. fuzzy_threshold enables
+    auto-accepting fuzzy name matches with at least this score (0..1);
+    with it or suggest, unmatched entities get ranked poll item suggestions.
+    aliases_path names a persistent AliasStore consulted during matching;
+    with learn_aliases the aliases learned by this run are added to it.
+    optimize_grouping chooses the grouping keys per domain for the smallest
+    output instead of the fixed grouping keys. hoist_attrs moves attributes
+    shared by all units of a domain to the domain. With cache_dir, results are
+    reused from a MigrationCache: unchanged inputs skip loading and grouping,
+    and without stream only the domains with changed datapoints are rebuilt.
+    With verify the written file is parsed back and checked against the
+    result (verify_poll_list_file); the report is also written to
+    verify_report_path as JSON if given. metrics (a PipelineMetrics) records
+    every stage of the run; paths and counts are added to metrics.info.
+    fast_load names FAST_LOAD_FORMATS written next to the output. With
+    discovery_plan_path the MQTT discovery plan (build_discovery_plan for
+    mqtt_topic, mqtt_listen and discovery_rate, which defaults to the rate
+    of the publisher) is written there as JSON; mqtt_topic and mqtt_listen
+    are then required.
+    With read_plan_path the block-read plan of the polled items
+    (plan_block_reads with block_max and block_gap) is written there.
+    With stagger_path the poll_phase table of stagger_poll_phases is
+    written there. With decoder_table_path the compiled decoder table
+    (compile_decoder_table, by the block reads of the read plan if one is
+    written) is written there. With intern_strings, strings shared by
+    several entities are written once as module-level constants
+    (find_string_constants).
+
+    Returns a dict with the built 'poll_list', its 'coverage', the
+    'poll_items_map', the 'learned_aliases', the 'verify' report (None
+    without verify), the 'fast_load' paths, the 'discovery_plan', the
+    'read_plan', the 'stagger' schedule, the 'decoder_table' and the
+    'interning' stats (or None) so callers can report on the result.
+    """
+    if discovery_plan_path and not (mqtt_topic and mqtt_listen):
+        raise ValueError("A discovery plan needs the splitter's mqtt_topic and mqtt_listen")
+    cache = None
+    cached_run = None
+    if cache_dir:
+        cache = open_migration_cache(cache_dir, poll_list_path, aliases_path,
+                                     fuzzy_threshold, optimize_grouping, hoist_attrs, suggest)
+        run_key = cache.run_key(file_digest(entities_json_path))
+        cached_run = cache.load('runs', run_key)
+    
+    if cached_run is not None:
+        poll_list, coverage, poll_items = cached_run
+        poll_items_map = {key: PollItem(*item) for key, item in poll_items.items()}
+        if verbose:
+            print(f"\n[OK] Inputs unchanged, reusing cached result from {cache_dir}")
+        aliases_learned = learned_aliases(coverage)
+        if aliases_path and learn_aliases and aliases_learned:
+            with AliasStore(aliases_path) as aliases:
+                added = aliases.add(aliases_learned)
+            if verbose:
+                print(f"[OK] Added {added} learned aliases to {aliases_path}")
+    else:
+        poll_list, coverage, poll_items_map, aliases_learned = _build_migration(
+            entities_json_path, poll_list_path, verbose, stream, fuzzy_threshold,
+            aliases_path, learn_aliases, optimize_grouping, cache, metrics, hoist_attrs, suggest)
+        if cache is not None:
+            cache.store('runs', run_key, (poll_list, coverage,
+                                          {key: tuple(item) for key, item in poll_items_map.items()}))
+            if verbose and cache.hits['domains']:
+                print(f"[OK] Reused {cache.hits['domains']}/"
+                      f"{cache.hits['domains'] + cache.misses['domains']} domains from cache")
+
+    interning = None
+    constants = None
+    if intern_strings:
+        constants, interning = find_string_constants(poll_list)
+    if verbose:
+        print(f"Writing output to {output_path}...")
+    written = write_poll_list_file(poll_list, output_path, coverage, metrics, constants)
+    if verbose and not written:
+        print(f"[OK] {output_path} is up to date (not rewritten)")
+
+    fast_load_paths = {}
+    if fast_load:
+        with pipeline_stage(metrics, 'write'):
+            fast_load_paths = write_fast_load_files(poll_list, output_path, fast_load)
+        if verbose:
+            print(f"[OK] Fast-load files: {', '.join(fast_load_paths.values())}")
+
+    discovery_plan = None
+    if discovery_plan_path:
+        discovery_plan = build_discovery_plan(poll_list, mqtt_topic, mqtt_listen, discovery_rate)
+        with pipeline_stage(metrics, 'write'):
+            write_discovery_plan(discovery_plan, discovery_plan_path)
+        if verbose:
+            print(f"[OK] Discovery plan: {discovery_plan['messages']} messages in "
+                  f"{len(discovery_plan['batches'])} batches at "
+                  f"{discovery_plan['rate']:g} messages/s, "
+                  f"{len(discovery_plan['fragments'])} shared fragments -> {discovery_plan_path}")
+            for topic in discovery_plan['duplicate_topics']:
+                print(f"[WARNING] Several entities announce {topic}")
+
+    read_plan = None
+    if read_plan_path:
+        read_plan = plan_block_reads(active_poll_items(poll_list), block_max, block_gap)
+        with pipeline_stage(metrics, 'write'):
+            write_read_plan(read_plan, read_plan_path)
+        if verbose:
+            print(f"[OK] Block-read plan -> {read_plan_path}")
+
+    stagger = None
+    if stagger_path:
+        stagger = stagger_poll_phases(active_poll_items(poll_list))
+        with pipeline_stage(metrics, 'write'):
+            write_poll_phases(stagger, stagger_path)
+        if verbose:
+            print(f"[OK] Poll phase table -> {stagger_path}")
+
+    decoder_table = None
+    if decoder_table_path:
+        decoder_table = compile_decoder_table(active_poll_tuples(poll_list), read_plan)
+        with pipeline_stage(metrics, 'write'):
+            write_decoder_table(decoder_table, decoder_table_path)
+        if verbose:
+            print(f"[OK] Decoder table: {len(decoder_table['entries'])} datapoints from "
+                  f"{len(decoder_table['reads'])} reads -> {decoder_table_path}")
+
+    verify_report = None
+    if verify:
+        with pipeline_stage(metrics, 'verify'):
+            verify_report = verify_poll_list_file(output_path, poll_list, poll_items_map,
+                                                  coverage)
+        if verify_report_path:
+            with open(verify_report_path, 'w', encoding='utf-8', newline='\n') as f:
+                json.dump(verify_report, f, ensure_ascii=False, indent=2)
+                f.write('\n')
+        if verbose:
+            print_verify_report(verify_report)
+
+    if metrics is not None:
+        metrics.info.update({
+            'entities_json': entities_json_path,
+            'poll_list': poll_list_path,
+            'output': output_path,
+            'cached': cached_run is not None,
+            'written': written,
+            'total_entities': coverage['total_entities'],
+            'poll_items': len(coverage['all_poll_items']),
+        })
+
+    return {
+        'poll_list': poll_list,
+        'coverage': coverage,
+        'poll_items_map': poll_items_map,
+        'learned_aliases': aliases_learned,
+        'verify': verify_report,
+        'fast_load': fast_load_paths,
+        'discovery_plan': discovery_plan,
+        'read_plan': read_plan,
+        'stagger': stagger,
+        'decoder_table': decoder_table,
+        'interning': interning,
+    }
+
+
+def _build_migration(entities_json_path: str, poll_list_path: str, verbose: bool, stream: bool,
+                     fuzzy_threshold: Optional[float], aliases_path: Optional[str],
+                     learn_aliases: bool, optimize_grouping: bool,
+                     cache: Optional[MigrationCache],
+                     metrics: Optional[PipelineMetrics] = None,
+                     hoist_attrs: bool = False,
+                     suggest: bool = False) -> Tuple[Dict, Dict, Dict, Dict]:
+    """Load the inputs and build the structure (the uncached part of run_migration)."""
+    if verbose:
+        print(f"\nLoading {entities_json_path}...")
+    if stream:
+        entities_stream = EntitiesStream(entities_json_path)
+        entities_json = entities_stream.header
+        datapoints = entities_stream.datapoints()
+        if verbose:
+            print(f"[OK] Streaming JSON file with {entities_stream.encoding} encoding")
+    else:
+        entities_json = load_entities_json(entities_json_path, verbose, metrics)
+        datapoints = None
+
+    if verbose:
+        print(f"Loading {poll_list_path}...")
+    poll_items = parse_poll_list_file(poll_list_path, verbose, metrics)
+
+    if verbose:
+        print(f"\n[OK] Found {len(poll_items)} poll items")
+        if not stream:
+            print(f"[OK] Found {len(entities_json.get('datapoints', []))} entities")
+
+    with pipeline_stage(metrics, 'map_build'):
+        poll_items_map = build_poll_items_map(poll_items)
+
+    if verbose:
+        print("\nBuilding poll_list structure...")
+    poll_list, coverage, aliases_learned = _build_structure(
+        entities_json, poll_items_map, datapoints, verbose, fuzzy_threshold,
+        aliases_path, learn_aliases, optimize_grouping, None if stream else cache, metrics,
+        hoist_attrs, suggest)
+    if verbose and stream:
+        print(f"[OK] Streamed {coverage['total_entities']} entities")
+
+    return poll_list, coverage, poll_items_map, aliases_learned
+
+
+def _build_structure(entities_json: Dict, poll_items_map: Dict[str, PollItem],
+                     datapoints: Optional[Iterable[Dict]], verbose: bool,
+                     fuzzy_threshold: Optional[float], aliases_path: Optional[str],
+                     learn_aliases: bool, optimize_grouping: bool,
+                     cache: Optional[MigrationCache],
+                     metrics: Optional[PipelineMetrics] = None,
+                     hoist_attrs: bool = False,
+                     suggest: bool = False) -> Tuple[Dict, Dict, Dict]:
+    """Build the structure with the alias store opened (and learned aliases added)."""
+    aliases = AliasStore(aliases_path) if aliases_path else None
+    try:
+        poll_list, coverage = build_poll_list_structure(entities_json, poll_items_map, datapoints,
+                                                        fuzzy_threshold, aliases, optimize_grouping,
+                                                        cache, metrics, hoist_attrs, suggest)
+        aliases_learned = learned_aliases(coverage)
+        if aliases is not None and learn_aliases and aliases_learned:
+            added = aliases.add(aliases_learned)
+            if verbose:
+                print(f"[OK] Added {added} learned aliases to {aliases_path}")
+    finally:
+        if aliases is not None:
+            aliases.close()
+    return poll_list, coverage, aliases_learned
+
+
+def print_grouping_report(grouping: Dict[str, Dict[str, Any]]):
+    """Print the bytes saved by the grouping optimizer versus the fixed grouping."""
+    baseline = sum(stats['baseline_bytes'] for stats in grouping.values())
+    optimized = sum(stats['optimized_bytes'] for stats in grouping.values())
+    saved = baseline - optimized
+    percent = 100.0 * saved / baseline if baseline else 0.0
+    if not any(stats['improved'] for stats in grouping.values()):
+        print(f"\n[INFO] Grouping optimizer: the fixed grouping cannot be improved "
+              f"({len(grouping)} domains, {baseline} bytes)")
+    else:
+        print(f"\n[INFO] Grouping optimizer saved {saved} bytes "
+              f"({baseline} -> {optimized}, {percent:.1f}%):")
+        for domain, stats in grouping.items():
+            if stats['improved']:
+                print(f"     - {domain}: {stats['baseline_bytes']} -> {stats['optimized_bytes']} "
+                      f"bytes, {stats['baseline_units']} -> {stats['optimized_units']} units, "
+                      f"keys: {', '.join(stats['grouping_keys']) or '-'}")
+    hoisted = [stats['hoisted_bytes'] for stats in grouping.values()
+               if stats['hoisted_bytes'] is not None]
+    if hoisted:
+        print(f"[INFO] Hoisting shared attributes: {optimized} -> {sum(hoisted)} bytes")
+
+
+def migrate(entities_json_path: str, poll_list_path: str, output_path: str,
+            **options) -> Dict[str, Any]:
+    """
+    Main migration function (options are passed on to run_migration).
+
+    With options['metrics'] the run is measured (the metrics are entered here).
+    """
     print("\n" + "="*70)
     print("Optolink Splitter - Home Assistant Auto Discovery Migration")
     print("="*70)
     
-    print(f"\nLoading {entities_json_path}...")
-    entities_json = load_entities_json(entities_json_path)
-    
-    print(f"Loading {poll_list_path}...")
-    poll_items = parse_poll_list_file(poll_list_path)
-    
-    print(f"\n[OK] Found {len(poll_items)} poll items")
-    print(f"[OK] Found {len(entities_json.get('datapoints', []))} entities")
-    
-    # Create map of poll items
-    poll_items_map = {}
-    for item in poll_items:
-        parsed = parse_poll_item(item)
-        name_for_matching = normalize_for_matching(parsed['name'])
-        poll_items_map[name_for_matching] = parsed
-    
-    print("\nBuilding poll_list structure...")
-    poll_list, coverage = build_poll_list_structure(entities_json, poll_items_map)
-    
-    print(f"Writing output to {output_path}...")
-    write_poll_list_file(poll_list, output_path, coverage)
+    with options.get('metrics') or nullcontext():
+        result = run_migration(entities_json_path, poll_list_path, output_path, **options)
+    coverage = result['coverage']
+    poll_items_map = result['poll_items_map']
     
     print("\n" + "="*70)
     print("[OK] Migration complete!")
@@ -652,15 +3834,46 @@ def migrate(entities_json_path: str, poll_list_path: str, output_path: str):
     
     # Print coverage report
     unused = coverage['all_poll_items'] - coverage['used_poll_items']
-    print(f"\n[Coverage Report]")
+    print("\n[Coverage Report]")
     print(f"  - Entities processed: {coverage['total_entities']}")
     print(f"  - Poll items used: {len(coverage['used_poll_items'])}/{len(coverage['all_poll_items'])}")
     
+    if coverage['address_matches']:
+        print(f"\n[INFO] {len(coverage['address_matches'])} entities matched by datapoint address:")
+        for name, poll_name in sorted(coverage['address_matches'].items()):
+            print(f"     - {name} -> {poll_name}")
+    
+    if coverage['alias_matches']:
+        print(f"\n[INFO] {len(coverage['alias_matches'])} entities matched by alias:")
+        for name, poll_name in sorted(coverage['alias_matches'].items()):
+            print(f"     - {name} -> {poll_name}")
+    
+    if coverage['fuzzy_matches']:
+        print(f"\n[INFO] {len(coverage['fuzzy_matches'])} entities matched by fuzzy name match:")
+        for name, (poll_name, score) in sorted(coverage['fuzzy_matches'].items()):
+            print(f"     - {name} -> {poll_name} ({score:.2f})")
+    
+    if coverage['suggestions']:
+        print(f"\n[INFO] {len(coverage['suggestions'])} entities without poll item have suggestions"
+              f" (see migration report in {output_path})")
+    
+    if 'grouping' in coverage:
+        print_grouping_report(coverage['grouping'])
+    
+    if result['interning'] is not None:
+        print_interning_report(result['interning'], output_path)
+    
+    if result['read_plan'] is not None:
+        print_read_plan_report(result['read_plan'])
+    
+    if result['stagger'] is not None:
+        print_stagger_report(result['stagger'])
+    
     if unused:
         print(f"\n[WARNING] {len(unused)} poll items were NOT used:")
         for item in sorted(unused):
             # Find original name from poll_items_map
-            original = poll_items_map[item]['name']
+            original = poll_items_map[item].name
             print(f"     - {original}")
         print("\n  -> These items exist in poll_list but have no matching entity")
         print("  -> May be intentional or may need manual review")
@@ -679,6 +3892,524 @@ def migrate(entities_json_path: str, poll_list_path: str, output_path: str):
     print("  - Adjust beautifier settings if needed")
     print("="*70)
     print()
+    return result
+
+
+# ======================================================================
+# Watch mode
+# ======================================================================
+
+WATCH_INTERVAL = 0.5
+WATCH_DEBOUNCE = 1.0
+
+
+def _stat_signature(filepath: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, None while it does not exist."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def watch(entities_json_path: str, poll_list_path: str, output_path: str,
+          interval: float = WATCH_INTERVAL, debounce: float = WATCH_DEBOUNCE,
+          fuzzy_threshold: Optional[float] = None, suggest: bool = False,
+          aliases_path: Optional[str] = None, learn_aliases: bool = False, optimize_grouping: bool = False,
+          cache_dir: Optional[str] = None, verify: bool = True, hoist_attrs: bool = False,
+          fast_load: Iterable[str] = (), intern_strings: bool = False,
+          metrics_path: Optional[str] = None, profile: bool = False):
+    """
+    Regenerate the output whenever an input file changes, until Ctrl+C.
+
+    The inputs are polled with os.stat every interval seconds; a burst of
+    saves is handled once the files have been quiet for debounce seconds.
+    Loaded inputs stay in memory and only the changed file is reloaded
+    before the structure is rebuilt; an identical output is not rewritten.
+    Errors (e.g. a half-edited file) and verification failures are reported
+    and watching continues. fast_load and intern_strings apply to every
+    regeneration as in run_migration. With metrics_path every regeneration
+    appends a metrics record there; profile prints its stages.
+    """
+    paths = {'entities': entities_json_path, 'poll_list': poll_list_path}
+    state = {}
+    
+    def build(changed: Set[str], metrics: Optional[PipelineMetrics]):
+        if 'poll_list' in changed:
+            poll_items = parse_poll_list_file(poll_list_path, False, metrics)
+            with pipeline_stage(metrics, 'map_build'):
+                state['poll_items_map'] = build_poll_items_map(poll_items)
+        if 'entities' in changed:
+            state['entities_json'] = load_entities_json(entities_json_path, False, metrics)
+        cache = None
+        if cache_dir:
+            cache = open_migration_cache(cache_dir, poll_list_path, aliases_path,
+                                         fuzzy_threshold, optimize_grouping, hoist_attrs, suggest)
+        poll_list, coverage, _ = _build_structure(
+            state['entities_json'], state['poll_items_map'], None, False, fuzzy_threshold,
+            aliases_path, learn_aliases, optimize_grouping, cache, metrics, hoist_attrs, suggest)
+        constants = find_string_constants(poll_list)[0] if intern_strings else None
+        written = write_poll_list_file(poll_list, output_path, coverage, metrics, constants)
+        if fast_load:
+            with pipeline_stage(metrics, 'write'):
+                write_fast_load_files(poll_list, output_path, fast_load)
+        verify_report = None
+        if verify:
+            with pipeline_stage(metrics, 'verify'):
+                verify_report = verify_poll_list_file(output_path, poll_list,
+                                                      state['poll_items_map'], coverage)
+        return coverage, written, verify_report
+
+    def regenerate(changed: Set[str]) -> bool:
+        start = time.perf_counter()
+        metrics = PipelineMetrics(trace_memory=profile) if profile or metrics_path else None
+        try:
+            with metrics or nullcontext():
+                coverage, written, verify_report = build(changed, metrics)
+        except Exception as e:
+            print(f"[ERROR] {time.strftime('%H:%M:%S')} Regeneration failed: {e}")
+            if metrics_path:
+                append_metrics_record(metrics_path, metrics.record(
+                    entities_json=entities_json_path, poll_list=poll_list_path,
+                    output=output_path, status='error', error=f"{type(e).__name__}: {e}"))
+            return False
+        elapsed = (time.perf_counter() - start) * 1000
+        reloaded = ', '.join(name for name in paths if name in changed)
+        result = 'written' if written else 'unchanged'
+        print(f"[OK] {time.strftime('%H:%M:%S')} Regenerated {output_path} in {elapsed:.1f} ms "
+              f"(reloaded: {reloaded}; output {result}; "
+              f"{len(coverage['used_poll_items'])}/{len(coverage['all_poll_items'])} poll items used)")
+        if verify_report is not None and not verify_report['ok']:
+            print_verify_report(verify_report)
+        if metrics is not None:
+            record = metrics.record(entities_json=entities_json_path, poll_list=poll_list_path,
+                                    output=output_path, status='ok', written=written,
+                                    verified=verify_report is None or verify_report['ok'])
+            if profile:
+                print_metrics_report(record['stages'], total=record)
+            if metrics_path:
+                append_metrics_record(metrics_path, record)
+        return True
+    
+    seen = {name: _stat_signature(path) for name, path in paths.items()}
+    # Inputs whose last reload failed are reloaded again with the next change
+    stale = set() if regenerate(set(paths)) else set(paths)
+    print(f"[INFO] Watching {entities_json_path} and {poll_list_path} (Ctrl+C to stop)")
+    
+    pending = set()
+    last_change = 0.0
+    try:
+        while True:
+            time.sleep(interval)
+            for name, path in paths.items():
+                signature = _stat_signature(path)
+                if signature != seen[name]:
+                    seen[name] = signature
+                    pending.add(name)
+                    last_change = time.monotonic()
+            if pending and time.monotonic() - last_change >= debounce:
+                # Files may be missing for a moment while editors replace them
+                if all(seen[name] is not None for name in pending):
+                    changed = pending | stale
+                    stale = set() if regenerate(changed) else changed
+                    pending = set()
+    except KeyboardInterrupt:
+        print("\n[OK] Watch mode stopped")
+
+
+# ======================================================================
+# Fleet batch mode
+# ======================================================================
+
+MANIFEST_FIELDS = ('entities_json', 'poll_list', 'output')
+# Optional per-job output paths and the run_migration option each one sets
+MANIFEST_OPTIONAL_FIELDS = {
+    'discovery_plan': 'discovery_plan_path',
+    'read_plan': 'read_plan_path',
+    'stagger': 'stagger_path',
+    'decoder_table': 'decoder_table_path',
+}
+
+
+def load_batch_manifest(manifest_path: str) -> List[Dict[str, str]]:
+    """
+    Load a batch manifest with one migration job per entry.
+
+    Supported formats:
+        - CSV with a header row: entities_json,poll_list,output
+        - JSON lines: {"entities_json": ..., "poll_list": ..., "output": ...}
+
+    Entries may also name the job's MANIFEST_OPTIONAL_FIELDS outputs (empty
+    values are skipped). Relative paths are resolved against the manifest's
+    directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+        content = f.read()
+
+    stripped = content.lstrip()
+    if stripped.startswith('{'):
+        rows = []
+        for line_no, line in enumerate(content.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in manifest line {line_no}: {e}")
+    else:
+        lines = [line for line in content.splitlines()
+                 if line.strip() and not line.lstrip().startswith('#')]
+        rows = list(csv.DictReader(lines))
+
+    jobs = []
+    for index, row in enumerate(rows):
+        missing = [field for field in MANIFEST_FIELDS if not row.get(field)]
+        if missing:
+            raise ValueError(f"Manifest entry {index + 1} is missing: {', '.join(missing)}")
+        job = {'index': index}
+        for field in MANIFEST_FIELDS:
+            job[field] = os.path.join(base_dir, row[field].strip())
+        for field in MANIFEST_OPTIONAL_FIELDS:
+            if (row.get(field) or '').strip():
+                job[field] = os.path.join(base_dir, row[field].strip())
+        jobs.append(job)
+
+    return jobs
+
+
+def run_batch_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a single batch job quietly and return its result record.
+
+    With job['metrics'] the record includes the job's metrics record;
+    allocations are traced only with job['trace_memory'].
+    """
+    record = {
+        'index': job['index'],
+        'entities_json': job['entities_json'],
+        'poll_list': job['poll_list'],
+        'output': job['output'],
+    }
+    options = dict(job.get('options', {}))
+    for field, option in MANIFEST_OPTIONAL_FIELDS.items():
+        if field in job:
+            record[field] = options[option] = job[field]
+    metrics = (PipelineMetrics(trace_memory=job.get('trace_memory', False))
+               if job.get('metrics') else None)
+    start = time.perf_counter()
+    try:
+        with metrics or nullcontext():
+            result = run_migration(job['entities_json'], job['poll_list'], job['output'],
+                                   verbose=False, metrics=metrics, **options)
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+    else:
+        coverage = result['coverage']
+        unused = coverage['all_poll_items'] - coverage['used_poll_items']
+        record['status'] = 'ok'
+        record['total_entities'] = coverage['total_entities']
+        record['poll_items_used'] = len(coverage['used_poll_items'])
+        record['poll_items_total'] = len(coverage['all_poll_items'])
+        record['unused_poll_items'] = [result['poll_items_map'][key].name for key in sorted(unused)]
+        record['learned_aliases'] = result['learned_aliases']
+        if result['verify'] is not None:
+            record['verified'] = result['verify']['ok']
+            if not result['verify']['ok']:
+                record['verify'] = result['verify']
+        if 'grouping' in coverage:
+            record['grouping_bytes_saved'] = sum(stats['baseline_bytes'] - stats['optimized_bytes']
+                                                 for stats in coverage['grouping'].values())
+    record['elapsed'] = round(time.perf_counter() - start, 6)
+    if metrics is not None:
+        fields = {key: record[key] for key in ('index', 'entities_json', 'poll_list', 'output',
+                                               'status', 'error', 'verified') if key in record}
+        record['metrics'] = metrics.record(**fields)
+    return record
+
+
+def migrate_batch(manifest_path: str, max_workers: Optional[int] = None,
+                  report_path: Optional[str] = None, learn_aliases: bool = False,
+                  profile: bool = False, metrics_path: Optional[str] = None,
+                  **options) -> List[Dict[str, Any]]:
+    """
+    Run all jobs of a manifest on a process pool and print one summary.
+
+    Options are passed on to run_migration for every job. Per-job records
+    are returned in manifest order and, if report_path is given, written
+    there as JSON lines. With learn_aliases the aliases learned by all jobs
+    are added to the alias store (options['aliases_path']) once at the end,
+    so workers never write the store concurrently. With profile or
+    metrics_path every job is measured (PipelineMetrics, allocations only
+    traced with profile); the job metrics records are appended to
+    metrics_path and the stages of all jobs are aggregated in the summary
+    with profile.
+    """
+    jobs = load_batch_manifest(manifest_path)
+    for job in jobs:
+        job['options'] = options
+        job['metrics'] = profile or bool(metrics_path)
+        job['trace_memory'] = profile
+    workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs) or 1))
+    # Larger chunks keep IPC overhead low for fleets with thousands of sites
+    chunksize = max(1, len(jobs) // (workers * 4))
+
+    start = time.perf_counter()
+    if workers == 1:
+        records = [run_batch_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(run_batch_job, jobs, chunksize=chunksize))
+    wall_time = time.perf_counter() - start
+
+    if learn_aliases and options.get('aliases_path'):
+        aliases_learned = {}
+        for record in records:
+            aliases_learned.update(record.get('learned_aliases', {}))
+        with AliasStore(options['aliases_path']) as aliases:
+            added = aliases.add(aliases_learned)
+        print(f"[OK] Added {added} learned aliases to {options['aliases_path']}")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8', newline='\n') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    if metrics_path:
+        for record in records:
+            append_metrics_record(metrics_path, record['metrics'])
+
+    print_batch_summary(records, wall_time, workers)
+    if profile:
+        print_metrics_report(aggregate_metrics(record['metrics'] for record in records),
+                             f'Profile (all {len(records)} jobs)')
+    return records
+
+
+def print_batch_summary(records: List[Dict[str, Any]], wall_time: float, workers: int):
+    """Print the aggregated summary of a batch run."""
+    ok = [r for r in records if r['status'] == 'ok']
+    failed = [r for r in records if r['status'] != 'ok']
+    job_time = sum(r['elapsed'] for r in records)
+
+    print("\n" + "="*70)
+    print("Optolink Splitter - Home Assistant Auto Discovery Migration (batch)")
+    print("="*70)
+    print(f"  - Jobs: {len(records)} ({len(ok)} ok, {len(failed)} failed)")
+    print(f"  - Workers: {workers}")
+    print(f"  - Entities processed: {sum(r['total_entities'] for r in ok)}")
+    print(f"  - Poll items used: {sum(r['poll_items_used'] for r in ok)}"
+          f"/{sum(r['poll_items_total'] for r in ok)}")
+    print(f"  - Jobs with unused poll items: {sum(1 for r in ok if r['unused_poll_items'])}")
+    unverified = [r for r in ok if r.get('verified') is False]
+    if unverified:
+        print(f"  - Jobs failing output verification: {len(unverified)}")
+    print(f"  - Wall time: {wall_time:.2f}s (job time {job_time:.2f}s)")
+
+    if failed:
+        print(f"\n[WARNING] {len(failed)} jobs failed:")
+        for record in failed:
+            print(f"     - #{record['index'] + 1} {record['entities_json']}: {record['error']}")
+    print("="*70)
+
+
+# ======================================================================
+# Server mode
+# ======================================================================
+
+def to_jsonable(value: Any) -> Any:
+    """Convert sets (sorted) and tuples to lists, recursively, for json.dumps."""
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(to_jsonable(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def run_server_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one migration request of the server and return its response.
+
+    Inputs are given as paths ('entities_json', 'poll_list') or inline
+    ('entities_json_content', 'poll_list_content'). The generated file is
+    returned as 'content' and also written to 'output' if given (unless
+    unchanged). Options: fuzzy_threshold, suggest, aliases_path (the store is only
+    read; learned aliases are returned), optimize_grouping, hoist_attrs, intern_strings
+    and verify (default true; the generated source is verified in memory).
+    """
+    response = {'id': request.get('id')}
+    start = time.perf_counter()
+    try:
+        for field in ('entities_json', 'poll_list'):
+            if field not in request and f'{field}_content' not in request:
+                raise ValueError(f"Request needs '{field}' or '{field}_content'")
+        if 'entities_json_content' in request:
+            try:
+                entities_json = json.loads(request['entities_json_content'])
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in entities_json_content: {e}")
+        else:
+            entities_json = load_entities_json(request['entities_json'], verbose=False)
+        if 'poll_list_content' in request:
+            poll_items = parse_poll_list_source(request['poll_list_content'])
+        else:
+            poll_items = parse_poll_list_file(request['poll_list'], verbose=False)
+        poll_items_map = build_poll_items_map(poll_items)
+        poll_list, coverage, aliases_learned = _build_structure(
+            entities_json, poll_items_map, None, False, request.get('fuzzy_threshold'),
+            request.get('aliases_path'), False, bool(request.get('optimize_grouping')), None,
+            hoist_attrs=bool(request.get('hoist_attrs')), suggest=bool(request.get('suggest')))
+        constants = None
+        if request.get('intern_strings'):
+            constants, _ = find_string_constants(poll_list)
+        content = render_poll_list(poll_list, coverage, constants)
+        output_path = request.get('output')
+        written = False
+        if output_path:
+            written = write_file_if_changed(output_path, content.encode('utf-8'))
+        verify_report = None
+        if request.get('verify', True):
+            verify_report = verify_poll_list_source(content, output_path or '<output>',
+                                                    poll_list, poll_items_map, coverage)
+    except Exception as e:
+        response['status'] = 'error'
+        response['error'] = f"{type(e).__name__}: {e}"
+    else:
+        response.update({
+            'status': 'ok',
+            'content': content,
+            'output': output_path,
+            'written': written,
+            'coverage': to_jsonable(coverage),
+            'learned_aliases': aliases_learned,
+            'verify': verify_report,
+        })
+    response['elapsed'] = round(time.perf_counter() - start, 6)
+    return response
+
+
+class _MigrationRequestHandler(socketserver.StreamRequestHandler):
+    """One connection: JSON requests and responses, one per line, in order."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                response = {'status': 'error', 'error': f"Invalid request: {e}"}
+            else:
+                response = self.server.dispatch(request)
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class MigrationServer(socketserver.ThreadingUnixStreamServer):
+        """
+        Migration daemon on a Unix domain socket.
+
+        Every connection is served by a thread that hands the requests to a
+        pool of worker processes; the workers stay alive between requests,
+        so imports and the in-memory caches (parsed poll_lists, name
+        normalization, command rewrites) are kept warm.
+        """
+        daemon_threads = True
+
+        def __init__(self, socket_path: str, workers: int):
+            # Workers are started from handler threads, so they are spawned, not forked
+            self.executor = ProcessPoolExecutor(max_workers=workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+            self.workers = workers
+            self.jobs = 0
+            self._jobs_lock = threading.Lock()
+            super().__init__(socket_path, _MigrationRequestHandler)
+
+        def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+            """Answer 'ping' directly; run everything else on the worker pool."""
+            if request.get('command') == 'ping':
+                return {'id': request.get('id'), 'status': 'ok', 'pid': os.getpid(),
+                        'workers': self.workers, 'jobs': self.jobs}
+            with self._jobs_lock:
+                self.jobs += 1
+            try:
+                return self.executor.submit(run_server_job, request).result()
+            except Exception as e:
+                return {'id': request.get('id'), 'status': 'error',
+                        'error': f"{type(e).__name__}: {e}"}
+
+        def server_close(self):
+            super().server_close()
+            self.executor.shutdown(cancel_futures=True)
+
+
+_STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+def _stop_server(signum, frame):
+    """Stop serve_forever; later signals are ignored so shutdown can finish."""
+    for signum in _STOP_SIGNALS:
+        signal.signal(signum, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def serve(socket_path: str, max_workers: Optional[int] = None):
+    """
+    Serve migration requests on a Unix domain socket until Ctrl+C/SIGTERM.
+
+    Protocol: one JSON object per line in both directions (see
+    run_server_job for the fields; {"command": "ping"} checks the server).
+    A leftover socket file of a server that is no longer running is replaced.
+    Once stopping, further Ctrl+C/SIGTERM are ignored until the worker pool
+    is shut down.
+    """
+    if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        raise RuntimeError("Unix domain sockets are not supported on this platform")
+    if os.path.exists(socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.unlink(socket_path)
+            else:
+                raise RuntimeError(f"A server is already listening on {socket_path}")
+    workers = max(1, max_workers or os.cpu_count() or 1)
+    handlers = {signum: signal.signal(signum, _stop_server) for signum in _STOP_SIGNALS}
+    try:
+        with MigrationServer(socket_path, workers) as server:
+            print(f"[INFO] Serving migrations on {socket_path} with {workers} workers "
+                  f"(Ctrl+C to stop)")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("\n[OK] Server stopped")
+            finally:
+                os.unlink(socket_path)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+
+def request_migration(socket_path: str, request: Dict[str, Any],
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Client helper: send one request to a migration server and return its response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError(f"{socket_path} closed the connection without a response")
+    return json.loads(line)
 
 
 if __name__ == '__main__':
@@ -696,6 +4427,65 @@ if __name__ == '__main__':
                         help='Path to poll_list.py (default: poll_list.py)')
     parser.add_argument('-o', '--output', default='homeassistant_poll_list.py',
                         help='Output path (default: homeassistant_poll_list.py)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Read the entities JSON incrementally (for very large exports)')
+    parser.add_argument('--suggest', action='store_true',
+                        help='Suggest poll items for entities without match')
+    parser.add_argument('--fuzzy-threshold', type=float, default=None, metavar='SCORE',
+                        help=f'Auto-accept fuzzy name matches with at least this score '
+                             f'({FUZZY_SUGGEST_SCORE}..1)')
+    parser.add_argument('--aliases', metavar='PATH',
+                        help='Persistent alias store consulted when names do not match')
+    parser.add_argument('--learn-aliases', action='store_true',
+                        help='Add aliases learned by this run to the alias store')
+    parser.add_argument('--optimize-grouping', action='store_true',
+                        help='Choose grouping keys per domain for the smallest output')
+    parser.add_argument('--hoist-shared-attrs', action='store_true',
+                        help='Move attributes shared by all units to the domain '
+                             '(publisher must inherit them)')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='On-disk cache directory for incremental migrations')
+    parser.add_argument('--watch', action='store_true',
+                        help='Regenerate the output whenever an input file changes')
+    parser.add_argument('--no-verify', action='store_true',
+                        help='Do not verify the written file against the migration result')
+    parser.add_argument('--verify-report', metavar='PATH',
+                        help='Write the output verification report as JSON')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print time and peak allocations per pipeline stage')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='Append per-stage metrics of the run as a JSON line')
+    parser.add_argument('--fast-load', metavar='FORMATS', default='',
+                        help=f"Also write the poll_list as {','.join(FAST_LOAD_FORMATS)} "
+                             "(comma separated)")
+    parser.add_argument('--discovery-plan', metavar='PATH',
+                        help='Write the pre-expanded MQTT discovery plan as JSON')
+    parser.add_argument('--mqtt-topic',
+                        help='Splitter mqtt_topic for state topics (needed for --discovery-plan)')
+    parser.add_argument('--mqtt-listen',
+                        help='Splitter mqtt_listen for command topics (needed for --discovery-plan)')
+    parser.add_argument('--discovery-rate', type=float, default=None, metavar='MSGS',
+                        help='Discovery messages per second (default: 1/mqtt_delay)')
+    parser.add_argument('--read-plan', metavar='PATH',
+                        help='Write the coalesced block-read plan as JSON')
+    parser.add_argument('--block-max', type=int, default=BLOCK_READ_MAX, metavar='N',
+                        help=f'Largest block read in bytes (default: {BLOCK_READ_MAX})')
+    parser.add_argument('--block-gap', type=int, default=BLOCK_READ_GAP, metavar='N',
+                        help=f'Unused bytes allowed between merged reads (default: {BLOCK_READ_GAP})')
+    parser.add_argument('--stagger', metavar='PATH',
+                        help='Write a poll_phase table that spreads reads over the ticks')
+    parser.add_argument('--decoder-table', metavar='PATH',
+                        help='Write the compiled decoder table of the polled datapoints')
+    parser.add_argument('--intern-strings', action='store_true',
+                        help='Write shared strings once as module-level constants')
+    parser.add_argument('--serve', metavar='SOCKET',
+                        help='Serve migration requests on a Unix domain socket')
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help='Run all jobs of a CSV/JSON lines manifest on a process pool')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of batch/server worker processes (default: number of cores)')
+    parser.add_argument('--batch-report', metavar='PATH',
+                        help='Write per-job batch result records as JSON lines')
     parser.add_argument('-h', '--help', action='store_true',
                         help='Show detailed help message')
     
@@ -705,8 +4495,59 @@ if __name__ == '__main__':
         print_usage()
         sys.exit(0)
     
+    if args.fuzzy_threshold is not None and not FUZZY_SUGGEST_SCORE <= args.fuzzy_threshold <= 1:
+        print(f"\n[ERROR] --fuzzy-threshold must be between {FUZZY_SUGGEST_SCORE} and 1: "
+              f"candidates below {FUZZY_SUGGEST_SCORE} are not considered")
+        sys.exit(1)
+    
+    if args.discovery_plan and not (args.mqtt_topic and args.mqtt_listen):
+        print("\n[ERROR] --discovery-plan needs --mqtt-topic and --mqtt-listen "
+              "(mqtt_topic and mqtt_listen of the splitter's settings_ini.py)")
+        sys.exit(1)
+    
+    try:
+        args.fast_load = parse_fast_load_formats(args.fast_load)
+    except ValueError as e:
+        print(f"\n[ERROR] {e} (supported: {', '.join(FAST_LOAD_FORMATS)})")
+        sys.exit(1)
+    
+    if args.serve:
+        try:
+            serve(args.serve, args.workers)
+        except Exception as e:
+            print(f"\n[ERROR] Error in server mode: {e}")
+            sys.exit(1)
+        sys.exit(0)
+    
+    if args.batch:
+        unsupported = [option for option, value in (
+            ('--discovery-plan', args.discovery_plan), ('--read-plan', args.read_plan),
+            ('--stagger', args.stagger), ('--decoder-table', args.decoder_table)) if value]
+        if unsupported:
+            print(f"\n[ERROR] --batch cannot be combined with {', '.join(unsupported)}; "
+                  f"name these outputs per job in the manifest columns "
+                  f"{', '.join(MANIFEST_OPTIONAL_FIELDS)}")
+            sys.exit(1)
+        try:
+            records = migrate_batch(args.batch, args.workers, args.batch_report,
+                                    learn_aliases=args.learn_aliases,
+                                    stream=args.stream, fuzzy_threshold=args.fuzzy_threshold,
+                                    suggest=args.suggest, aliases_path=args.aliases,
+                                    optimize_grouping=args.optimize_grouping,
+                                    hoist_attrs=args.hoist_shared_attrs,
+                                    cache_dir=args.cache, verify=not args.no_verify,
+                                    profile=args.profile, metrics_path=args.metrics,
+                                    fast_load=args.fast_load,
+                                    mqtt_topic=args.mqtt_topic, mqtt_listen=args.mqtt_listen,
+                                    discovery_rate=args.discovery_rate,
+                                    block_max=args.block_max, block_gap=args.block_gap,
+                                    intern_strings=args.intern_strings)
+        except Exception as e:
+            print(f"\n[ERROR] Error during batch migration: {e}")
+            sys.exit(1)
+        sys.exit(0 if all(r['status'] == 'ok' for r in records) else 1)
+    
     # Check if default files exist
-    import os
     if args.entities_json == 'homeassistant_entities.json' and not os.path.exists('homeassistant_entities.json'):
         print("\n" + "="*70)
         print("ERROR: Default file 'homeassistant_entities.json' not found!")
@@ -729,9 +4570,55 @@ if __name__ == '__main__':
         print("\nFor full help: python migrate_ha_entities_to_ha_publish.py --help")
         sys.exit(1)
     
+    if args.watch:
+        unsupported = [option for option, value in (
+            ('--stream', args.stream), ('--verify-report', args.verify_report),
+            ('--discovery-plan', args.discovery_plan), ('--read-plan', args.read_plan),
+            ('--stagger', args.stagger), ('--decoder-table', args.decoder_table)) if value]
+        if unsupported:
+            print(f"\n[ERROR] --watch cannot be combined with {', '.join(unsupported)}")
+            sys.exit(1)
+        watch(args.entities_json, args.poll_list, args.output,
+              fuzzy_threshold=args.fuzzy_threshold, suggest=args.suggest,
+              aliases_path=args.aliases,
+              learn_aliases=args.learn_aliases, optimize_grouping=args.optimize_grouping,
+              hoist_attrs=args.hoist_shared_attrs, cache_dir=args.cache,
+              verify=not args.no_verify, fast_load=args.fast_load,
+              intern_strings=args.intern_strings, metrics_path=args.metrics,
+              profile=args.profile)
+        sys.exit(0)
+    
+    metrics = PipelineMetrics(trace_memory=args.profile) if args.profile or args.metrics else None
     try:
-        migrate(args.entities_json, args.poll_list, args.output)
+        result = migrate(args.entities_json, args.poll_list, args.output, stream=args.stream,
+                         fuzzy_threshold=args.fuzzy_threshold, suggest=args.suggest,
+                         aliases_path=args.aliases,
+                         learn_aliases=args.learn_aliases,
+                         optimize_grouping=args.optimize_grouping,
+                         hoist_attrs=args.hoist_shared_attrs, cache_dir=args.cache,
+                         verify=not args.no_verify, verify_report_path=args.verify_report,
+                         metrics=metrics, fast_load=args.fast_load,
+                         discovery_plan_path=args.discovery_plan, mqtt_topic=args.mqtt_topic,
+                         mqtt_listen=args.mqtt_listen, discovery_rate=args.discovery_rate,
+                         read_plan_path=args.read_plan, block_max=args.block_max,
+                         block_gap=args.block_gap, stagger_path=args.stagger,
+                         decoder_table_path=args.decoder_table,
+                         intern_strings=args.intern_strings)
     except Exception as e:
         print(f"\n[ERROR] Error during migration: {e}")
         print("\nFor help, run: python migrate_ha_entities_to_ha_publish.py --help")
+        if args.metrics:
+            append_metrics_record(args.metrics, metrics.record(
+                entities_json=args.entities_json, poll_list=args.poll_list, output=args.output,
+                status='error', error=f"{type(e).__name__}: {e}"))
+        sys.exit(1)
+    verified = result['verify'] is None or result['verify']['ok']
+    if metrics is not None:
+        record = metrics.record(status='ok', verified=verified)
+        if args.profile:
+            print_metrics_report(record['stages'], total=record)
+        if args.metrics:
+            append_metrics_record(args.metrics, record)
+            print(f"[OK] Metrics appended to {args.metrics}")
+    if not verified:
         sys.exit(1)
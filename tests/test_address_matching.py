@@ -0,0 +1,55 @@
+"""Entities are matched by datapoint address, but never to a claimed poll item."""
+
+import migrate_ha_entities_to_ha_publish as migration
+
+POLL_ITEMS = [
+    ('ww_soll', 0x6300, 1, 1, False),
+    ('eheizung_betrieb', 0x7902, 1, 1, False),
+]
+
+
+def records(entities, **options):
+    poll_items_map = migration.build_poll_items_map(POLL_ITEMS)
+    domains = migration.group_entities_by_domain(entities, poll_items_map, **options)
+    return {record.original_name: record
+            for domain in domains.values()
+            for units in domain['units'].values()
+            for record in units}
+
+
+def test_entity_is_matched_by_command_address():
+    matched = records([{'name': 'Durchlauferhitzer', 'domain': 'switch',
+                        'payload_on': 'w;0x7902;1;1', 'payload_off': 'w;0x7902;1;0'}])
+
+    record = matched['Durchlauferhitzer']
+    assert record.matched_by == 'address'
+    assert record.poll_tuple[1] == 'eheizung_betrieb'
+
+
+def test_address_match_skips_item_claimed_by_exact_name():
+    switch = {'name': 'WW Einmalladung', 'domain': 'switch', 'payload_on': 'w;0x6300;1;60'}
+    number = {'name': 'WW Soll', 'domain': 'number', 'command_template': 'w;0x6300;1;{{value}}'}
+
+    for entities in ([switch, number], [number, switch]):
+        matched = records(entities)
+        assert matched['WW Soll'].matched_by == 'name'
+        assert matched['WW Einmalladung'].poll_tuple is None
+
+
+def test_address_is_claimed_by_the_first_entity_only():
+    entities = [{'name': 'Durchlauferhitzer', 'domain': 'switch', 'payload_on': 'w;0x7902;1;1'},
+                {'name': 'E-Heizung', 'domain': 'switch', 'payload_on': 'w;0x7902;1;1'}]
+
+    matched = records(entities)
+    assert matched['Durchlauferhitzer'].matched_by == 'address'
+    assert matched['E-Heizung'].poll_tuple is None
+
+
+def test_records_keep_the_input_order():
+    entities = [{'name': 'Durchlauferhitzer', 'domain': 'switch', 'payload_on': 'w;0x7902;1;1'},
+                {'name': 'WW Soll', 'domain': 'switch', 'payload_on': 'w;0x6300;1;1'}]
+    poll_items_map = migration.build_poll_items_map(POLL_ITEMS)
+    domains = migration.group_entities_by_domain(entities, poll_items_map)
+
+    units = list(domains['switch']['units'].values())
+    assert [record.original_name for record in units[0]] == ['Durchlauferhitzer', 'WW Soll']
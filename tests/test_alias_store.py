@@ -0,0 +1,41 @@
+"""Persistent alias store: corrupt files and concurrent writers."""
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+
+def test_truncated_store_names_the_file(tmp_path):
+    path = tmp_path / 'aliases.bin'
+    path.write_bytes(b'HAALI')
+    with pytest.raises(ValueError, match='aliases.bin'):
+        migration.AliasStore(str(path))
+
+
+def test_store_cut_in_the_middle_is_rejected(tmp_path):
+    path = str(tmp_path / 'aliases.bin')
+    with migration.AliasStore(path) as store:
+        store.add({'aussentemperatur': 'aussentemp', 'vorlauf': 'hk2tempvl'})
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:-5])
+    with pytest.raises(ValueError, match='Corrupt alias store'):
+        migration.AliasStore(path)
+
+
+def test_writers_do_not_lose_each_others_aliases(tmp_path):
+    path = str(tmp_path / 'aliases.bin')
+    with migration.AliasStore(path) as store:
+        store.add({'aussentemperatur': 'aussentemp'})
+    first = migration.AliasStore(path)
+    second = migration.AliasStore(path)
+    try:
+        first.add({'vorlauf': 'hk2tempvl'})
+        second.add({'ruecklauf': 'sktemprl'})
+    finally:
+        first.close()
+        second.close()
+    with migration.AliasStore(path) as store:
+        assert dict(store.items()) == {'aussentemperatur': 'aussentemp', 'vorlauf': 'hk2tempvl',
+                                       'ruecklauf': 'sktemprl'}
@@ -0,0 +1,57 @@
+"""Output files are replaced atomically and left alone when unchanged."""
+
+import os
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+
+def test_unchanged_content_is_not_rewritten(tmp_path):
+    path = tmp_path / 'out.py'
+    path.write_bytes(b'poll_list = {}\n')
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+    assert migration.write_file_if_changed(str(path), b'poll_list = {}\n') is False
+    assert os.stat(path).st_mtime_ns == 1_000_000_000
+
+    assert migration.write_file_if_changed(str(path), b'poll_list = {1: 2}\n') is True
+    assert path.read_bytes() == b'poll_list = {1: 2}\n'
+    assert os.stat(path).st_mtime_ns != 1_000_000_000
+
+
+@pytest.mark.parametrize('error', [OSError('disk full'), KeyboardInterrupt()])
+def test_interrupted_write_leaves_old_file_and_no_temp_file(tmp_path, monkeypatch, error):
+    path = tmp_path / 'out.py'
+    path.write_bytes(b'old\n')
+
+    def fail(src, dst):
+        raise error
+
+    monkeypatch.setattr(migration.os, 'replace', fail)
+    with pytest.raises(type(error)):
+        migration.write_file_atomic(str(path), b'new\n')
+
+    assert path.read_bytes() == b'old\n'
+    assert os.listdir(tmp_path) == ['out.py']
+
+
+def test_interrupted_first_write_creates_nothing(tmp_path, monkeypatch):
+    def fail(path, mode):
+        raise OSError('read-only')
+
+    monkeypatch.setattr(migration.os, 'chmod', fail)
+    with pytest.raises(OSError):
+        migration.write_file_atomic(str(tmp_path / 'out.py'), b'new\n')
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_replacement_keeps_the_file_mode(tmp_path):
+    path = tmp_path / 'out.py'
+    path.write_bytes(b'old\n')
+    os.chmod(path, 0o640)
+
+    migration.write_file_atomic(str(path), b'new\n')
+    assert path.read_bytes() == b'new\n'
+    assert os.stat(path).st_mode & 0o777 == 0o640
@@ -0,0 +1,54 @@
+"""Fleet batch mode: per-job options and result records."""
+
+import json
+import os
+
+import migrate_ha_entities_to_ha_publish as migration
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def write_manifest(tmp_path, *extra_columns):
+    header = ['entities_json', 'poll_list', 'output', *extra_columns]
+    rows = []
+    for site in ('earl', 'frans'):
+        fixtures = os.path.join(ROOT, f'testfiles_{site}')
+        rows.append([os.path.join(fixtures, 'homeassistant_entities.json'),
+                     os.path.join(fixtures, 'poll_list.py'), f'{site}.py',
+                     *(f'{site}_{column}.json' for column in extra_columns)])
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text('\n'.join(','.join(row) for row in [header, *rows]) + '\n',
+                        encoding='utf-8')
+    return str(manifest)
+
+
+def test_manifest_columns_write_per_job_outputs(tmp_path):
+    manifest = write_manifest(tmp_path, 'read_plan', 'decoder_table')
+    records = migration.migrate_batch(manifest, max_workers=1)
+
+    assert [record['status'] for record in records] == ['ok', 'ok']
+    for site in ('earl', 'frans'):
+        read_plan = json.loads((tmp_path / f'{site}_read_plan.json').read_text(encoding='utf-8'))
+        assert read_plan['cycles']
+        assert (tmp_path / f'{site}_decoder_table.json').exists()
+    assert records[0]['read_plan'] == str(tmp_path / 'earl_read_plan.json')
+
+
+def test_metrics_without_profile_do_not_trace_memory(tmp_path):
+    manifest = write_manifest(tmp_path)
+    metrics_path = tmp_path / 'metrics.jsonl'
+    records = migration.migrate_batch(manifest, max_workers=1, metrics_path=str(metrics_path))
+
+    assert [record['metrics']['status'] for record in records] == ['ok', 'ok']
+    assert all(record['metrics']['peak_bytes'] is None for record in records)
+    assert len(metrics_path.read_text(encoding='utf-8').splitlines()) == 2
+
+    profiled = migration.migrate_batch(manifest, max_workers=1, profile=True)
+    assert all(record['metrics']['peak_bytes'] > 0 for record in profiled)
+
+
+def test_unused_poll_items_keep_their_original_names(tmp_path):
+    records = migration.migrate_batch(write_manifest(tmp_path), max_workers=1)
+    unused = records[0]['unused_poll_items']
+    assert 'hk2_betriebsart' in unused
+    assert 'hk2betriebsart' not in unused
@@ -0,0 +1,26 @@
+"""Block-read planner: merging of address ranges."""
+
+import migrate_ha_entities_to_ha_publish as migration
+
+
+def plan(*items, max_block=32, gap=0):
+    poll_items = [migration.parse_poll_item(item) for item in items]
+    return migration.plan_block_reads(poll_items, max_block, gap)['cycles'][0]['reads']
+
+
+def test_identical_ranges_longer_than_max_block_share_one_read():
+    reads = plan((30, 'meldung_a', 0x0700, 40), (30, 'meldung_b', 0x0700, 40))
+    assert len(reads) == 1
+    assert reads[0]['length'] == 40
+    assert [item['offset'] for item in reads[0]['items']] == [0, 0]
+
+
+def test_contained_range_joins_long_block():
+    reads = plan((30, 'block', 0x0700, 40), (30, 'part', 0x0710, 2, 1, False))
+    assert len(reads) == 1
+    assert reads[0]['items'][1] == {'name': 'part', 'offset': 16, 'length': 2}
+
+
+def test_block_does_not_grow_beyond_max_block():
+    reads = plan((30, 'a', 0x0100, 20), (30, 'b', 0x0114, 20))
+    assert [read['length'] for read in reads] == [20, 20]
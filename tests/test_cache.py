@@ -0,0 +1,105 @@
+"""Incremental migration cache: marshal entries, unreadable files and cross-domain claims."""
+
+import glob
+import json
+import os
+import shutil
+
+import migrate_ha_entities_to_ha_publish as migration
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles_earl')
+
+
+def migrate(tmp_path, entities_path, name, **options):
+    output_path = tmp_path / name
+    result = migration.run_migration(entities_path, os.path.join(FIXTURES, 'poll_list.py'),
+                                     str(output_path), verbose=False,
+                                     cache_dir=str(tmp_path / 'cache'), **options)
+    return result, output_path.read_text(encoding='utf-8')
+
+
+def test_cached_run_matches_fresh_run(tmp_path):
+    entities_path = os.path.join(FIXTURES, 'homeassistant_entities.json')
+    fresh, expected = migrate(tmp_path, entities_path, 'fresh.py')
+    cached, content = migrate(tmp_path, entities_path, 'cached.py')
+
+    assert content.replace('cached.py', 'fresh.py') == expected
+    assert cached['poll_items_map'] == fresh['poll_items_map']
+    assert all(isinstance(item, migration.PollItem) for item in cached['poll_items_map'].values())
+    assert cached['coverage']['used_poll_items'] == fresh['coverage']['used_poll_items']
+
+
+def test_changed_datapoint_is_rebuilt(tmp_path):
+    entities_path = str(tmp_path / 'entities.json')
+    shutil.copy(os.path.join(FIXTURES, 'homeassistant_entities.json'), entities_path)
+    _, expected = migrate(tmp_path, entities_path, 'out.py')
+
+    with open(entities_path, encoding='utf-8') as f:
+        entities = json.load(f)
+    switch = next(dp for dp in entities['datapoints'] if dp.get('domain') == 'switch')
+    switch['icon'] = 'mdi:toggle-switch'
+    with open(entities_path, 'w', encoding='utf-8') as f:
+        json.dump(entities, f)
+    _, content = migrate(tmp_path, entities_path, 'out.py')
+
+    assert 'mdi:toggle-switch' in content
+    assert content != expected
+
+
+def test_corrupt_entry_is_reported_and_rebuilt(tmp_path, capsys):
+    entities_path = os.path.join(FIXTURES, 'homeassistant_entities.json')
+    _, expected = migrate(tmp_path, entities_path, 'out.py')
+    for path in glob.glob(str(tmp_path / 'cache' / 'runs' / '*' / '*.marshal')):
+        with open(path, 'wb') as f:
+            f.write(b'\xff\x00')
+
+    _, content = migrate(tmp_path, entities_path, 'out.py')
+    assert content == expected
+    assert 'Ignoring unreadable cache entry' in capsys.readouterr().out
+
+
+POLL_LIST = "poll_items = [\n    ('hk2_temp_soll', 0x2000, 2, 0.1, False),\n]\n"
+
+
+def migrate_inline(tmp_path, datapoints, name, **options):
+    entities_path = tmp_path / 'entities.json'
+    entities_path.write_text(json.dumps({'datapoints': datapoints}), encoding='utf-8')
+    poll_list_path = tmp_path / 'poll_list.py'
+    poll_list_path.write_text(POLL_LIST, encoding='utf-8')
+    return migration.run_migration(str(entities_path), str(poll_list_path), str(tmp_path / name),
+                                   verbose=False, **options)
+
+
+def poll_names(result):
+    entries, _ = migration.collect_poll_entries(result['poll_list'])
+    return sorted(entry[1] for entry in entries)
+
+
+def test_change_in_one_domain_re_resolves_fuzzy_claim_in_another(tmp_path):
+    sensor = {'name': 'HK2 Temp Sollwert', 'domain': 'sensor'}
+    number = {'name': 'HK2 Temp Soll', 'domain': 'number', 'command_topic': 'cmnd'}
+    cache_dir = str(tmp_path / 'cache')
+
+    first = migrate_inline(tmp_path, [sensor], 'out.py', fuzzy_threshold=0.6, cache_dir=cache_dir)
+    assert first['coverage']['fuzzy_matches']['HK2 Temp Sollwert'][0] == 'hk2_temp_soll'
+
+    cached = migrate_inline(tmp_path, [sensor, number], 'out.py', fuzzy_threshold=0.6,
+                            cache_dir=cache_dir)
+    fresh = migrate_inline(tmp_path, [sensor, number], 'fresh.py', fuzzy_threshold=0.6)
+    assert cached['coverage']['fuzzy_matches'] == fresh['coverage']['fuzzy_matches'] == {}
+    assert poll_names(cached) == poll_names(fresh)
+    assert poll_names(cached).count('hk2_temp_soll') == 1
+
+
+def test_change_in_one_domain_re_resolves_address_claim_in_another(tmp_path):
+    switch = {'name': 'Sollwert Umschalten', 'domain': 'switch', 'payload_on': 'w;0x2000;2;1'}
+    number = {'name': 'HK2 Temp Soll', 'domain': 'number', 'command_topic': 'cmnd'}
+    cache_dir = str(tmp_path / 'cache')
+
+    first = migrate_inline(tmp_path, [switch], 'out.py', cache_dir=cache_dir)
+    assert first['coverage']['address_matches'] == {'Sollwert Umschalten': 'hk2_temp_soll'}
+
+    cached = migrate_inline(tmp_path, [switch, number], 'out.py', cache_dir=cache_dir)
+    fresh = migrate_inline(tmp_path, [switch, number], 'fresh.py')
+    assert cached['coverage']['address_matches'] == fresh['coverage']['address_matches'] == {}
+    assert poll_names(cached) == poll_names(fresh)
@@ -0,0 +1,46 @@
+"""Placeholders are only written into Optolink read/write commands."""
+
+import migrate_ha_entities_to_ha_publish as migration
+
+
+def test_command_address_and_length_are_rewritten():
+    template = '{{ "w;0x3007;2;"~value*10 }}'
+    assert (migration.transform_command_template(template, 0x3007, 2)
+            == '{{ "w;%DpAddr%;%Length%;"~value*10 }}')
+    assert migration.transform_command_template('w;12295;4;1', 0x3007, 2) == 'w;%DpAddr%;4;1'
+
+
+def test_hex_outside_a_command_is_kept():
+    template = '{% if value == 0x3007 %} w;0x3007;2;1 {% endif %}'
+    assert (migration.transform_command_template(template, 0x3007, 2)
+            == '{% if value == 0x3007 %} w;%DpAddr%;%Length%;1 {% endif %}')
+
+
+def test_other_address_is_kept():
+    attrs = {'command_topic': 'cmnd', 'payload_on': 'w;0xB020;1;2'}
+    assert migration.transform_entity_commands(attrs, 0x3007, 1) == {
+        'command_topic': '%mqtt_listen%', 'payload_on': 'w;0xB020;1;2'}
+
+
+def test_every_command_for_the_address_is_rewritten():
+    template = '{% if value %}w;0x3007;2;1{% else %}w;0X3007;2;0{% endif %} r;0x3008;2'
+    assert (migration.transform_command_template(template, 0x3007, 2)
+            == '{% if value %}w;%DpAddr%;%Length%;1{% else %}w;%DpAddr%;%Length%;0{% endif %}'
+               ' r;0x3008;2')
+
+
+def test_single_command_fast_path_matches_regex_pass():
+    texts = ['w;0x3007;2;1', 'xw;0x3007;2;1', 'r;12295;2', 'w;0x3007;21a', 'w;0x3007;4;',
+             '"w;0x3007;2;"~value', 'w;0x300;2;1', 'ON']
+    rewrite = migration._rewrite_commands.__wrapped__
+    for text in texts:
+        expected = migration._COMMAND_REWRITE.sub(migration._placeholder_replacer(0x3007, 2), text)
+        assert rewrite(text, 0x3007, 2) == expected, text
+
+
+def test_batch_rewrites_every_entity():
+    entities = [({'payload_on': 'w;0x3007;1;1', 'payload_off': 'OFF'}, 0x3007, 1),
+                ({'command_template': 'w;0x0101;2;{{value}}'}, '0x0101', 2)]
+    assert migration.transform_commands_batch(entities) == [
+        {'payload_on': 'w;%DpAddr%;%Length%;1', 'payload_off': 'OFF'},
+        {'command_template': 'w;%DpAddr%;%Length%;{{value}}'}]
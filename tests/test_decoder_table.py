@@ -0,0 +1,103 @@
+"""Decoder table: batch decoding agrees with decode_value for every datatype."""
+
+import os
+import random
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+POLL_TUPLES = [
+    (1, 'hex', 0x0100, 3),
+    (1, 'u8', 0x0110, 1, 1, False),
+    (1, 's8', 0x0111, 1, 1, True),
+    (1, 'u16', 0x0112, 2, 0.1, False),
+    (1, 's16', 0x0114, 2, 0.1, True),
+    (1, 'u24', 0x0116, 3, 1, False),
+    (1, 's24', 0x0119, 3, 0.5, True),
+    (1, 'u32', 0x0120, 4, 3600, False),
+    (1, 's32', 0x0124, 4, 0.01, True),
+    (1, 'u64', 0x0128, 8, 1, False),
+    (1, 's64', 0x0130, 8, 1, True),
+    (1, 'no_signed', 0x0138, 2, 0.5),
+    (1, 'bits', 0x0140, 4, 'b:1:2', 0.1, True),
+    (1, 'bits_mask', 0x0140, 4, 'b:0:0:0x70', 1, False),
+    (1, 'bits_big', 0x0140, 4, 'b:0:1::big', 1, False),
+    (1, 'bits_mask_big', 0x0140, 4, 'b:2:3:0x0FF0:big', 0.5, False),
+    (1, 'datetime', 0x0150, 8, 'vdatetime'),
+    (1, 'text', 0x0160, 10, 'utf8'),
+    (1, 'other', 0x0170, 4, 'unixtime'),
+    (5, 'shared_a', 0x0180, 2, 0.1, True),
+    (5, 'shared_b', 0x0180, 2, 1, False),
+]
+
+
+def random_buffers(table, seed):
+    rng = random.Random(seed)
+    return [bytes(rng.randrange(256) for _ in range(read['length'])) for read in table['reads']]
+
+
+def expected_values(poll_tuples, table, buffers):
+    """Decode each poll tuple from its own bytes with decode_value."""
+    entries = {entry['name']: entry for entry in table['entries']}
+    values = {}
+    for poll_tuple in poll_tuples:
+        item = migration.parse_poll_item(poll_tuple)
+        entry = entries[item.name]
+        poll_format = migration._poll_format(poll_tuple)
+        offset = entry['offset']
+        if poll_format and isinstance(poll_format[0], str) and poll_format[0].startswith('b:'):
+            offset -= migration._parse_bitfield(poll_format[0])[0]
+        raw = buffers[entry['read']][offset:offset + item.length]
+        values[item.name] = migration.decode_value(raw, poll_format)
+    return values
+
+
+def check_table(poll_tuples, table, use_numpy):
+    decoder = migration.DecoderTable(table, use_numpy=use_numpy)
+    for seed in range(20):
+        buffers = random_buffers(table, seed)
+        assert decoder.decode(buffers) == expected_values(poll_tuples, table, buffers)
+
+
+numpy_param = pytest.param(True, marks=pytest.mark.skipif(migration.numpy is None,
+                                                          reason='numpy not installed'))
+
+
+@pytest.mark.parametrize('use_numpy', [False, numpy_param])
+def test_table_matches_decode_value(use_numpy):
+    table = migration.compile_decoder_table(POLL_TUPLES)
+    assert len(table['entries']) == len(POLL_TUPLES)
+    check_table(POLL_TUPLES, table, use_numpy)
+
+
+@pytest.mark.parametrize('use_numpy', [False, numpy_param])
+def test_block_read_table_matches_decode_value(use_numpy):
+    plan = migration.plan_block_reads([migration.parse_poll_item(t) for t in POLL_TUPLES])
+    table = migration.compile_decoder_table(POLL_TUPLES, plan)
+    assert len(table['reads']) < len(POLL_TUPLES)
+    check_table(POLL_TUPLES, table, use_numpy)
+
+
+def test_edge_values():
+    table = migration.compile_decoder_table(POLL_TUPLES)
+    decoder = migration.DecoderTable(table, use_numpy=False)
+    for fill in (b'\x00', b'\xff', b'\x80', b'\x7f'):
+        buffers = [fill * read['length'] for read in table['reads']]
+        assert decoder.decode(buffers) == expected_values(POLL_TUPLES, table, buffers)
+
+
+@pytest.mark.parametrize('use_numpy', [False, numpy_param])
+def test_fixture_table_matches_decode_value(tmp_path, use_numpy):
+    fixture = os.path.join(ROOT, 'testfiles_earl')
+    result = migration.run_migration(os.path.join(fixture, 'homeassistant_entities.json'),
+                                     os.path.join(fixture, 'poll_list.py'),
+                                     str(tmp_path / 'out.py'), verbose=False, verify=False)
+    poll_tuples = migration.active_poll_tuples(result['poll_list'])
+    table = migration.compile_decoder_table(poll_tuples)
+    names = {entry['name'] for entry in table['entries']}
+    poll_tuples = [t for t in poll_tuples if migration.parse_poll_item(t).name in names]
+    assert poll_tuples
+    check_table(poll_tuples, table, use_numpy)
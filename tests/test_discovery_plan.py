@@ -0,0 +1,39 @@
+"""MQTT discovery plan: rate and splitter settings come from the inputs."""
+
+import os
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles_earl')
+
+
+def migrate_earl(tmp_path, **options):
+    return migration.run_migration(os.path.join(FIXTURES, 'homeassistant_entities.json'),
+                                   os.path.join(FIXTURES, 'poll_list.py'),
+                                   str(tmp_path / 'homeassistant_poll_list.py'),
+                                   verbose=False, discovery_plan_path=str(tmp_path / 'plan.json'),
+                                   **options)
+
+
+def test_rate_defaults_to_publisher_mqtt_delay(tmp_path):
+    plan = migrate_earl(tmp_path, mqtt_topic='Heizung', mqtt_listen='Heizung/cmnd')['discovery_plan']
+    assert plan['rate'] == 10.0
+    assert plan['batch_size'] == 1
+    payloads = [migration.expand_discovery_payload(plan, message)
+                for batch in plan['batches'] for message in batch]
+    assert all(payload['state_topic'].startswith('Heizung/')
+               for payload in payloads if 'state_topic' in payload)
+
+
+def test_splitter_topics_are_required(tmp_path):
+    with pytest.raises(ValueError):
+        migrate_earl(tmp_path)
+
+
+def test_poll_list_without_mqtt_delay_needs_explicit_rate():
+    poll_list = {'domains': []}
+    with pytest.raises(ValueError):
+        migration.build_discovery_plan(poll_list, 'Vito', 'Vito/cmnd')
+    assert migration.build_discovery_plan(poll_list, 'Vito', 'Vito/cmnd', rate=20.0)['batch_size'] == 2
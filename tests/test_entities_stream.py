@@ -0,0 +1,22 @@
+"""Streaming ingestion yields the same datapoints and header as a full load."""
+
+import os
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+@pytest.mark.parametrize('fixture', ['testfiles_earl', 'testfiles_frans'])
+@pytest.mark.parametrize('chunk_size', [7, migration.STREAM_CHUNK_SIZE])
+def test_stream_matches_full_load(fixture, chunk_size):
+    path = os.path.join(ROOT, fixture, 'homeassistant_entities.json')
+    expected = migration.load_entities_json(path, verbose=False)
+
+    stream = migration.EntitiesStream(path, chunk_size)
+    datapoints = list(stream.datapoints())
+
+    assert datapoints == expected['datapoints']
+    assert stream.header == {key: value for key, value in expected.items() if key != 'datapoints'}
@@ -0,0 +1,66 @@
+"""Fast-load files round-trip the poll_list and fall back to a newer source."""
+
+import os
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles_earl')
+
+
+@pytest.fixture
+def generated(tmp_path):
+    output_path = str(tmp_path / 'homeassistant_poll_list.py')
+    result = migration.run_migration(os.path.join(FIXTURES, 'homeassistant_entities.json'),
+                                     os.path.join(FIXTURES, 'poll_list.py'), output_path,
+                                     verbose=False, fast_load=migration.FAST_LOAD_FORMATS)
+    return output_path, result
+
+
+@pytest.mark.parametrize('fmt', migration.FAST_LOAD_FORMATS)
+def test_round_trip(generated, fmt):
+    output_path, result = generated
+    expected = migration.load_poll_list(output_path)
+
+    loaded = migration.load_poll_list(result['fast_load'][fmt])
+    assert loaded == expected
+    assert loaded == migration.active_poll_list(result['poll_list'])
+
+
+def rewrite_source(output_path):
+    with open(output_path, encoding='utf-8') as f:
+        content = f.read()
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(content.replace('"poll_interval": 1,', '"poll_interval": 5,'))
+    stat = os.stat(output_path)
+    os.utime(output_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.mark.parametrize('fmt', migration.FAST_LOAD_FORMATS)
+def test_stale_file_falls_back_to_source(generated, fmt):
+    output_path, result = generated
+    rewrite_source(output_path)
+
+    assert migration.load_poll_list(result['fast_load'][fmt])['poll_interval'] == 5
+
+
+@pytest.mark.parametrize('fmt, data', [('pyc', b'\0\0\0\0' + bytes(12) + b'\xe3'),
+                                       ('marshal', b'\xff\x00'),
+                                       ('json', b'{"truncated":')])
+def test_unreadable_file_falls_back_to_source(generated, fmt, data):
+    output_path, result = generated
+    with open(result['fast_load'][fmt], 'wb') as f:
+        f.write(data)
+
+    assert migration.load_poll_list(result['fast_load'][fmt]) == migration.load_poll_list(output_path)
+
+
+def test_unreadable_file_without_source_is_an_error(generated):
+    output_path, result = generated
+    os.remove(output_path)
+    with open(result['fast_load']['pyc'], 'r+b') as f:
+        f.write(b'\0\0\0\0')
+
+    with pytest.raises(ValueError):
+        migration.load_poll_list(result['fast_load']['pyc'])
@@ -0,0 +1,66 @@
+"""Fuzzy auto-accept must not take poll items claimed by exact matches."""
+
+import os
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles_earl')
+
+
+def migrate_earl(tmp_path, **options):
+    return migration.run_migration(os.path.join(FIXTURES, 'homeassistant_entities.json'),
+                                   os.path.join(FIXTURES, 'poll_list.py'),
+                                   str(tmp_path / 'homeassistant_poll_list.py'),
+                                   verbose=False, **options)
+
+
+def test_fuzzy_match_skips_item_claimed_by_exact_name(tmp_path):
+    result = migrate_earl(tmp_path, fuzzy_threshold=0.6)
+    entries, _ = migration.collect_poll_entries(result['poll_list'])
+    names = [entry[1] for entry in entries]
+
+    assert names.count('vd_status_abtauen') == 1
+    assert 'VD Status' not in result['coverage']['fuzzy_matches']
+    assert 'vd_status' in names
+    assert result['verify']['ok']
+    assert 'vdstatus' not in migration.learned_aliases(result['coverage'])
+
+
+def test_fuzzy_match_keeps_value_template(tmp_path):
+    result = migrate_earl(tmp_path, fuzzy_threshold=0.6)
+    content = (tmp_path / 'homeassistant_poll_list.py').read_text(encoding='utf-8')
+    assert "binary_sensor.ug_heizung_wp_vd_status_abtauen" in content
+    assert result['coverage']['fuzzy_matches'] == {}
+
+
+def test_tied_candidates_are_not_accepted():
+    candidates = [('vdstatusabtauen', 0.609), ('vdstatusbetrieb', 0.609)]
+    assert migration.select_fuzzy_match(candidates, set(), 0.6) is None
+    assert migration.select_fuzzy_match(candidates, {'vdstatusabtauen'}, 0.6) == (
+        'vdstatusbetrieb', 0.609)
+
+
+def test_threshold_below_suggest_score_is_rejected():
+    with pytest.raises(ValueError):
+        migration.group_entities_by_domain([], {}, fuzzy_threshold=0.3)
+
+
+def test_suggestions_only_on_request(tmp_path, monkeypatch):
+    index_class = migration.PollNameIndex
+    built = []
+
+    def poll_name_index(names):
+        built.append(names)
+        return index_class(names)
+
+    monkeypatch.setattr(migration, 'PollNameIndex', poll_name_index)
+
+    assert migrate_earl(tmp_path)['coverage']['suggestions'] == {}
+    assert built == []
+
+    suggestions = migrate_earl(tmp_path, suggest=True)['coverage']['suggestions']
+    assert [name for name, _ in suggestions['VD Status']] == ['vd_status_abtauen',
+                                                              'vd_status_betrieb']
+    assert len(built) == 1
@@ -0,0 +1,33 @@
+"""The grouping optimizer must not change the output unless it finds a smaller grouping."""
+
+import os
+
+import migrate_ha_entities_to_ha_publish as migration
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles_earl')
+
+
+def migrate_earl(tmp_path, name, **options):
+    output_path = tmp_path / name
+    result = migration.run_migration(os.path.join(FIXTURES, 'homeassistant_entities.json'),
+                                     os.path.join(FIXTURES, 'poll_list.py'),
+                                     str(output_path), verbose=False, **options)
+    return result, output_path.read_text(encoding='utf-8')
+
+
+def test_optimizer_reports_unimprovable_grouping(tmp_path):
+    _, fixed = migrate_earl(tmp_path, 'fixed.py')
+    result, optimized = migrate_earl(tmp_path, 'optimized.py', optimize_grouping=True)
+
+    grouping = result['coverage']['grouping']
+    assert not any(stats['improved'] for stats in grouping.values())
+    assert all(stats['hoisted_bytes'] is None for stats in grouping.values())
+    assert optimized == fixed
+
+
+def test_hoisting_is_opt_in(tmp_path):
+    result, _ = migrate_earl(tmp_path, 'hoisted.py', hoist_attrs=True)
+    binary_sensor = next(config for config in result['poll_list']['domains']
+                         if config['domain'] == 'binary_sensor')
+    assert binary_sensor['payload_on'] == '1'
+    assert all('payload_on' not in unit for unit in binary_sensor['units'])
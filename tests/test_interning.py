@@ -0,0 +1,53 @@
+"""Interned string constants do not change the generated poll_list."""
+
+import os
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def evaluate(source):
+    namespace = {}
+    exec(compile(source, '<generated>', 'exec'), namespace)
+    return namespace['poll_list']
+
+
+@pytest.mark.parametrize('fixture', ['testfiles_earl', 'testfiles_frans'])
+def test_interned_render_evaluates_to_plain_render(tmp_path, fixture):
+    result = migration.run_migration(os.path.join(ROOT, fixture, 'homeassistant_entities.json'),
+                                     os.path.join(ROOT, fixture, 'poll_list.py'),
+                                     str(tmp_path / 'out.py'), verbose=False, verify=False)
+    poll_list, coverage = result['poll_list'], result['coverage']
+    constants, stats = migration.find_string_constants(poll_list)
+    if fixture == 'testfiles_earl':
+        assert constants and stats['bytes_saved'] > 0
+
+    plain = migration.render_poll_list(poll_list, coverage)
+    interned = migration.render_poll_list(poll_list, coverage, constants)
+    assert len(interned.encode('utf-8')) <= len(plain.encode('utf-8'))
+    assert evaluate(interned) == evaluate(plain)
+
+
+def test_quoted_and_non_ascii_strings_survive_interning():
+    template = '{{ "w;%DpAddr%;%Length%;"~value }}'
+    units = [{'poll': [(1, f'item_{i}', 0x10 + i, 1, 1, False)], 'icon': 'mdi:thermometer',
+              'unit_of_measurement': '°C', 'command_template': template,
+              'name': "Rücklauf 'Soll'"} for i in range(5)]
+    poll_list = {'domains': [{'domain': 'number', 'units': units}]}
+    coverage = migration.new_coverage()
+
+    constants, _ = migration.find_string_constants(poll_list)
+    assert {'mdi:thermometer', template, "Rücklauf 'Soll'"} <= set(constants)
+    assert (evaluate(migration.render_poll_list(poll_list, coverage, constants))
+            == evaluate(migration.render_poll_list(poll_list, coverage)))
+
+
+def test_strings_used_once_are_not_interned():
+    poll_list = {'domains': [{'domain': 'sensor', 'units': [
+        {'poll': [(1, 'a', 0x10, 1, 1, False)], 'icon': 'mdi:only-once'}]}]}
+
+    constants, _ = migration.find_string_constants(poll_list)
+    assert 'mdi:only-once' not in constants
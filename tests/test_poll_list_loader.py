@@ -0,0 +1,54 @@
+"""The static poll_list loader returns what executing the file would."""
+
+import os
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+@pytest.mark.parametrize('fixture', ['testfiles_earl', 'testfiles_frans'])
+def test_static_loader_matches_exec(fixture):
+    path = os.path.join(ROOT, fixture, 'poll_list.py')
+    namespace = {}
+    exec(migration.read_text_file(path)[0], namespace)
+
+    assert migration.parse_poll_list_file(path, verbose=False) == namespace['poll_items']
+
+
+def test_resolves_constants_and_list_extension():
+    source = "cycle = 10\npoll_items = [(cycle, 'a', 0x10, 2)]\npoll_items += [('b', 0x20, 1, 0.1, True)]\n"
+
+    assert migration.parse_poll_list_source(source) == [(10, 'a', 0x10, 2), ('b', 0x20, 1, 0.1, True)]
+
+
+def test_applies_module_level_append_and_extend():
+    source = ("poll_items = [('a', 0x10, 2)]\n"
+              "poll_items.append(('b', 0x20, 1))\n"
+              "poll_items.extend([('c', 0x30, 1), ('d', 0x40, 4)])\n")
+    namespace = {}
+    exec(source, namespace)
+
+    assert migration.parse_poll_list_source(source) == namespace['poll_items']
+
+
+@pytest.mark.parametrize('source, line', [
+    ("poll_items = []\nfor addr in (0x10, 0x20):\n    poll_items.append(('a', addr, 1))\n", 2),
+    ("poll_items = []\nif True:\n    poll_items = [('a', 0x10, 1)]\n", 2),
+    ("poll_items = [('a', 0x10, 1)]\npoll_items.insert(0, ('b', 0x20, 1))\n", 2),
+    ("poll_items = [('a', 0x10, 1)]\npoll_items[0] = ('b', 0x20, 1)\n", 2),
+    ("poll_items = [('a', 0x10, 1)]\ndef extra():\n    poll_items.append(('b', 0x20, 1))\nextra()\n", 2),
+    ("from extra_items import poll_items\n", 1),
+])
+def test_unsupported_changes_of_poll_items_are_rejected(source, line):
+    with pytest.raises(ValueError, match=f"line {line}"):
+        migration.parse_poll_list_source(source)
+
+
+def test_unsupported_statements_on_other_names_are_ignored():
+    source = ("names = []\nfor n in 'ab':\n    names.append(n)\n"
+              "poll_items = [('a', 0x10, 1)]\n")
+
+    assert migration.parse_poll_list_source(source) == [('a', 0x10, 1)]
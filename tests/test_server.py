@@ -0,0 +1,54 @@
+"""Migration server: shutdown on signals."""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+import migrate_ha_entities_to_ha_publish as migration
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPT = os.path.join(ROOT, 'migrate_ha_entities_to_ha_publish.py')
+
+
+def test_stop_signal_ignores_later_signals():
+    handlers = {signum: signal.getsignal(signum) for signum in migration._STOP_SIGNALS}
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            migration._stop_server(signal.SIGTERM, None)
+        assert all(signal.getsignal(signum) == signal.SIG_IGN
+                   for signum in migration._STOP_SIGNALS)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+
+@pytest.mark.skipif(not hasattr(migration, 'MigrationServer'), reason='no Unix sockets')
+def test_second_sigterm_during_shutdown_exits_cleanly(tmp_path):
+    socket_path = str(tmp_path / 'migration.sock')
+    server = subprocess.Popen([sys.executable, SCRIPT, '--serve', socket_path, '--workers', '2'],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        response = migration.request_migration(socket_path, {
+            'entities_json': os.path.join(ROOT, 'testfiles_earl', 'homeassistant_entities.json'),
+            'poll_list': os.path.join(ROOT, 'testfiles_earl', 'poll_list.py'),
+        }, timeout=60)
+        assert response['status'] == 'ok'
+        assert migration.request_migration(socket_path, {'command': 'ping'})['jobs'] == 1
+
+        server.send_signal(signal.SIGTERM)
+        server.send_signal(signal.SIGTERM)
+        _, stderr = server.communicate(timeout=60)
+    finally:
+        if server.poll() is None:
+            server.kill()
+    assert server.returncode == 0
+    assert b'Traceback' not in stderr
+    assert not os.path.exists(socket_path)
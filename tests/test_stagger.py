@@ -0,0 +1,26 @@
+"""Poll phase scheduler: horizon and phase ranges."""
+
+import migrate_ha_entities_to_ha_publish as migration
+
+
+def poll_items(cycles, count):
+    return [migration.parse_poll_item((cycle, f'item_{cycle}_{index}', 0x0100 + index, 2, 0.1, False))
+            for cycle in cycles for index in range(count)]
+
+
+def test_horizon_is_the_common_multiple():
+    assert migration.schedule_horizon([1, 10, 30, 60]) == 60
+
+
+def test_horizon_falls_back_to_longest_cycle():
+    assert migration.schedule_horizon([7, 11, 13, 17, 19, 3600]) == 3600
+
+
+def test_phases_cover_the_whole_cycle():
+    schedule = migration.stagger_poll_phases(poll_items([7, 11, 13, 17, 19, 3600], 40))
+    phases = [phase for name, phase in schedule['phases'].items() if name.startswith('item_3600_')]
+
+    assert schedule['horizon'] == 3600
+    assert len(set(phases)) == 40
+    assert max(phases) >= 19
+    assert schedule['after']['peak_bytes'] <= schedule['before']['peak_bytes']
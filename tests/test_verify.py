@@ -0,0 +1,49 @@
+"""Round-trip verification counts the entities written to the file."""
+
+import os
+import re
+
+import migrate_ha_entities_to_ha_publish as migration
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'testfiles_earl')
+
+
+def migrate_earl(tmp_path):
+    output_path = tmp_path / 'homeassistant_poll_list.py'
+    result = migration.run_migration(os.path.join(FIXTURES, 'homeassistant_entities.json'),
+                                     os.path.join(FIXTURES, 'poll_list.py'),
+                                     str(output_path), verbose=False)
+    return result, output_path.read_text(encoding='utf-8')
+
+
+def verify(result, content):
+    return migration.verify_poll_list_source(content, '<output>', result['poll_list'],
+                                             result['poll_items_map'], result['coverage'])
+
+
+def test_commented_out_domains_are_counted_from_the_file(tmp_path):
+    result, content = migrate_earl(tmp_path)
+    report = verify(result, content)
+    assert report['ok']
+    assert report['commented_out'] == 2
+    assert report['entities'] + report['commented_out'] == result['coverage']['total_entities']
+
+
+def test_removed_commented_out_domain_is_reported(tmp_path):
+    result, content = migrate_earl(tmp_path)
+    start = content.index(f"# {' ' * 8}{migration.COMMENTED_DOMAIN_NOTE}")
+    end = content.index('#         },\n', start) + len('#         },\n')
+    report = verify(result, content[:start] + content[end:])
+
+    assert not report['ok']
+    assert report['entity_count'] == {'expected': result['coverage']['total_entities'],
+                                      'found': result['coverage']['total_entities'] - 1}
+    assert report['missing'] == [[0, 'hk2_thermostat', 0, 1, 1, False]]
+
+
+def test_removed_poll_tuple_is_reported(tmp_path):
+    result, content = migrate_earl(tmp_path)
+    content = re.sub(r'\n\s*\(60, "aussentemp", [^\n]*', '', content, count=1)
+    report = verify(result, content)
+    assert report['missing'][0][1] == 'aussentemp'
+    assert report['entity_count']['found'] == result['coverage']['total_entities'] - 1